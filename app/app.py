@@ -1,12 +1,16 @@
 from dash import Dash
 from .layout import layout
 from .callbacks import register_callbacks
+from .geometry import register_geometry_route
+from .snapshots import monthly_snapshots
 
 app = Dash(__name__)
 app.layout = layout
 
 register_callbacks(app)
 server = app.server
+register_geometry_route(server)
+monthly_snapshots.warm_in_background()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8051, debug=True)
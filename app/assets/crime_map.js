@@ -0,0 +1,25 @@
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    crime_map: {
+        /*
+        Puts a month's values and colour range on the crime map in the browser. Only z and the colour range are
+        restyled on the existing trace, so the ward polygons are not rebuilt or redrawn from a new figure.
+        Returns how long the restyle took, for measuring map updates.
+        */
+        update_crime_map: function(values) {
+            const graph = document.getElementById('crime-map');
+            const plot = graph && graph.getElementsByClassName('js-plotly-plot')[0];
+            if (!values || !plot || !plot.data || !plot.data.length) {
+                return window.dash_clientside.no_update;
+            }
+
+            const start = performance.now();
+            Plotly.restyle(plot, {
+                z: [values.z],
+                zauto: [values.zmin === null],
+                zmin: [values.zmin],
+                zmax: [values.zmax]
+            }, [0]);
+            return {key: values.key, restyle_ms: performance.now() - start};
+        }
+    }
+});
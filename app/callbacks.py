@@ -1,4 +1,4 @@
-from dash import Input, Output
+from dash import Input, Output, State, Patch, ClientsideFunction, no_update
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
@@ -8,81 +8,145 @@ from dotenv import load_dotenv
 from sqlalchemy import create_engine
 import os
 from pathlib import Path
-import requests
-from datetime import date
 
 
 from src.data_pipelines.preprocessing.spacial_processing import load_and_prepare_shapefile
 from src.data_pipelines.preprocessing.utils import normalise_text
-from src.DB.DatabaseClient import DatabaseReader
+from .clients import api_get
+from .geometry import geojson_url, tier_for_zoom
+from .snapshots import monthly_snapshots
 
 
 
+def to_json_values(values:np.ndarray) -> list:
+    '''
+    Converts an array to a list for JSON, with missing values as None
+    '''
+    return [None if np.isnan(value) else round(float(value), 4) for value in values]
+
+def colour_range(values:np.ndarray) -> dict:
+    '''
+    The colour range of a month's values, clipped to the 2nd and 98th percentiles so a few outlying wards do not wash
+    out the rest of the map. Both ends are None if the month has no data.
+    '''
+    finite = np.sort(values[np.isfinite(values)])
+    if not len(finite):
+        return {'zmin':None, 'zmax':None}
+    quantile = lambda q: round(float(finite[min(len(finite) - 1, int(q * len(finite)))]), 4)
+    return {'zmin':quantile(0.02), 'zmax':quantile(0.98)}
+
+def map_values(snapshot:dict) -> dict:
+    '''
+    The month's values and colour range sent to the clientside update_crime_map callback
+    '''
+    return {'key':snapshot['key'], 'z':to_json_values(snapshot['values']), **colour_range(snapshot['values'])}
+
+def crime_map_figure(ward_codes:list, ward_names:list, values:np.ndarray, tier:str) -> go.Figure:
+    '''
+    Builds the base crime map. The boundaries are fetched once by the browser from the cached geometry route.
+    '''
+    z_range = colour_range(values)
+    fig = go.Figure(go.Choroplethmap(
+        geojson=geojson_url(tier),
+        locations=ward_codes,
+        z=to_json_values(values),
+        zauto=z_range['zmin'] is None,
+        **({} if z_range['zmin'] is None else z_range),
+        colorscale='RdYlGn_r',
+        showscale=False,
+        hovertext=ward_names,
+        hoverinfo='text',
+        customdata=[[ward_code] for ward_code in ward_codes]
+    ))
+    fig.update_layout(
+        map_style=None,  # disable basemap tiles
+        map_zoom=6,
+        map_center={"lat": 57.1, "lon": -4.25},
+        uirevision='crime-map'  # keep the user's zoom and position when the data changes
+    )
+
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=0, b=0),
+        paper_bgcolor="rgba(0,0,0,0)",  # transparent background
+        plot_bgcolor="rgba(0,0,0,0)",   # transparent plot area
+        mapbox_style=None,              # make sure no tiles are drawn
+        coloraxis_showscale=False
+    )
+
+    return fig
+
+
 def register_callbacks(app):
     '''
     
     '''
     @app.callback(
-        Output('crime-map', 'figure'),
+        [Output('crime-map', 'figure'),
+         Output('crime-map-wards', 'data'),
+         Output('crime-map-values', 'data')],
         [Input('crime-map-year-selector', 'value'),
-         Input('crime-map-month-selector', 'value')]
+         Input('crime-map-month-selector', 'value')],
+        [State('crime-map-wards', 'data'),
+         State('crime-map-tier', 'data')]
     )
-    def init_crime_graph(year:int, month:int):
-        database_client = DatabaseReader()
+    def init_crime_graph(year:int, month:int, ward_key:str|None, tier:str):
+        '''
+        Sends the base figure once, and afterwards only the month's values. The figure is only rebuilt if the set of
+        wards changes, the values are restyled onto the map by the clientside update_crime_map callback.
+        '''
+        snapshot = monthly_snapshots.get(year, month)
+        values = map_values(snapshot)
 
-        formatted_date = date(year, month, 1).strftime("%Y-%m-%d")
-        crime_data = requests.get(f'http://127.0.0.1:8000/history/crime?date={formatted_date}')
-        crime_data = pd.DataFrame(crime_data.json())
+        if snapshot['key'] == ward_key:
+            return no_update, no_update, values
 
-        ward_name_data = pd.DataFrame(database_client.get_ward_names())
-        ward_name_data = requests.get('http://127.0.0.1:8000/history/wards')
-        ward_name_data = pd.DataFrame(ward_name_data.json())
-        
-        crime_data = crime_data.merge(ward_name_data, on='ward_code')
-        crime_data['count'] = np.log(crime_data['count'])
-
-        CURRENT_DIR = Path(__file__).resolve()
-        for parent in CURRENT_DIR.parents:
-            if (parent / "data").exists():
-                PACKAGE_DIR = parent
-                break
-        else:
-            raise FileNotFoundError("Could not find project root containing 'data' folder")
-
-        shapefile_path = str(PACKAGE_DIR / 'data/geojson_data/scottish_wards_2022_shapefile/Wards_(May_2025)_Boundaries_UK_BFC_(V2).shp')
-        shapefile = database_client.get_shapefile()
- 
-        # shapefile, _ = load_and_prepare_shapefile(shapefile_path, 'WD25CD', 'WD25NM', '2022', 4326, normalise_text, data=shapefile)
-        geojson = shapefile.set_index("ward_code").__geo_interface__
-
-        fig = px.choropleth_map(
-            crime_data,
-            geojson=geojson,
-            locations="ward_code",
-            color="count",
-            color_continuous_scale="RdYlGn_r",
-            map_style=None,  # disable basemap tiles
-            zoom=6,
-            center={"lat": 57.1, "lon": -4.25},
-            hover_name="ward_name",
-            custom_data=["ward_code"]
-        )
+        fig = crime_map_figure(snapshot['ward_codes'], snapshot['ward_names'], snapshot['values'], tier)
+        return fig, snapshot['key'], values
 
-        fig.update_layout(
-            margin=dict(l=0, r=0, t=0, b=0),
-            paper_bgcolor="rgba(0,0,0,0)",  # transparent background
-            plot_bgcolor="rgba(0,0,0,0)",   # transparent plot area
-            mapbox_style=None,              # make sure no tiles are drawn
-            coloraxis_showscale=False
-        )
+    #Restyles the values onto the rendered map rather than returning a figure, so Dash does not redraw the polygons
+    app.clientside_callback(
+        ClientsideFunction(namespace='crime_map', function_name='update_crime_map'),
+        Output('crime-map-render', 'data'),
+        Input('crime-map-values', 'data'),
+        prevent_initial_call=True
+    )
 
-        return fig
+    @app.callback(
+        [Output('crime-map', 'figure', allow_duplicate=True),
+         Output('crime-map-tier', 'data')],
+        Input('crime-map', 'relayoutData'),
+        [State('crime-map-tier', 'data'),
+         State('crime-map-values', 'data')],
+        prevent_initial_call=True
+    )
+    def select_geometry_tier(relayoutData:dict|None, current_tier:str, values:dict|None):
+        '''
+        Swaps the map to a finer or coarser boundary tier when a zoom crosses a tier threshold. The restyled values
+        are not in Dash's copy of the figure, so the current month's values are patched in with the geometry.
+        '''
+        zoom = (relayoutData or {}).get('map.zoom')
+        if zoom is None:
+            return no_update, no_update
+
+        tier = tier_for_zoom(zoom)
+        if tier == current_tier:
+            return no_update, no_update
+
+        fig = Patch()
+        fig['data'][0]['geojson'] = geojson_url(tier)
+        if values is not None:
+            fig['data'][0]['z'] = values['z']
+            fig['data'][0]['zauto'] = values['zmin'] is None
+            fig['data'][0]['zmin'] = values['zmin']
+            fig['data'][0]['zmax'] = values['zmax']
+        return fig, tier
     
     @app.callback(
             Output('crime-plot', 'figure'),
-            Input('crime-map', 'clickData')
+            [Input('crime-map', 'clickData'),
+             Input('prediction-slider', 'value')]
     )
-    def init_crime_plot(clickData):
+    def init_crime_plot(clickData, months:int):
         ward_code = 'S13002517'
         ward_name = 'Kintyre and the Islands'
         if clickData is not None:
@@ -90,7 +154,7 @@ def register_callbacks(app):
             ward_name = clickData['points'][0]['hovertext']
             print(f"Clicked ward: {ward_name} ({ward_code})")
 
-        crime_data_object = requests.get(f'http://127.0.0.1:8000/history/crime?ward_code={ward_code}')
+        crime_data_object = api_get('/history/crime', ward_code=ward_code)
         if crime_data_object.status_code == 200:
             crime_data = crime_data_object.json()
 
@@ -100,6 +164,16 @@ def register_callbacks(app):
             x=crime_data['date'],
             y=crime_data['count']
         )
+
+        prediction_object = api_get(f'/predict/crime/{ward_code}', months=months)
+        if prediction_object.status_code == 200:
+            prediction_data = pd.DataFrame(prediction_object.json()['predictions'])
+            fig.add_scatter(
+                x=prediction_data['date'],
+                y=prediction_data['crime_prediction'],
+                mode='lines+markers',
+                name='Prediction'
+            )
         fig.update_layout(
             title=f"Crime data for ward: {ward_name}",
             xaxis_title="Area / Ward",
@@ -0,0 +1,54 @@
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from src.DB.DatabaseClient import DatabaseReader
+
+
+load_dotenv()
+#Base URL of the crime API the callbacks call
+API_BASE_URL = os.getenv('CRIME_API_URL', 'http://127.0.0.1:8000').rstrip('/')
+#Seconds to wait for the API before a callback gives up
+API_TIMEOUT = float(os.getenv('CRIME_API_TIMEOUT', 10))
+#Keep-alive connections held open to the API, one per concurrently running callback
+API_POOL_SIZE = int(os.getenv('CRIME_API_POOL_SIZE', 10))
+
+_lock = threading.Lock()
+_database_client:DatabaseReader|None = None
+_http_session:requests.Session|None = None
+
+
+def get_database_client() -> DatabaseReader:
+    '''
+    Returns the process wide database reader, so every callback shares one engine and connection pool
+    '''
+    global _database_client
+    if _database_client is None:
+        with _lock:
+            if _database_client is None:
+                _database_client = DatabaseReader()
+    return _database_client
+
+def get_http_session() -> requests.Session:
+    '''
+    Returns the process wide HTTP session, which keeps its connections to the API alive between callbacks
+    '''
+    global _http_session
+    if _http_session is None:
+        with _lock:
+            if _http_session is None:
+                session = requests.Session()
+                session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE))
+                session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE))
+                _http_session = session
+    return _http_session
+
+def api_get(path:str, **params) -> requests.Response:
+    '''
+    Sends a GET request to the crime API over the shared session
+    '''
+    params = {key:value for key, value in params.items() if value is not None}
+    return get_http_session().get(f'{API_BASE_URL}{path}', params=params, timeout=API_TIMEOUT)
@@ -0,0 +1,161 @@
+import gzip
+import hashlib
+import threading
+from typing import Callable, Dict, List
+
+import geopandas as gpd
+from flask import Flask, Response, abort, request
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.data_pipelines.preprocessing.spacial_processing import to_compact_geojson
+from .clients import get_database_client
+
+
+#URL the ward boundaries are served from per simplification tier, the map figure points its geojson at this
+GEOJSON_ROUTE = '/geometry/wards/<tier>.geojson'
+#Zoom level up to which each simplification tier is shown, coarsest tier first, the finest tier is shown beyond them
+ZOOM_BREAKS = [7.0, 9.0]
+#Tier the map starts on, the coarsest tier is used if the boundary pipeline did not build one of this name
+DEFAULT_TIER = 'low'
+#Browsers may reuse the boundaries for a day before revalidating them with the ETag
+CACHE_MAX_AGE = 86400
+
+
+class GeometryArtifact():
+    '''
+    The ward boundaries serialised once to compact GeoJSON and held in memory, along with a gzipped copy and an ETag.
+    The geometry only changes when the boundary pipeline runs, so it is loaded on first use and kept until reload.
+    '''
+    def __init__(self, load_geometry=None) -> None:
+        self._load_geometry = load_geometry or (lambda: get_database_client().get_shapefile())
+        self._lock = threading.Lock()
+        self.body:bytes|None = None
+        self.gzipped:bytes|None = None
+        self.etag:str|None = None
+        self.ward_codes:list = []
+
+    def get(self) -> 'GeometryArtifact':
+        if self.body is None:
+            with self._lock:
+                if self.body is None:
+                    self._build()
+        return self
+
+    def reload(self) -> 'GeometryArtifact':
+        with self._lock:
+            self._build()
+        return self
+
+    def _build(self) -> None:
+        shapefile = self._load_geometry()
+        body = to_compact_geojson(shapefile, 'ward_code').encode('utf-8')
+
+        self.ward_codes = shapefile['ward_code'].tolist()
+        self.gzipped = gzip.compress(body, compresslevel=9)
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.body = body
+        print(f"✅Built ward geometry ({len(body) / 1e6:.2f} MB, {len(self.gzipped) / 1e6:.2f} MB gzipped)")
+
+
+def geojson_url(tier:str) -> str:
+    return GEOJSON_ROUTE.replace('<tier>', tier)
+
+def load_tier(tier:str) -> gpd.GeoDataFrame:
+    '''
+    Loads the boundaries for a tier, falling back to the default boundaries if the tiers have not been built yet
+    '''
+    database_client = get_database_client()
+    try:
+        shapefile = database_client.get_shapefile(tier)
+    except SQLAlchemyError as e:
+        print(f'Warning: Could not load boundary tier {tier}, using the default boundaries: {e}')
+        shapefile = gpd.GeoDataFrame()
+
+    return shapefile if not shapefile.empty else database_client.get_shapefile()
+
+def load_tier_names() -> List[str]:
+    '''
+    Returns the simplification tiers built by the boundary pipeline, coarsest first, or just the default tier if none
+    have been built yet
+    '''
+    try:
+        tiers = [row['tier'] for row in get_database_client().get_boundary_tiers()]
+    except SQLAlchemyError as e:
+        print(f'Warning: Could not load the boundary tiers, using the default boundaries: {e}')
+        tiers = []
+    return tiers or [DEFAULT_TIER]
+
+
+class GeometryTiers():
+    '''
+    The geometry artifact of every simplification tier in ward_boundary_tiers. The tiers are read on first use, and
+    reload reads them again along with every tier's geometry, e.g. after the boundary pipeline has run.
+    '''
+    def __init__(self, load_tier_names:Callable[[], List[str]]=load_tier_names, load_tier:Callable[[str], gpd.GeoDataFrame]=load_tier) -> None:
+        self._load_tier_names = load_tier_names
+        self._load_tier = load_tier
+        self._lock = threading.Lock()
+        self._artifacts:Dict[str, GeometryArtifact]|None = None
+
+    def artifacts(self) -> Dict[str, GeometryArtifact]:
+        if self._artifacts is None:
+            with self._lock:
+                if self._artifacts is None:
+                    self._artifacts = self._build_artifacts()
+        return self._artifacts
+
+    def reload(self) -> 'GeometryTiers':
+        with self._lock:
+            artifacts = self._build_artifacts()
+            for artifact in artifacts.values():
+                artifact.get()
+            self._artifacts = artifacts
+        return self
+
+    def _build_artifacts(self) -> Dict[str, GeometryArtifact]:
+        return {tier:GeometryArtifact(lambda tier=tier: self._load_tier(tier)) for tier in self._load_tier_names()}
+
+    def default(self) -> GeometryArtifact:
+        artifacts = self.artifacts()
+        return artifacts.get(DEFAULT_TIER) or next(iter(artifacts.values()))
+
+    def tier_for_zoom(self, zoom:float) -> str:
+        '''
+        Picks the coarsest simplification tier that still looks right at a map zoom level
+        '''
+        tiers = list(self.artifacts())
+        for tier, max_zoom in zip(tiers, ZOOM_BREAKS):
+            if zoom < max_zoom:
+                return tier
+        return tiers[-1]
+
+
+ward_geometry = GeometryTiers()
+
+def tier_for_zoom(zoom:float) -> str:
+    return ward_geometry.tier_for_zoom(zoom)
+
+
+def register_geometry_route(server:Flask, tiers:GeometryTiers=ward_geometry) -> None:
+    '''
+    Serves the ward boundaries of each tier with an ETag and Cache-Control, answering revalidations with 304 Not Modified
+    '''
+    @server.route(GEOJSON_ROUTE)
+    def ward_geojson(tier:str):
+        artifact = tiers.artifacts().get(tier)
+        if artifact is None:
+            abort(404)
+        geometry = artifact.get()
+
+        if request.if_none_match.contains(geometry.etag):
+            response = Response(status=304)
+        elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = Response(geometry.gzipped, mimetype='application/geo+json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(geometry.body, mimetype='application/geo+json')
+
+        response.set_etag(geometry.etag)
+        response.headers['Cache-Control'] = f'public, max-age={CACHE_MAX_AGE}'
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
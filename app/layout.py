@@ -1,6 +1,8 @@
 from dash import dcc, html
 import calendar
 
+from .geometry import DEFAULT_TIER
+
 layout = html.Div([
     html.Div([
         html.Div([
@@ -64,6 +66,10 @@ layout = html.Div([
                     )
                 ], className='slider-container', style={'width': '80%', 'margin': '0 auto'})
             ], style={'display':'flex', 'flex-direction':'row'}),
+            dcc.Store(id='crime-map-tier', data=DEFAULT_TIER),
+            dcc.Store(id='crime-map-wards'),
+            dcc.Store(id='crime-map-values'),
+            dcc.Store(id='crime-map-render'),
             dcc.Graph(
                 id='crime-map',
                 config={"displayModeBar": False, "responsive": True},
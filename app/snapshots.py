@@ -0,0 +1,128 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from .clients import api_get
+from .geometry import ward_geometry
+
+
+#Seconds between checks of the API's store version, a changed version means a pipeline load has been picked up
+VERSION_CHECK_INTERVAL = 30
+#Tables the served geometry is built from, the geometry is reloaded whenever one of their versions changes
+BOUNDARY_TABLES = ('ward_boundary_data', 'ward_boundary_tiers')
+
+
+class MonthlySnapshots():
+    '''
+    The crime map data for every month, precomputed in one pass. Each month holds the log crime count per ward as a
+    vector aligned to the ward order of the cached geometry, so a slider change is a dictionary lookup.
+
+    The snapshots are rebuilt whenever the API's ward store version changes, i.e. after a pipeline load and store reload.
+    If the boundary tables changed too, the cached geometry is reloaded first, so the values are aligned to the new
+    ward order in the same step.
+    '''
+    def __init__(self, version_check_interval:float=VERSION_CHECK_INTERVAL) -> None:
+        self.version_check_interval = version_check_interval
+        self._lock = threading.Lock()
+        self._snapshot:dict|None = None
+        self._version:tuple|None = None
+        self._last_version_check = 0.0
+
+    def warm(self) -> 'MonthlySnapshots':
+        '''
+        Builds the snapshots now, e.g. at startup, rather than on the first slider change
+        '''
+        with self._lock:
+            self._build(self._store_version())
+        return self
+
+    def warm_in_background(self) -> threading.Thread:
+        def warm():
+            try:
+                self.warm()
+            except Exception as e:
+                print(f'Warning: Could not warm the monthly crime snapshots: {e}')
+
+        thread = threading.Thread(target=warm, daemon=True)
+        thread.start()
+        return thread
+
+    def get(self, year:int, month:int) -> dict:
+        '''
+        Returns the ward codes and names in geometry order, a key that changes whenever they do, and the log crime
+        count of every ward for a month, with NaN for wards without data
+        '''
+        snapshot = self._refresh_if_changed()
+        values = snapshot['months'].get(date(year, month, 1))
+        if values is None:
+            values = np.full(len(snapshot['ward_codes']), np.nan)
+        return {'key':snapshot['key'], 'ward_codes':snapshot['ward_codes'], 'ward_names':snapshot['ward_names'], 'values':values}
+
+    def _refresh_if_changed(self) -> dict:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_version_check < self.version_check_interval:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._last_version_check >= self.version_check_interval:
+                version = self._store_version()
+                if self._snapshot is None or version != self._version:
+                    if self._snapshot is not None and version is not None and self._boundary_version(version) != self._boundary_version(self._version):
+                        ward_geometry.reload()
+                    self._build(version)
+            return self._snapshot
+
+    def _store_version(self) -> tuple|None:
+        '''
+        Returns the API store's version and load time, which together change on every reload or API restart, and the
+        versions of the boundary tables
+        '''
+        self._last_version_check = time.monotonic()
+        response = api_get('/admin/store')
+        if response.status_code != 200:
+            return None
+        info = response.json()
+        table_versions = info.get('table_versions', {})
+        return (info['version'], info['loaded_at'], tuple(table_versions.get(table_name) for table_name in BOUNDARY_TABLES))
+
+    @staticmethod
+    def _boundary_version(version:tuple|None) -> tuple|None:
+        return version[2] if version is not None else None
+
+    def _build(self, version:tuple|None) -> None:
+        crime_data = pd.DataFrame(api_get('/history/crime').json())
+        ward_name_data = pd.DataFrame(api_get('/history/wards').json())
+
+        ward_codes = ward_geometry.default().get().ward_codes
+        ward_index = pd.Index(ward_codes)
+        names = ward_name_data.set_index('ward_code')['ward_name']
+
+        crime_data['date'] = pd.to_datetime(crime_data['date']).dt.date
+        crime_data['ward_idx'] = ward_index.get_indexer(crime_data['ward_code'])
+        crime_data = crime_data[crime_data['ward_idx'] >= 0]
+        with np.errstate(divide='ignore'):
+            crime_data['log_count'] = np.log(crime_data['count'].to_numpy(dtype=float))
+
+        months = {}
+        for month, group in crime_data.groupby('date'):
+            values = np.full(len(ward_codes), np.nan)
+            values[group['ward_idx'].to_numpy()] = group['log_count'].to_numpy()
+            months[month] = values
+
+        ward_names = names.reindex(ward_codes).fillna('').tolist()
+        self._snapshot = {
+            'key':hashlib.sha1(json.dumps([list(ward_codes), ward_names]).encode('utf-8')).hexdigest(),
+            'ward_codes':list(ward_codes),
+            'ward_names':ward_names,
+            'months':months
+        }
+        self._version = version
+        print(f"✅Built crime map snapshots for {len(months)} months")
+
+
+monthly_snapshots = MonthlySnapshots()
@@ -0,0 +1,99 @@
+'''
+Compares the crime map callback payload and build time before and after the figure patching rework.
+
+The old callback rebuilt a px.choropleth_map with every ward polygon embedded on each slider move. The new one sends the
+base figure once, with the geometry as a URL, and afterwards only the month's value vector. Geometry is read from the
+database, or synthetic wards are generated with --synthetic.
+
+It also compares what the browser hands Plotly on each slider move: a whole new figure for Plotly.react, as the first
+clientside callback returned, against the z and colour range update given to Plotly.restyle. The restyle time itself
+is reported by the clientside callback in the crime-map-render store, as it can only be measured in a browser.
+
+    python -m benchmarks.map_payload --synthetic 355
+'''
+import argparse
+import json
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from plotly.utils import PlotlyJSONEncoder
+from shapely.geometry import Polygon
+
+from app.callbacks import crime_map_figure, map_values, to_json_values
+
+
+def synthetic_wards(n_wards:int, n_vertices:int=500) -> gpd.GeoDataFrame:
+    '''
+    Ring shaped wards with roughly the vertex count of the real 0.002 simplified boundaries
+    '''
+    rng = np.random.default_rng(0)
+    angles = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    polygons = []
+    for i in range(n_wards):
+        radius = 0.05 * (1 + 0.1 * rng.standard_normal(n_vertices).cumsum() / np.sqrt(n_vertices))
+        x = -5 + (i % 20) * 0.15 + np.abs(radius) * np.cos(angles)
+        y = 55 + (i // 20) * 0.15 + np.abs(radius) * np.sin(angles)
+        polygons.append(Polygon(np.column_stack([x, y])).buffer(0))
+    return gpd.GeoDataFrame({'ward_code':[f'S13{i:06d}' for i in range(n_wards)]}, geometry=polygons, crs=4326)
+
+def timed(func, repeats:int):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return result, (time.perf_counter() - start) / repeats * 1000
+
+def main(n_synthetic:int|None, repeats:int) -> None:
+    if n_synthetic:
+        shapefile = synthetic_wards(n_synthetic)
+    else:
+        from app.clients import get_database_client
+        shapefile = get_database_client().get_shapefile()
+
+    ward_codes = shapefile['ward_code'].tolist()
+    ward_names = [f'ward {i}' for i in range(len(ward_codes))]
+    values = np.log(np.random.default_rng(1).integers(1, 500, len(ward_codes)).astype(float))
+    crime_data = pd.DataFrame({'ward_code':ward_codes, 'ward_name':ward_names, 'count':values})
+
+    def old_callback():
+        geojson = shapefile.set_index('ward_code').__geo_interface__
+        fig = px.choropleth_map(crime_data, geojson=geojson, locations='ward_code', color='count',
+                                color_continuous_scale='RdYlGn_r', zoom=6, center={'lat':57.1, 'lon':-4.25},
+                                hover_name='ward_name', custom_data=['ward_code'])
+        return fig.to_plotly_json()
+
+    def new_base_figure():
+        return crime_map_figure(ward_codes, ward_names, values, 'low').to_plotly_json()
+
+    def new_slider_move():
+        return map_values({'key':'', 'values':values})
+
+    def react_figure():
+        figure = new_base_figure()
+        figure['data'][0]['z'] = to_json_values(values)
+        return figure
+
+    def restyle_update():
+        update = map_values({'key':'', 'values':values})
+        return {'z':[update['z']], 'zauto':[update['zmin'] is None], 'zmin':[update['zmin']], 'zmax':[update['zmax']]}
+
+    print(f'{len(ward_codes)} wards, mean of {repeats} runs')
+    print(f'{"callback":<30}{"payload KB":>12}{"build + serialise ms":>24}')
+    for name, func in [('before: every slider move', old_callback), ('after: first load', new_base_figure), ('after: every slider move', new_slider_move)]:
+        result, build_ms = timed(lambda: json.dumps(func(), cls=PlotlyJSONEncoder), repeats)
+        print(f'{name:<30}{len(result.encode("utf-8")) / 1e3:>12.1f}{build_ms:>24.1f}')
+
+    print(f'\n{"handed to Plotly per move":<30}{"KB":>12}{"updates":>24}')
+    for name, func in [('before: Plotly.react figure', react_figure), ('after: Plotly.restyle update', restyle_update)]:
+        result = json.dumps(func(), cls=PlotlyJSONEncoder)
+        print(f'{name:<30}{len(result.encode("utf-8")) / 1e3:>12.1f}{"whole figure" if "data" in func() else "z, zmin, zmax":>24}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', type=int, default=None, help='Generate this many synthetic wards instead of reading the database')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    main(args.synthetic, args.repeats)
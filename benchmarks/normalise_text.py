@@ -0,0 +1,88 @@
+'''
+Benchmarks ward name normalisation on a crime extract, comparing the original regex implementation applied per row
+with the cached scalar normalise_text and the vectorised normalise_series.
+
+The crime sheets repeat every ward name once per crime type and month. Without --path a synthetic extract with the
+same shape is used: the ward names in the config, padded out to 355 wards, repeated for --rows rows.
+
+    python -m benchmarks.normalise_text --path crime_2023.xlsx
+'''
+import argparse
+import json
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.data_pipelines.preprocessing.utils import normalise_text, normalise_series
+
+
+#Wards in the 2022 boundaries
+N_WARDS = 355
+CONFIG_PATH = Path(__file__).resolve().parents[1] / 'src/data_pipelines/pipelines/config/transformations.json'
+
+
+def regex_normalise_text(string:str) -> str:
+    '''
+    The original implementation, 13 re.sub calls and an NFKD round trip per string
+    '''
+    if pd.isna(string):
+        return ''
+    string = string.lower()
+    for pattern in [' and ', '&', '/', ',', r'[.]', '-', "'", r'[()]', r'[’]', r"\s+", 'agus', 'ward$']:
+        string = re.sub(pattern, '', string)
+    normalized = unicodedata.normalize('NFKD', string)
+    return normalized.encode('ASCII', 'ignore').decode('utf-8')
+
+def synthetic_extract(n_rows:int) -> pd.Series:
+    with open(CONFIG_PATH, 'r') as f:
+        config = json.load(f)
+
+    names = set(config['crime_data']['transformations']['mannual_ward_edits'])
+    for section in config.values():
+        names.update(section.get('transformations', {}).get('name_disambiguation', {}).values())
+    #Pad out to the number of wards in Scotland with made up names in the same style
+    words = ['Loch', 'Glen', 'Strath', 'Ben', 'Kil', 'Inver', 'Dun', 'Aber', 'Ard', 'Bal', 'Craig', 'Drum', 'Auch', 'Rose', 'Kirk']
+    places = ['Ness', "St. Andrew's", 'Clyde', 'Spey', 'Tay', 'Forth', 'Ardnamurchan', 'Eilean Ã¡ ChÃ¨o', 'Islands', 'North East', 'Ward']
+    combos = [f'{a}{b.lower()} and {c}' for a in words for b in words for c in places]
+    names = sorted(names) + combos[:max(0, N_WARDS - len(names))]
+
+    rng = np.random.default_rng(0)
+    return pd.Series(np.array(names, dtype=object)[rng.integers(0, len(names), n_rows)], name='ward_name_2022')
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+def main(path:str|None, column:str, n_rows:int) -> None:
+    if path is not None:
+        names = pd.read_excel(path, usecols=[column])[column]
+    else:
+        names = synthetic_extract(n_rows)
+    print(f'{len(names):,} rows, {names.nunique():,} distinct names')
+
+    expected = names.apply(regex_normalise_text)
+    assert names.apply(normalise_text).equals(expected)
+    assert normalise_series(names).equals(expected)
+
+    results = {
+        'regex, Series.apply':timed(lambda: names.apply(regex_normalise_text)),
+        'normalise_text (cached), apply':timed(lambda: names.apply(normalise_text)),
+        'normalise_series':timed(lambda: normalise_series(names))
+    }
+    baseline = results['regex, Series.apply']
+    for name, ms in results.items():
+        print(f'{name:<32}{ms:>10.1f} ms{baseline / ms:>8.1f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default=None, help='A crime extract workbook')
+    parser.add_argument('--column', default='PSOS_MMW_Name', help='The ward name column of the extract')
+    parser.add_argument('--rows', type=int, default=500000, help='Rows in the synthetic extract')
+    args = parser.parse_args()
+    main(args.path, args.column, args.rows)
@@ -1,12 +1,35 @@
+import io
 import os
-from typing import List
+import time
+from datetime import datetime
+from typing import List, Tuple
 
+import numpy as np
 import pandas as pd
 import geopandas as gpd
-from sqlalchemy import create_engine, text
-from sqlalchemy.exc import SQLAlchemyError, OperationalError, IntegrityError
+import shapely
+from sqlalchemy import create_engine, text, inspect, types, URL, make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.exc import SQLAlchemyError, OperationalError, IntegrityError, ProgrammingError
 from dotenv import load_dotenv
 
+#Table holding a version number per data table, bumped by DatabaseWriter on every update
+TABLE_VERSIONS_TABLE = 'table_versions'
+#Table recording which source files have been loaded into each data table, and the checksum they were loaded at
+INGESTION_LOG_TABLE = 'ingestion_log'
+#Rows sent per COPY chunk when bulk loading
+DEFAULT_COPY_CHUNK_SIZE = 50000
+#Primary key columns of every table, recreated after each replace
+TABLE_KEYS = {
+    'ward_crime':['ward_code', 'date'],
+    'ward_education_data':['ward_code', 'date'],
+    'ward_employemnt_data':['ward_code', 'date'],
+    'ward_population_density':['ward_code', 'date'],
+    'ward_code_name':['ward_code'],
+    'ward_boundary_data':['ward_code'],
+    'ward_boundary_tiers':['ward_code', 'tier']
+}
+
 class DatabasePushError(BaseException):
     def __init__(self, message:str, code:int = 500, details:dict|None=None) -> None:
         super().__init__(message)
@@ -24,11 +47,134 @@ class BaseDatabaseClient:
         if not self.db_url:
             raise ValueError('SUPABASE_DB_URL not found in environment variables.')
 
-        self.engine = create_engine(
+        self.engine = self._build_engine()
+
+    def _build_engine(self):
+        return create_engine(
             url = self.db_url,   
         )
 
-class DatabaseReader(BaseDatabaseClient):
+class WardQueries:
+    '''
+    Builds the SQL and parameters of every ward query, shared by the sync and async readers so they run the same
+    queries. Each method returns a (sql, params) pair.
+    '''
+    def crime_data_query(self, ward_code:str|None=None, date:str|None=None) -> Tuple[str, dict]:
+        where, params = self._where_clause(ward_code=ward_code, date=date)
+        sql = f'''
+            SELECT "count", ward_code, date
+            FROM ward_crime
+            {where}
+            ORDER BY ward_code, date
+        '''
+        return sql, params
+
+    def ward_names_query(self) -> Tuple[str, dict]:
+        sql = '''
+            SELECT ward_code, ward_name
+            FROM ward_code_name
+        '''
+        return sql, {}
+
+    def education_data_query(self, ward_code:str|None=None, date:str|None=None) -> Tuple[str, dict]:
+        where, params = self._where_clause(ward_code=ward_code, date=date)
+        sql = f'''
+            SELECT ward_code, date, pop_with_qual, pop_without_qual
+            FROM ward_education_data
+            {where}
+            ORDER BY ward_code, date
+        '''
+        return sql, params
+
+    def employment_data_query(self, ward_code:str|None=None, date:str|None=None) -> Tuple[str, dict]:
+        where, params = self._where_clause(ward_code=ward_code, date=date)
+        sql = f'''
+            SELECT ward_code, date, unemployed_adults, long_term_sick_or_disabled, caring_for_family
+            FROM ward_employemnt_data
+            {where}
+            ORDER BY ward_code, date
+        '''
+        return sql, params
+
+    def population_data_query(self, ward_code:str|None=None, date:str|None=None) -> Tuple[str, dict]:
+        where, params = self._where_clause(ward_code=ward_code, date=date)
+        sql = f'''
+            SELECT ward_code, date, population_density
+            FROM ward_population_density
+            {where}
+            ORDER BY ward_code, date
+        '''
+        return sql, params
+
+    def ward_history_query(self, ward_codes:List[str]|None=None) -> Tuple[str, dict]:
+        '''
+        The joined crime, education, employment and population history for a set of wards, or every ward if no ward
+        codes are given
+        '''
+        where = 'WHERE wc.ward_code = ANY(:ward_codes)' if ward_codes is not None else ''
+        sql = f'''
+            SELECT wc.ward_code, wc.date, wc.count,
+                we.pop_with_qual, we.pop_without_qual,
+                wed.unemployed_adults, wed.long_term_sick_or_disabled, wed.caring_for_family,
+                wd.population_density
+            FROM ward_crime wc
+            JOIN ward_education_data we
+            ON wc.ward_code = we.ward_code AND wc.date = we.date
+            JOIN ward_employemnt_data wed
+            ON wc.ward_code = wed.ward_code AND wc.date = wed.date
+            JOIN ward_population_density wd
+            ON wc.ward_code = wd.ward_code AND wc.date = wd.date
+            {where}
+            ORDER BY wc.ward_code, wc.date
+        '''
+        params = {'ward_codes':list(ward_codes)} if ward_codes is not None else {}
+        return sql, params
+
+    def shapefile_query(self, tier:str|None=None) -> Tuple[str, dict]:
+        '''
+        The ward boundaries at a named simplification tier, or the default boundaries if no tier is given
+        '''
+        if tier is None:
+            sql = '''
+                SELECT ward_code, geometry
+                FROM ward_boundary_data
+            '''
+            return sql, {}
+
+        sql = '''
+            SELECT ward_code, geometry
+            FROM ward_boundary_tiers
+            WHERE tier = :tier
+            ORDER BY ward_code
+        '''
+        return sql, {'tier':tier}
+
+    def boundary_tiers_query(self) -> Tuple[str, dict]:
+        '''
+        Every simplification tier with its tolerance and total vertex count, coarsest first
+        '''
+        sql = '''
+            SELECT tier, tolerance, SUM(n_vertices) AS n_vertices
+            FROM ward_boundary_tiers
+            GROUP BY tier, tolerance
+            ORDER BY tolerance DESC
+        '''
+        return sql, {}
+
+    @staticmethod
+    def _where_clause(**filters) -> Tuple[str, dict]:
+        '''
+        Builds a WHERE clause of equality predicates for the filters that are actually set, so Postgres can use the
+        (ward_code, date) index instead of scanning the whole table
+        '''
+        params = {col:value for col, value in filters.items() if value is not None}
+        if not params:
+            return '', params
+
+        return 'WHERE ' + ' AND '.join(f'{col} = :{col}' for col in params), params
+
+
+class DatabaseReader(BaseDatabaseClient, WardQueries):
     def __init__(self, DB_URL:str|None=None) -> None:
         super().__init__(DB_URL)
 
@@ -41,87 +187,156 @@ class DatabaseReader(BaseDatabaseClient):
             return pd.read_sql(text(sql), conn, params=params).to_dict(orient='records')
         
     def get_crime_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
-        '''
-        
-        '''
-        sql = '''
-            SELECT * 
-            FROM ward_crime
-            WHERE (ward_code = COALESCE(:ward_code, ward_code)) 
-            AND (date = COALESCE(:date, date))
-        '''
-        return self.fetch(sql, {'ward_code':ward_code, 'date':date})
+        return self.fetch(*self.crime_data_query(ward_code, date))
     
     def get_ward_names(self) -> List[dict]:
-        '''
-        
-        '''
-        sql = '''
-            SELECT ward_code, ward_name
-            FROM ward_code_name
-        '''
-        return self.fetch(sql)
+        return self.fetch(*self.ward_names_query())
     
     def get_education_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return self.fetch(*self.education_data_query(ward_code, date))
+    
+    def get_employment_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return self.fetch(*self.employment_data_query(ward_code, date))
+
+    def get_population_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return self.fetch(*self.population_data_query(ward_code, date))
+
+    def get_ward_history(self, ward_codes:List[str]|None=None) -> List[dict]:
         '''
-        
+        Fetches the joined crime, education, employment and population history for a set of wards in a single query.
+        If no ward codes are given the history for every ward is returned.
         '''
+        return self.fetch(*self.ward_history_query(ward_codes))
 
-        sql = '''
-            SELECT *
-            FROM ward_education_data
-            WHERE (:ward_code IS NULL or ward_code = :ward_code)
-            AND (:date IS NULL or date = :date)
+    def get_shapefile(self, tier:str|None=None):
         '''
-
-        return self.fetch(sql, {'ward_code':ward_code, 'date':date})
-    
-    def get_employment_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        Returns the ward boundaries, either at a named simplification tier or the default boundaries if no tier is given
         '''
-        
+        return self._read_postgis(*self.shapefile_query(tier))
+
+    def get_boundary_tiers(self):
         '''
-        sql = '''
-            SELECT *
-            FROM ward_employemnt_data
-            WHERE (:ward_code IS NULL or ward_code = :ward_code)
-            AND (:date IS NULL or date = :date)
+        Returns every simplification tier with its tolerance and total vertex count, coarsest first
         '''
-        
-        return self.fetch(sql, {'ward_code':ward_code, 'date':date})
-    
+        return self.fetch(*self.boundary_tiers_query())
 
-    def get_population_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+    def get_table_versions(self) -> dict:
         '''
-        
+        Reads the current version of every table, returning an empty dict if nothing has been versioned yet
         '''
-        sql = '''
-            SELECT * 
-            FROM ward_population_density
-            WHERE (:ward_code IS NULL or ward_code = :ward_code)
-            AND (:date IS NULL or date = :date)
+        sql = f'''
+            SELECT table_name, version
+            FROM {TABLE_VERSIONS_TABLE}
         '''
-        
-        return self.fetch(sql, {'ward_code':ward_code, 'date':date})
+        try:
+            with self.engine.connect() as conn:
+                return {table_name:version for table_name, version in conn.execute(text(sql))}
+        except (ProgrammingError, OperationalError):
+            return {}
+
+    def _read_postgis(self, sql:str, params:dict|None=None) -> gpd.GeoDataFrame:
+        return gpd.read_postgis(text(sql), con=self.engine, geom_col='geometry', params=params)
     
-    def get_shapefile(self):
+class AsyncDatabaseReader(BaseDatabaseClient, WardQueries):
+    '''
+    An asyncio reader backed by a pooled SQLAlchemy async engine on asyncpg.
+
+    It runs the same queries as DatabaseReader, but every getter is a coroutine, e.g.
+    rows = await reader.get_crime_data(ward_code). It is deliberately not a DatabaseReader, so it cannot be passed
+    where sync getters are expected. The pool is sized by pool_size and max_overflow, which default to the
+    DB_POOL_SIZE and DB_MAX_OVERFLOW environment variables.
+    '''
+    def __init__(self, DB_URL:str|None=None, pool_size:int|None=None, max_overflow:int|None=None) -> None:
+        self.pool_size = pool_size if pool_size is not None else int(os.getenv('DB_POOL_SIZE', 10))
+        self.max_overflow = max_overflow if max_overflow is not None else int(os.getenv('DB_MAX_OVERFLOW', 5))
+        super().__init__(DB_URL)
+
+    def _build_engine(self):
+        return create_async_engine(
+            url = self.async_url(self.db_url),
+            pool_size = self.pool_size,
+            max_overflow = self.max_overflow,
+            pool_pre_ping = True
+        )
+
+    @staticmethod
+    def async_url(db_url:str) -> URL:
         '''
-        
+        Converts a postgres URL to use the asyncpg driver, translating libpq's sslmode into asyncpg's ssl
         '''
+        url = make_url(db_url).set(drivername='postgresql+asyncpg')
+        if 'sslmode' in url.query:
+            query = dict(url.query)
+            query['ssl'] = query.pop('sslmode')
+            url = url.set(query=query)
+        return url
 
-        sql = '''
-            SELECT *
-            FROM ward_boundary_data
+    async def fetch(self, sql:str, params:dict|None=None) -> List[dict]:
+        '''
+        Runs a query on a pooled connection and returns the rows as a list of dicts
         '''
+        async with self.engine.connect() as conn:
+            result = await conn.execute(text(sql), self._coerce_params(params))
+            return [dict(row) for row in result.mappings()]
+
+    async def get_crime_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return await self.fetch(*self.crime_data_query(ward_code, date))
+
+    async def get_ward_names(self) -> List[dict]:
+        return await self.fetch(*self.ward_names_query())
+
+    async def get_education_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return await self.fetch(*self.education_data_query(ward_code, date))
+
+    async def get_employment_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return await self.fetch(*self.employment_data_query(ward_code, date))
+
+    async def get_population_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return await self.fetch(*self.population_data_query(ward_code, date))
+
+    async def get_ward_history(self, ward_codes:List[str]|None=None) -> List[dict]:
+        return await self.fetch(*self.ward_history_query(ward_codes))
+
+    async def get_shapefile(self, tier:str|None=None) -> gpd.GeoDataFrame:
+        return await self._read_postgis(*self.shapefile_query(tier))
+
+    async def get_boundary_tiers(self) -> List[dict]:
+        return await self.fetch(*self.boundary_tiers_query())
+
+    async def _read_postgis(self, sql:str, params:dict|None=None) -> gpd.GeoDataFrame:
+        async with self.engine.connect() as conn:
+            return await conn.run_sync(lambda sync_conn: gpd.read_postgis(text(sql), con=sync_conn, geom_col='geometry', params=params))
+
+    async def dispose(self) -> None:
+        await self.engine.dispose()
+
+    @staticmethod
+    def _coerce_params(params:dict|None) -> dict:
+        '''
+        asyncpg does not cast strings to timestamps, so date parameters are parsed before being sent
+        '''
+        params = dict(params or {})
+        if isinstance(params.get('date'), str):
+            params['date'] = datetime.fromisoformat(params['date'])
+        return params
+
 
-        return gpd.read_postgis(sql, con=self.engine, geom_col='geometry')
-    
 class DatabaseWriter(BaseDatabaseClient):
     def __init__(self, DB_URL: str | None = None) -> None:
         super().__init__(DB_URL)
 
-    def update_database(self, data:pd.DataFrame, table_name:str):
+    def update_database(self, data:pd.DataFrame, table_name:str, mode:str='replace'):
+        '''
+        Writes a dataframe to a table. In 'replace' mode the whole table is rewritten, in 'upsert' mode only new or
+        changed rows are written, keyed on the table's primary key.
+        '''
+        if mode == 'upsert':
+            return self.upsert(data, table_name)
+        if mode != 'replace':
+            raise ValueError(f"mode must be 'replace' or 'upsert', got {mode}")
+
         try:
-            data.to_sql(table_name, self.engine, if_exists='replace', index=False)
+            self.bulk_load(data, table_name, if_exists='replace')
             print("✅Successfully updated database values")
         except IntegrityError as e:
             print(f'IntegrityError: Duplicate or invalid data for {table_name}')
@@ -133,19 +348,327 @@ class DatabaseWriter(BaseDatabaseClient):
             print('Database error: {e}')
             raise
 
-    def update_from_gpd(self, data:gpd.GeoDataFrame, table_name:str):
+    def update_from_gpd(self, data:gpd.GeoDataFrame, table_name:str, mode:str='replace'):
+        '''
+        Writes a geodataframe to a PostGIS table, either replacing the table or upserting changed rows
+        '''
+        if mode == 'upsert':
+            return self.upsert(self._geometry_to_ewkb(data), table_name)
+        if mode != 'replace':
+            raise ValueError(f"mode must be 'replace' or 'upsert', got {mode}")
+
         try:
-            data.to_postgis(
-                name=table_name,
-                con=self.engine,
-                if_exists="replace", 
-                index=False
-            )
+            #The replace, the primary key and the version bump commit together, so readers see either the old or the
+            #new keyed table, never a missing or unkeyed one
+            with self.engine.begin() as conn:
+                data.to_postgis(
+                    name=table_name,
+                    con=conn,
+                    if_exists="replace", 
+                    index=False
+                )
+                self.create_table_keys(table_name, conn)
+                self.bump_table_version(table_name, conn)
             print("✅Successfully updated database values")
         except SQLAlchemyError as e:
             print(f'Database error: {e}')
             raise
 
+    def bulk_load(self, data:pd.DataFrame, table_name:str, if_exists:str='replace', chunk_size:int|None=None) -> dict:
+        '''
+        Loads a dataframe by streaming it through COPY FROM STDIN in CSV chunks, which is far faster than the row by row
+        INSERTs of to_sql. With if_exists='replace' the table is recreated from the dataframe's schema and given its
+        primary key in the same transaction, so readers see either the old or the new keyed table, never an empty one.
+
+        The chunk size defaults to the DB_COPY_CHUNK_SIZE environment variable. Returns the load throughput.
+        '''
+        if if_exists not in ('replace', 'append'):
+            raise ValueError(f"if_exists must be 'replace' or 'append', got {if_exists}")
+        chunk_size = chunk_size or int(os.getenv('DB_COPY_CHUNK_SIZE', DEFAULT_COPY_CHUNK_SIZE))
+
+        start = time.perf_counter()
+        with self.engine.begin() as conn:
+            create_table = if_exists == 'replace' or not inspect(conn).has_table(table_name)
+            if create_table:
+                #The column types come from the whole frame, as an empty object column would always be created as TEXT
+                data.head(0).to_sql(table_name, conn, if_exists='replace', index=False, dtype=self.sql_dtypes(data))
+            cursor = conn.connection.cursor()
+            n_bytes = self._copy_dataframe(cursor, data, table_name, chunk_size)
+            if create_table:
+                self.create_table_keys(table_name, conn)
+        elapsed = time.perf_counter() - start
+
+        self.bump_table_version(table_name)
+
+        stats = {
+            'table_name':table_name,
+            'rows':len(data),
+            'megabytes':n_bytes / 1e6,
+            'seconds':elapsed,
+            'rows_per_second':len(data) / elapsed if elapsed else float('inf'),
+            'megabytes_per_second':n_bytes / 1e6 / elapsed if elapsed else float('inf')
+        }
+        print(f"Loaded {stats['rows']:,} rows ({stats['megabytes']:.1f} MB) into {table_name} in {elapsed:.2f}s - {stats['rows_per_second']:,.0f} rows/s, {stats['megabytes_per_second']:.1f} MB/s")
+        return stats
+
+    def upsert(self, data:pd.DataFrame, table_name:str, key_columns:List[str]|None=None):
+        '''
+        Incrementally merges a dataframe into an existing table. The rows are bulk COPY'd into a temporary staging
+        table and merged with INSERT ... ON CONFLICT, only touching rows that are new or whose values changed.
+        Everything runs in one transaction, so readers keep seeing the old rows until the merge commits.
+
+        If the table does not exist yet it is created with a full replace.
+        '''
+        key_columns = key_columns or TABLE_KEYS.get(table_name)
+        if not key_columns:
+            raise ValueError(f'No key columns known for {table_name}, please pass key_columns')
+        missing_cols = [col for col in key_columns if col not in data.columns]
+        if missing_cols:
+            raise ValueError(f'{missing_cols} were expected in column names but were missing')
+
+        if not inspect(self.engine).has_table(table_name):
+            print(f'{table_name} does not exist yet, creating it with a full replace')
+            if isinstance(data, gpd.GeoDataFrame):
+                return self.update_from_gpd(data, table_name)
+            return self.update_database(data, table_name)
+
+        staging_table = f'{table_name}_staging'
+        columns = list(data.columns)
+        value_columns = [col for col in columns if col not in key_columns]
+
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        key_list = ', '.join(f'"{col}"' for col in key_columns)
+        if value_columns:
+            conflict_action = f'''
+                DO UPDATE SET {', '.join(f'"{col}" = EXCLUDED."{col}"' for col in value_columns)}
+                WHERE ({', '.join(f'{table_name}."{col}"' for col in value_columns)}) IS DISTINCT FROM ({', '.join(f'EXCLUDED."{col}"' for col in value_columns)})
+            '''
+        else:
+            conflict_action = 'DO NOTHING'
+
+        merge_sql = f'''
+            INSERT INTO {table_name} ({column_list})
+            SELECT DISTINCT ON ({key_list}) {column_list}
+            FROM {staging_table}
+            ORDER BY {key_list}
+            ON CONFLICT ({key_list}) {conflict_action}
+        '''
+
+        try:
+            with self.engine.begin() as conn:
+                self._ensure_conflict_target(conn, table_name, key_columns)
+                conn.execute(text(f'CREATE TEMP TABLE {staging_table} (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP'))
+                cursor = conn.connection.cursor()
+                self._copy_dataframe(cursor, data, staging_table, int(os.getenv('DB_COPY_CHUNK_SIZE', DEFAULT_COPY_CHUNK_SIZE)))
+                rows_written = conn.execute(text(merge_sql)).rowcount
+            self.bump_table_version(table_name)
+            print(f"✅Successfully upserted {rows_written} new or changed rows into {table_name}")
+        except SQLAlchemyError as e:
+            print(f'Database error: {e}')
+            raise
+
+    @staticmethod
+    def _ensure_conflict_target(conn, table_name:str, key_columns:List[str]) -> None:
+        '''
+        Makes sure the key columns have a primary key or unique constraint, which ON CONFLICT needs to merge on.
+        Tables written by to_sql have none, and create_table_keys falls back to a plain index if the data broke the key,
+        so a missing primary key is added here, in the caller's transaction.
+        '''
+        inspector = inspect(conn)
+        keys = set(key_columns)
+        constrained = [inspector.get_pk_constraint(table_name).get('constrained_columns') or []]
+        constrained += [constraint['column_names'] for constraint in inspector.get_unique_constraints(table_name)]
+        constrained += [index['column_names'] for index in inspector.get_indexes(table_name) if index.get('unique')]
+        if any(set(columns) == keys for columns in constrained):
+            return
+
+        columns = ', '.join(f'"{col}"' for col in key_columns)
+        print(f'{table_name} has no key on ({columns}), adding its primary key before upserting')
+        try:
+            conn.execute(text(f'ALTER TABLE {table_name} ADD PRIMARY KEY ({columns})'))
+        except (IntegrityError, ProgrammingError) as e:
+            raise ValueError(
+                f'Cannot upsert into {table_name}: it has no primary key or unique constraint on ({columns}) and one cannot '
+                f'be added, as the existing rows have duplicate or missing keys. Rewrite the table with mode=\'replace\' - {e.orig}'
+            ) from e
+
+    def replace_partitions(self, data:pd.DataFrame, table_name:str, partition_column:str):
+        '''
+        Replaces the rows of a table whose partition column, e.g. the date, takes any of the values in the dataframe,
+        leaving every other partition untouched. Rows dropped from a partition's source are removed as well, which an
+        upsert would leave behind. The delete and the COPY run in one transaction.
+
+        If the table does not exist yet it is created with a full replace.
+        '''
+        if partition_column not in data.columns:
+            raise ValueError(f'{[partition_column]} were expected in column names but were missing')
+        if not inspect(self.engine).has_table(table_name):
+            print(f'{table_name} does not exist yet, creating it with a full replace')
+            return self.update_database(data, table_name)
+
+        partitions = data[partition_column].drop_duplicates().tolist()
+        try:
+            with self.engine.begin() as conn:
+                rows_deleted = conn.execute(
+                    text(f'DELETE FROM {table_name} WHERE "{partition_column}" = ANY(:partitions)'),
+                    {'partitions':partitions}
+                ).rowcount
+                cursor = conn.connection.cursor()
+                self._copy_dataframe(cursor, data, table_name, int(os.getenv('DB_COPY_CHUNK_SIZE', DEFAULT_COPY_CHUNK_SIZE)))
+            self.bump_table_version(table_name)
+            print(f"✅Successfully replaced {len(partitions)} {partition_column} partitions of {table_name}, {rows_deleted} rows out and {len(data)} in")
+        except SQLAlchemyError as e:
+            print(f'Database error: {e}')
+            raise
+
+    def get_ingestion_log(self, table_name:str) -> dict:
+        '''
+        Returns the checksum each source of a table was last loaded at, keyed by source
+        '''
+        with self.engine.begin() as conn:
+            conn.execute(text(self._ingestion_log_sql()))
+            rows = conn.execute(
+                text(f'SELECT source, checksum FROM {INGESTION_LOG_TABLE} WHERE table_name = :table_name'),
+                {'table_name':table_name}
+            ).fetchall()
+        return {source:checksum for source, checksum in rows}
+
+    def record_ingestion(self, table_name:str, checksums:dict, replace:bool=False):
+        '''
+        Records the sources loaded into a table along with their checksums. With replace=True every other source
+        logged for the table is forgotten, for after a full rebuild.
+        '''
+        record_sql = f'''
+            INSERT INTO {INGESTION_LOG_TABLE} (table_name, source, checksum)
+            VALUES (:table_name, :source, :checksum)
+            ON CONFLICT (table_name, source)
+            DO UPDATE SET checksum = EXCLUDED.checksum, loaded_at = now()
+        '''
+        with self.engine.begin() as conn:
+            conn.execute(text(self._ingestion_log_sql()))
+            if replace:
+                conn.execute(text(f'DELETE FROM {INGESTION_LOG_TABLE} WHERE table_name = :table_name'), {'table_name':table_name})
+            if checksums:
+                conn.execute(
+                    text(record_sql),
+                    [{'table_name':table_name, 'source':source, 'checksum':checksum} for source, checksum in checksums.items()]
+                )
+
+    @staticmethod
+    def _ingestion_log_sql() -> str:
+        return f'''
+            CREATE TABLE IF NOT EXISTS {INGESTION_LOG_TABLE} (
+                table_name TEXT NOT NULL,
+                source TEXT NOT NULL,
+                checksum TEXT NOT NULL,
+                loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (table_name, source)
+            )
+        '''
+
+    @staticmethod
+    def _copy_dataframe(cursor, data:pd.DataFrame, table_name:str, chunk_size:int=DEFAULT_COPY_CHUNK_SIZE) -> int:
+        '''
+        Streams a dataframe into a table with COPY FROM STDIN as CSV, one chunk of rows at a time so only a single
+        chunk is ever serialised in memory. Missing values are sent as NULL. Returns the number of bytes sent.
+        '''
+        column_list = ', '.join(f'"{col}"' for col in data.columns)
+        copy_sql = f'COPY {table_name} ({column_list}) FROM STDIN WITH (FORMAT csv)'
+
+        n_bytes = 0
+        for start in range(0, len(data), chunk_size):
+            buffer = io.StringIO()
+            data.iloc[start:start + chunk_size].to_csv(buffer, index=False, header=False, na_rep='')
+            n_bytes += buffer.tell()
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+
+        return n_bytes
+
+    @staticmethod
+    def _geometry_to_ewkb(data:gpd.GeoDataFrame) -> pd.DataFrame:
+        '''
+        Converts the geometry column to hex EWKB carrying the SRID, which PostGIS parses straight from COPY
+        '''
+        if data.crs is None:
+            raise ValueError('GeoDataFrame has no CRS set')
+
+        geometry_col = data.geometry.name
+        geometry = shapely.set_srid(np.asarray(data.geometry.values), data.crs.to_epsg())
+
+        data = pd.DataFrame(data.drop(columns=geometry_col))
+        data[geometry_col] = shapely.to_wkb(geometry, hex=True, include_srid=True)
+        return data
+
+    def create_table_keys(self, table_name:str, conn=None):
+        '''
+        Recreates the primary key of a table, which to_sql(if_exists='replace') drops along with the old table.
+        If the data breaks the key, e.g. duplicate or missing ward codes, a plain index on the same columns is created instead.
+        Given a connection the key is created in its transaction, otherwise in a transaction of its own.
+        '''
+        key_columns = TABLE_KEYS.get(table_name)
+        if key_columns is None:
+            return
+        if conn is None:
+            with self.engine.begin() as conn:
+                return self.create_table_keys(table_name, conn)
+
+        columns = ', '.join(key_columns)
+        try:
+            #A savepoint, so a failed key only rolls back itself rather than the caller's whole transaction
+            with conn.begin_nested():
+                conn.execute(text(f'ALTER TABLE {table_name} ADD PRIMARY KEY ({columns})'))
+        except IntegrityError as e:
+            print(f'Warning: Could not add primary key ({columns}) to {table_name}, creating an index instead - {e.orig}')
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {table_name}_{"_".join(key_columns)}_idx ON {table_name} ({columns})'))
+
+    @staticmethod
+    def sql_dtypes(data:pd.DataFrame) -> dict:
+        '''
+        SQL types for the object columns of a dataframe, inferred from their values, e.g. DATE for datetime.date values
+        '''
+        inferred_types = {
+            'date':types.Date,
+            'datetime':types.DateTime,
+            'decimal':types.Numeric,
+            'integer':types.BigInteger,
+            'floating':types.Float,
+            'mixed-integer-float':types.Float,
+            'boolean':types.Boolean,
+            'string':types.Text
+        }
+        dtypes = {}
+        for col in data.columns[data.dtypes == object]:
+            sql_type = inferred_types.get(pd.api.types.infer_dtype(data[col], skipna=True))
+            if sql_type is not None:
+                dtypes[col] = sql_type()
+        return dtypes
+
+    def bump_table_version(self, table_name:str, conn=None):
+        '''
+        Increments the version row for a table so that readers holding a copy of it, e.g. the dashboard's geometry,
+        know to reload it. Given a connection the version is bumped in its transaction, otherwise in one of its own.
+        '''
+        create_sql = f'''
+            CREATE TABLE IF NOT EXISTS {TABLE_VERSIONS_TABLE} (
+                table_name TEXT PRIMARY KEY,
+                version BIGINT NOT NULL,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        '''
+        bump_sql = f'''
+            INSERT INTO {TABLE_VERSIONS_TABLE} (table_name, version)
+            VALUES (:table_name, 1)
+            ON CONFLICT (table_name)
+            DO UPDATE SET version = {TABLE_VERSIONS_TABLE}.version + 1, updated_at = now()
+        '''
+        if conn is None:
+            with self.engine.begin() as conn:
+                return self.bump_table_version(table_name, conn)
+
+        conn.execute(text(create_sql))
+        conn.execute(text(bump_sql), {'table_name':table_name})
+
 
 
 
@@ -0,0 +1,240 @@
+import asyncio
+import threading
+from datetime import date, datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from src.DB.DatabaseClient import DatabaseReader, AsyncDatabaseReader
+
+
+#Tables held in the store, with the reader method that loads them and their value columns
+STORE_TABLES = {
+    'ward_crime':('get_crime_data', ['count']),
+    'ward_education_data':('get_education_data', ['pop_with_qual', 'pop_without_qual']),
+    'ward_employemnt_data':('get_employment_data', ['unemployed_adults', 'long_term_sick_or_disabled', 'caring_for_family']),
+    'ward_population_density':('get_population_data', ['population_density'])
+}
+#Columns that are returned as integers rather than floats
+INTEGER_COLUMNS = {'count'}
+
+
+class WardSnapshot:
+    '''
+    An immutable, NumPy backed copy of the ward tables. Every table is held as a (ward, month offset, feature) array
+    along with a mask of which (ward, month) cells exist, so a ward or a month is an O(1) slice.
+    '''
+    def __init__(self, tables:Dict[str, pd.DataFrame], ward_names:pd.DataFrame) -> None:
+        self.version = 0
+        self.loaded_at = datetime.now()
+
+        dates = pd.concat([df['date'] for df in tables.values()], ignore_index=True)
+        #Every table is monthly, keyed on the first of the month, so a cell's month offset identifies its date exactly
+        if not dates.dropna().dt.is_month_start.all() or (dates.dropna().dt.normalize() != dates.dropna()).any():
+            raise ValueError('WardSnapshot expects every date to be the first of a month')
+        self.start = dates.min().to_period('M')
+        end = dates.max().to_period('M')
+        self.n_months = (end - self.start).n + 1
+
+        ward_codes = pd.concat([df['ward_code'] for df in tables.values()] + [ward_names['ward_code']], ignore_index=True)
+        self.ward_codes = np.sort(ward_codes.dropna().unique())
+        self.ward_index = {ward_code:idx for idx, ward_code in enumerate(self.ward_codes)}
+        self.month_dates = [(self.start + offset).to_timestamp().date() for offset in range(self.n_months)]
+
+        self.ward_names = ward_names[['ward_code', 'ward_name']].to_dict(orient='records')
+
+        self.values:Dict[str, np.ndarray] = {}
+        self.present:Dict[str, np.ndarray] = {}
+        for table_name, df in tables.items():
+            columns = STORE_TABLES[table_name][1]
+            df = df.dropna(subset=['ward_code'])
+            ward_idx = df['ward_code'].map(self.ward_index).to_numpy()
+            month_idx = self._month_offsets(df['date'])
+
+            values = np.full((len(self.ward_codes), self.n_months, len(columns)), np.nan)
+            values[ward_idx, month_idx] = df[columns].to_numpy(dtype=float)
+            present = np.zeros((len(self.ward_codes), self.n_months), dtype=bool)
+            present[ward_idx, month_idx] = True
+
+            self.values[table_name] = values
+            self.present[table_name] = present
+
+    def _month_offsets(self, dates:pd.Series) -> np.ndarray:
+        dates = pd.to_datetime(dates)
+        return ((dates.dt.year - self.start.year) * 12 + (dates.dt.month - self.start.month)).to_numpy()
+
+    def ward_slice(self, ward_code:str|None) -> slice|List[int]:
+        '''
+        Returns the row selection for a ward code, or every row if no ward code is given
+        '''
+        if ward_code is None:
+            return slice(None)
+        idx = self.ward_index.get(ward_code)
+        return [] if idx is None else [idx]
+
+    def month_slice(self, date_value:str|date|None) -> slice|List[int]:
+        '''
+        Returns the column selection for a date, or every column if no date is given. Like the date = :date predicate
+        of DatabaseReader it matches the exact date, so a date within a month that is not its first matches nothing.
+        '''
+        if date_value is None:
+            return slice(None)
+        timestamp = pd.Timestamp(date_value)
+        offset = (timestamp.to_period('M') - self.start).n
+        if not 0 <= offset < self.n_months or timestamp != pd.Timestamp(self.month_dates[offset]):
+            return []
+        return [offset]
+
+
+class WardStore:
+    '''
+    An in-memory, columnar store of the ward time series, indexed by (ward_code, month offset).
+
+    It answers the same queries as DatabaseReader from memory. The tables are loaded once, and reload builds a fresh
+    snapshot off to the side before swapping it in, so readers never see a half loaded store.
+    '''
+    def __init__(self) -> None:
+        self._snapshot:WardSnapshot|None = None
+        self._reload_lock = threading.Lock()
+        #Held for the whole of an async load, so overlapping reloads queue up rather than each hitting the database
+        self._load_lock = asyncio.Lock()
+        self._invalidation_listeners:List[Callable[[], None]] = []
+
+    @property
+    def snapshot(self) -> WardSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise RuntimeError('WardStore has not been loaded')
+        return snapshot
+
+    def load(self, reader:DatabaseReader) -> 'WardStore':
+        '''
+        Loads every table from the database and atomically swaps in the new snapshot
+        '''
+        rows = [getattr(reader, getter)() for getter, _ in STORE_TABLES.values()]
+        ward_names = reader.get_ward_names()
+
+        self._swap(self._build_snapshot(rows, ward_names))
+        return self
+
+    async def load_async(self, reader:AsyncDatabaseReader) -> 'WardStore':
+        '''
+        Loads every table concurrently through an async reader, building the snapshot in a worker thread so the
+        event loop is not blocked, then atomically swaps it in. Only one async load runs at a time.
+        '''
+        async with self._load_lock:
+            *rows, ward_names = await asyncio.gather(
+                *[getattr(reader, getter)() for getter, _ in STORE_TABLES.values()],
+                reader.get_ward_names()
+            )
+
+            snapshot = await asyncio.to_thread(self._build_snapshot, rows, ward_names)
+            self._swap(snapshot)
+        return self
+
+    @staticmethod
+    def _build_snapshot(rows:List[List[dict]], ward_names:List[dict]) -> WardSnapshot:
+        tables = {}
+        for table_name, table_rows in zip(STORE_TABLES, rows):
+            df = pd.DataFrame(table_rows)
+            df['date'] = pd.to_datetime(df['date'])
+            tables[table_name] = df
+
+        return WardSnapshot(tables, pd.DataFrame(ward_names))
+
+    def _swap(self, snapshot:WardSnapshot) -> None:
+        '''
+        Swaps in a fully built snapshot and notifies the listeners
+        '''
+        with self._reload_lock:
+            snapshot.version = self._snapshot.version + 1 if self._snapshot is not None else 1
+            self._snapshot = snapshot
+
+        for listener in self._invalidation_listeners:
+            listener()
+
+    def data_version(self) -> int:
+        '''
+        The version of the loaded snapshot, bumped on every reload
+        '''
+        return self.snapshot.version
+
+    def add_invalidation_listener(self, listener:Callable[[], None]) -> None:
+        '''
+        Registers a callback that is run after every reload
+        '''
+        self._invalidation_listeners.append(listener)
+
+    def info(self) -> dict:
+        snapshot = self.snapshot
+        return {
+            'version':snapshot.version,
+            'loaded_at':snapshot.loaded_at,
+            'n_wards':len(snapshot.ward_codes),
+            'n_months':snapshot.n_months,
+            'start_date':snapshot.month_dates[0],
+            'end_date':snapshot.month_dates[-1]
+        }
+
+    def get_ward_names(self) -> List[dict]:
+        return list(self.snapshot.ward_names)
+
+    def get_crime_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return self._records('ward_crime', ward_code, date)
+
+    def get_education_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return self._records('ward_education_data', ward_code, date)
+
+    def get_employment_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return self._records('ward_employemnt_data', ward_code, date)
+
+    def get_population_data(self, ward_code:str|None=None, date:str|None=None) -> List[dict]:
+        return self._records('ward_population_density', ward_code, date)
+
+    def get_ward_history(self, ward_codes:List[str]|None=None) -> List[dict]:
+        '''
+        Returns the joined history of every table for a set of wards, only keeping months present in all tables
+        '''
+        snapshot = self.snapshot
+        if ward_codes is None:
+            rows = np.arange(len(snapshot.ward_codes))
+        else:
+            rows = np.array([snapshot.ward_index[code] for code in ward_codes if code in snapshot.ward_index], dtype=int)
+
+        present = np.logical_and.reduce([snapshot.present[table_name][rows] for table_name in STORE_TABLES])
+        ward_idx, month_idx = np.nonzero(present)
+
+        history = {
+            'ward_code':snapshot.ward_codes[rows][ward_idx],
+            'date':[snapshot.month_dates[month] for month in month_idx]
+        }
+        for table_name, (_, columns) in STORE_TABLES.items():
+            values = snapshot.values[table_name][rows][ward_idx, month_idx]
+            for col_idx, col in enumerate(columns):
+                history[col] = values[:, col_idx].astype(int) if col in INTEGER_COLUMNS else values[:, col_idx]
+
+        return pd.DataFrame(history).to_dict(orient='records')
+
+    def _records(self, table_name:str, ward_code:str|None, date_value:str|None) -> List[dict]:
+        '''
+        Slices a table by ward and month and returns the present cells as records
+        '''
+        snapshot = self.snapshot
+        columns = STORE_TABLES[table_name][1]
+
+        rows = snapshot.ward_slice(ward_code)
+        months = snapshot.month_slice(date_value)
+        ward_codes = snapshot.ward_codes[rows]
+        month_dates = np.array(snapshot.month_dates, dtype=object)[months]
+        values = snapshot.values[table_name][rows][:, months]
+        present = snapshot.present[table_name][rows][:, months]
+
+        ward_idx, month_idx = np.nonzero(present)
+        values = values[ward_idx, month_idx]
+
+        records = {'ward_code':ward_codes[ward_idx], 'date':month_dates[month_idx]}
+        for col_idx, col in enumerate(columns):
+            records[col] = values[:, col_idx].astype(int) if col in INTEGER_COLUMNS else values[:, col_idx]
+
+        return pd.DataFrame(records).to_dict(orient='records')
@@ -0,0 +1,37 @@
+import hmac
+import os
+
+from fastapi import Request, APIRouter, Depends, Header, HTTPException
+
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+def require_admin_token(x_admin_token:str|None=Header(None)) -> None:
+    '''
+    Rejects requests without the shared secret in the ADMIN_TOKEN environment variable in their X-Admin-Token header.
+    If ADMIN_TOKEN is not set every request is rejected.
+    '''
+    if not x_admin_token:
+        raise HTTPException(status_code=401, detail='Missing X-Admin-Token header')
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if not admin_token or not hmac.compare_digest(x_admin_token.encode('utf-8'), admin_token.encode('utf-8')):
+        raise HTTPException(status_code=403, detail='Invalid admin token')
+
+@router.get('/store')
+async def get_store_info(request:Request):
+    '''
+    Returns the version and shape of the in-memory ward store, along with the version of every table so clients can
+    tell when tables outside the store, e.g. the boundaries, have been rewritten
+    '''
+    store = request.app.state.ward_store
+    return {**store.info(), 'table_versions':request.app.state.database_client.get_table_versions()}
+
+@router.post('/store/reload', dependencies=[Depends(require_admin_token)])
+async def reload_store(request:Request):
+    '''
+    Reloads the in-memory ward store from the database, e.g. after a pipeline run. The new data is swapped in atomically,
+    and overlapping reloads run one after the other.
+    '''
+    store = request.app.state.ward_store
+    await store.load_async(request.app.state.async_database_client)
+    return store.info()
@@ -0,0 +1,20 @@
+import os
+from functools import partial
+from typing import Callable
+
+import anyio
+from fastapi import Request
+
+
+def create_limiter() -> anyio.CapacityLimiter:
+    '''
+    Creates the limiter that bounds how many blocking jobs, e.g. model scoring, run in worker threads at once.
+    Sized by the API_WORKER_THREADS environment variable, defaulting to the number of CPUs.
+    '''
+    return anyio.CapacityLimiter(int(os.getenv('API_WORKER_THREADS', os.cpu_count() or 4)))
+
+async def run_bounded(request:Request, func:Callable, *args, **kwargs):
+    '''
+    Runs a blocking or CPU bound function in the app's bounded worker pool so it does not stall the event loop
+    '''
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=request.app.state.limiter)
@@ -3,6 +3,8 @@ from pydantic import BaseModel
 from datetime import date
 from typing import Optional
 
+from src.api.concurrency import run_bounded
+
 
 router = APIRouter(prefix="/history", tags=["history"])
 
@@ -35,25 +37,25 @@ class PopulationDensityRecord(BaseModel):
 
 @router.get('/wards', response_model=list[WardRecord])
 async def get_ward_names_data(request:Request):
-    db = request.app.state.crime_service.DB
-    return db.get_ward_names()
+    db = request.app.state.ward_store
+    return await run_bounded(request, db.get_ward_names)
 
 @router.get('/crime', response_model=list[CrimeRecord])
 async def get_ward_crime_data(request:Request, ward_code:Optional[str]=None, date:Optional[str]=None):
-    db = request.app.state.crime_service.DB
-    return db.get_crime_data(ward_code, date)
+    db = request.app.state.ward_store
+    return await run_bounded(request, db.get_crime_data, ward_code, date)
 
 @router.get('/education', response_model=list[EducationRecord])
 async def get_ward_education_data(request:Request, ward_code:Optional[str]=None, date:Optional[str]=None):
-    db = request.app.state.crime_service.DB
-    return db.get_education_data(ward_code, date)
+    db = request.app.state.ward_store
+    return await run_bounded(request, db.get_education_data, ward_code, date)
 
 @router.get('/employment', response_model=list[EmploymentRecord])
 async def get_ward_employment_data(request:Request, ward_code:Optional[str]=None, date:Optional[str]=None):
-    db = request.app.state.crime_service.DB
-    return db.get_employment_data(ward_code, date)
+    db = request.app.state.ward_store
+    return await run_bounded(request, db.get_employment_data, ward_code, date)
 
 @router.get('/population_density', response_model=list[PopulationDensityRecord])
 async def get_ward_population_density_data(request:Request, ward_code:Optional[str]=None, date:Optional[str]=None):
-    db = request.app.state.crime_service.DB
-    return db.get_population_data(ward_code, date)
\ No newline at end of file
+    db = request.app.state.ward_store
+    return await run_bounded(request, db.get_population_data, ward_code, date)
\ No newline at end of file
@@ -3,9 +3,12 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 
 from src.models.predict_model import CrimePredictor, CrimeService
-from src.DB.DatabaseClient import DatabaseReader
+from src.DB.DatabaseClient import DatabaseReader, AsyncDatabaseReader
+from src.DB.WardStore import WardStore
 from src.api import history
 from src.api import predict
+from src.api import admin
+from src.api.concurrency import create_limiter
 
 
 @asynccontextmanager
@@ -28,12 +31,24 @@ async def lifespan(app: FastAPI):
     database_client = DatabaseReader()
     crime_predictor = CrimePredictor(CrimePredictor_path)
 
+    async_database_client = AsyncDatabaseReader()
+
+    #Load the ward tables into memory once so history and predictions are served without hitting the database
+    ward_store = await WardStore().load_async(async_database_client)
+
     #Initialise the crime service class and store it in the app
-    crime_service = CrimeService(crime_predictor, database_client)
+    crime_service = CrimeService(crime_predictor, ward_store)
+    app.state.database_client = database_client
+    app.state.async_database_client = async_database_client
+    app.state.ward_store = ward_store
     app.state.crime_service = crime_service
+    app.state.limiter = create_limiter()
     yield
 
+    await async_database_client.dispose()
+
 app = FastAPI(lifespan=lifespan)
 
 app.include_router(history.router)
 app.include_router(predict.router)
+app.include_router(admin.router)
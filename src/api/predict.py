@@ -1,13 +1,44 @@
-from fastapi import Request, APIRouter
-from pydantic import BaseModel
+from fastapi import Request, APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from datetime import date
+from typing import Optional
+
+from src.models.forecasting import MAX_HORIZON
+from src.api.concurrency import run_bounded
 
 
 router = APIRouter(prefix="/predict", tags=["predict"])
 
+class CrimeForecastStep(BaseModel):
+    date: date
+    crime_prediction: float
+
 class CrimePrediction(BaseModel):
     crime_prediction: float
+    predictions: list[CrimeForecastStep]
+
+class WardCrimePrediction(BaseModel):
+    ward_code: str
+    date: date
+    crime_prediction: float
+    predictions: list[CrimeForecastStep]
+
+class BatchPredictionRequest(BaseModel):
+    ward_codes: Optional[list[str]] = None
+    months: int = Field(default=1, ge=1, le=MAX_HORIZON)
+
+@router.post('/crime/batch', response_model=list[WardCrimePrediction])
+async def predict_crime_batch(request:Request, body:BatchPredictionRequest):
+    '''
+    Predicts crime for every ward in the request body, or for all wards when no ward codes are given
+    '''
+    predictor = request.app.state.crime_service
+    return await run_bounded(request, predictor.predict_batch, body.ward_codes, months=body.months)
 
 @router.get('/crime/{ward_code}', response_model=CrimePrediction)
-async def predict_crime(request:Request, ward_code:str, months:int=1):
+async def predict_crime(request:Request, ward_code:str, months:int=Query(default=1, ge=1, le=MAX_HORIZON)):
     predictor = request.app.state.crime_service
-    return predictor.predict(ward_code, months=months)
\ No newline at end of file
+    try:
+        return await run_bounded(request, predictor.predict, ward_code, months=months)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
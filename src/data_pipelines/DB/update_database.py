@@ -1,5 +1,8 @@
+from functools import lru_cache
+
 import pandas as pd
-from sqlalchemy import create_engine
+
+from src.DB.DatabaseClient import DatabaseWriter
 
 
 def validate_columns(data:pd.DataFrame, required_columns:list) -> bool:
@@ -9,10 +12,17 @@ def validate_columns(data:pd.DataFrame, required_columns:list) -> bool:
         return False
     else:
         return True
+
+@lru_cache(maxsize=None)
+def get_writer(db_url:str) -> DatabaseWriter:
+    '''
+    Returns a writer per database URL, so repeated updates share one engine and connection pool
+    '''
+    return DatabaseWriter(DB_URL=db_url)
     
-def update_db(data:pd.DataFrame, db_url:str, table_name:str, required_columns:list):
+def update_db(data:pd.DataFrame, db_url:str, table_name:str, required_columns:list, chunk_size:int|None=None):
     try:
-        engine = create_engine(db_url)
+        writer = get_writer(db_url)
     except Exception as ex:
         raise ValueError(f"Error: Failed to generate engine due to: {ex}")
 
@@ -21,7 +31,7 @@ def update_db(data:pd.DataFrame, db_url:str, table_name:str, required_columns:li
         raise ValueError("Error: Data has missing columns")
     
     try: 
-        data.to_sql(table_name, engine, if_exists='replace', index=False)
+        writer.bulk_load(data, table_name, if_exists='replace', chunk_size=chunk_size)
         print("✅Successfully updated database values")
 
     except Exception as ex:
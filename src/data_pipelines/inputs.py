@@ -0,0 +1,33 @@
+import json
+from pathlib import Path
+from typing import Tuple
+
+import pandas as pd
+
+from src.data_pipelines.preprocessing.spacial_processing import load_crosswalk
+
+
+PACKAGE_DIR = Path(__file__).resolve().parents[2]
+CONFIG_PATH = PACKAGE_DIR / 'src/data_pipelines/pipelines/config/transformations.json'
+
+
+def load_config() -> dict:
+    '''
+    Loads the transformations config shared by every pipeline
+    '''
+    with open(CONFIG_PATH) as f:
+        return json.load(f)
+
+def load_ward_crosswalk(config:dict) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    '''
+    Loads the 2007 to 2022 ward crosswalk and the ward name to code lookups of both boundary sets, as configured
+    '''
+    ward_boundary_2007_config = config['ward_boundaries_2007']
+    ward_boundary_2022_config = config['ward_boundaries_2022']
+
+    return load_crosswalk(
+        PACKAGE_DIR / ward_boundary_2007_config['path'],
+        PACKAGE_DIR / ward_boundary_2022_config['path'],
+        ward_boundary_2007_config['transformations']['name_disambiguation'],
+        ward_boundary_2022_config['transformations']['name_disambiguation']
+    )
@@ -1,100 +1,169 @@
+import argparse
 import os
-import json
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, cast
 from dotenv import load_dotenv 
-from pathlib import Path
 
 import pandas as pd
+import polars as pl
 
-from src.data_pipelines.scraping.crime_scrapper import get_crime_data_url, crime_data_scrapper
+from src.data_pipelines.scraping.crime_scrapper import get_crime_data_url, fetch_crime_workbooks, read_crime_workbooks
+from src.data_pipelines.scraping.downloader import CachedDownloader
 from src.data_pipelines.preprocessing.base_pipeline import BasePipeline
-from src.data_pipelines.preprocessing.utils import normalise_text, subset_columns
-from src.data_pipelines.preprocessing.spacial_processing import calculate_overlap, load_and_prepare_shapefile, apply_disambiguation
+from src.data_pipelines.preprocessing.utils import normalise_text
+from src.data_pipelines.inputs import load_config, load_ward_crosswalk
+from src.data_pipelines.preprocessing.stage_cache import cached_stage, stage_key
 from src.DB.DatabaseClient import DatabaseWriter
 
+
+#Bump when the crime chain changes, so cached yearly outputs built by older code are rebuilt
+STAGE_VERSION = 1
+
+
 class CrimePipeline(BasePipeline):
-    def __init__(self, data:pd.DataFrame):
-        self.data = data
-        super().__init__(self.data)
+    def __init__(self, data:pd.DataFrame, lazy:bool=False, backend:str|None=None):
+        super().__init__(data, lazy, backend)
 
     def filter_df(self, filter_col:str, filter_value:List[str]):
-        self._check_list_subset(filter_col, list(self.data.columns))
+        self._check_list_subset(filter_col, self.columns)
+
+        if self.use_polars:
+            self.frame = self.frame.filter(~pl.col(filter_col).is_in(filter_value).fill_null(False))
+            return self
 
         self.data = self.data[~self.data[filter_col].isin(filter_value)].reset_index(drop=True)
         return self
     
     def groupby(self, grouping_columns:List[str]|str, summing_column:List[str]|str):
-        self._check_list_subset(grouping_columns, list(self.data.columns))
-        self._check_list_subset(summing_column, list(self.data.columns))
+        self._check_list_subset(grouping_columns, self.columns)
+        self._check_list_subset(summing_column, self.columns)
+
+        if self.use_polars:
+            self._polars_group_sum(grouping_columns, summing_column)
+            return self
 
-        self.data = self.data.groupby(grouping_columns)[summing_column].sum().reset_index()
+        self.data = self.data.groupby(grouping_columns, observed=True)[summing_column].sum().reset_index()
         return self
     
     def combine_date_cols(self, year_col, month_col):
+        if self.use_polars:
+            date = pl.date(pl.col(year_col).cast(pl.Int32), pl.col(month_col).cast(pl.Int8), 1).cast(pl.Datetime('ns'))
+            self.frame = self.frame.with_columns(date.alias('date')).drop([year_col, month_col])
+            return self
+
         self.data['date'] = self.data[year_col].astype(str) + '-' + self.data[month_col].astype(str) + '-01'
         self.data['date'] = pd.to_datetime(self.data['date'])
         self.data = self.data.drop([year_col, month_col], axis=1)
         return self
 
 
-def main():
-    CURRENT_DIR = Path(__file__).resolve().parent
-    PACKAGE_DIR = CURRENT_DIR.parent.parent.parent
-
-    with open(PACKAGE_DIR / 'src/data_pipelines/pipelines/config/transformations.json') as f:
-        config = json.load(f)
-
-
-    ward_boundary_2007_config = config['ward_boundaries_2007']
-    ward_boundary_2022_config = config['ward_boundaries_2022']
-    
-    ward_boundaries_2007_path = PACKAGE_DIR / ward_boundary_2007_config['path']
-    ward_2007_geometry, ward_code_2007_lookup = load_and_prepare_shapefile(ward_boundaries_2007_path, 'ONS_2010', 'Name', '2007', 27700, normalise_text)
-
-    ward_boundaries_2022_path = PACKAGE_DIR / ward_boundary_2022_config['path']
-    ward_2022_geometry, ward_code_2022_lookup = load_and_prepare_shapefile(ward_boundaries_2022_path, 'WD25CD', 'WD25NM', '2022', 27700, normalise_text)
-
-    ward_2007_2022_map = calculate_overlap(ward_2007_geometry, ward_2022_geometry)
-    ward_2007_2022_map = subset_columns(ward_2007_2022_map, ['ward_code_2007', 'ward_code_2022', 'overlap_pct'])
-
-    ward_code_2007_lookup = apply_disambiguation(ward_code_2007_lookup, 'ward_code_2007', 'ward_name_2007', ward_boundary_2007_config['transformations']['name_disambiguation'])
-    ward_code_2022_lookup = apply_disambiguation(ward_code_2022_lookup, 'ward_code_2022', 'ward_name_2022', ward_boundary_2022_config['transformations']['name_disambiguation'])
+def process_crime_year(data:pd.DataFrame, crime_data_config:dict, ward_code_2022_lookup:pd.DataFrame) -> pd.DataFrame:
+    '''
+    Aggregates one yearly crime sheet to monthly counts per 2022 ward
+    '''
+    return (
+        CrimePipeline(data, lazy=True).rename_cols(crime_data_config['transformations']['column_rename'])
+        .subset_columns([col for col in crime_data_config['transformations']['column_rename'].values()])
+        .filter_df('council_name', ['Western Isles - Eilean Siar', 'North Ayrshire'])
+        .filter_df('ward_name_2022', ['.Other / Unknown', 'Other / Unknown'])
+        .apply_manual_edits(col='ward_name_2022',mannual_edits=crime_data_config['transformations']['mannual_ward_edits'])
+        .normalise_column(normalise_func=normalise_text, col_to_normalise='ward_name_2022')
+        .groupby(grouping_columns=['ward_name_2022', 'council_name', 'year', 'month'], summing_column='count')
+        .left_join(data_to_merge=ward_code_2022_lookup, merging_column='ward_name_2022')
+        .rename_cols({'ward_code_2022':'ward_code'})
+        .drop_columns(['ward_name_2022', 'council_name'])
+        .combine_date_cols('year', 'month')
+        .extract_df()
+    )
+
+
+def process_crime_year_cached(data:pd.DataFrame, crime_data_config:dict, ward_code_2022_lookup:pd.DataFrame) -> pd.DataFrame:
+    '''
+    Processes one yearly crime sheet as a cached stage, so a sheet is only processed again when it or the chain changes
+    '''
+    key = stage_key('crime_year', STAGE_VERSION, config=crime_data_config, frames=[data, ward_code_2022_lookup])
+    return cast(pd.DataFrame, cached_stage('crime_year', key, lambda: process_crime_year(data, crime_data_config, ward_code_2022_lookup)))
+
+
+def process_crime_years(crime_data:Dict[str, pd.DataFrame], crime_data_config:dict, ward_code_2022_lookup:pd.DataFrame,
+                        max_workers:int|None=None) -> pd.DataFrame:
+    '''
+    Processes the yearly crime sheets and concatenates them. The sheets are independent, so when there is more than
+    one they are processed in parallel on a process pool, one sheet per task.
+    '''
+    if len(crime_data) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(process_crime_year_cached, data, crime_data_config, ward_code_2022_lookup) for data in crime_data.values()]
+            ward_crime_list = [future.result() for future in futures]
+    else:
+        ward_crime_list = [process_crime_year_cached(data, crime_data_config, ward_code_2022_lookup) for data in crime_data.values()]
+
+    return pd.concat(ward_crime_list, ignore_index=True)
+
+
+def changed_sources(checksums:Dict[str, str], ingested:Dict[str, str]) -> List[str]:
+    '''
+    Returns the sources that are new or whose checksum differs from the one they were last loaded at
+    '''
+    return [source for source, checksum in checksums.items() if ingested.get(source) != checksum]
+
+
+def main(config:dict|None=None, crosswalk:tuple|None=None, full_rebuild:bool=False, max_workers:int|None=None):
+    '''
+    Runs the crime refresh, taking the config and ward crosswalk if they have already been loaded, e.g. by the refresh
+    orchestrator.
+
+    By default the refresh is incremental: the ingestion log records the checksum every yearly workbook was loaded at,
+    and only new or changed workbooks are processed, replacing just their months in ward_crime. A full rebuild
+    processes every workbook in parallel and replaces the whole table.
+    '''
+    config = config if config is not None else load_config()
+    crosswalk = crosswalk if crosswalk is not None else load_ward_crosswalk(config)
+    _, _, ward_code_2022_lookup = crosswalk
 
 
     crime_data_config = config['crime_data']
     base_url = crime_data_config['path']['base_url']
     page_url = crime_data_config['path']['page_url']
 
-    crime_urls = get_crime_data_url(base_url, page_url)
-    crime_data = crime_data_scrapper(crime_urls)
-
-    ward_crime_list = []
-    for _, value in crime_data.items():
-        yearly_crime_data = CrimePipeline(value)
-        yearly_crime_data = (
-            yearly_crime_data.rename_cols(crime_data_config['transformations']['column_rename'])
-            .subset_columns([col for col in crime_data_config['transformations']['column_rename'].values()])
-            .filter_df('council_name', ['Western Isles - Eilean Siar', 'North Ayrshire'])
-            .filter_df('ward_name_2022', ['.Other / Unknown', 'Other / Unknown'])
-            .apply_manual_edits(col='ward_name_2022',mannual_edits=crime_data_config['transformations']['mannual_ward_edits'])
-            .normalise_column(normalise_func=normalise_text, col_to_normalise='ward_name_2022')
-            .groupby(grouping_columns=['ward_name_2022', 'council_name', 'year', 'month'], summing_column='count')
-            .left_join(data_to_merge=ward_code_2022_lookup, merging_column='ward_name_2022')
-            .rename_cols({'ward_code_2022':'ward_code'})
-            .drop_columns(['ward_name_2022', 'council_name'])
-            .combine_date_cols('year', 'month')
-            .extract_df()
-        )
-
-        ward_crime_list.append(yearly_crime_data)
-    crime_data = pd.concat(ward_crime_list, ignore_index=True)
-    
+    downloader = CachedDownloader()
+    crime_urls = get_crime_data_url(base_url, page_url, downloader)
+    workbooks = fetch_crime_workbooks(crime_urls, downloader)
+
+    #A workbook is loaded again when its contents, the crime config, the ward lookup or the chain's version change
+    pipeline_key = stage_key('crime_year', STAGE_VERSION, config=crime_data_config, frames=[ward_code_2022_lookup])
+    checksums = {title:f'{result.checksum[:16]}-{pipeline_key}' for title, result in workbooks.items()}
+
     load_dotenv()
     DB_URL = os.getenv("SUPABASE_DB_URL")
     databaseClient = DatabaseWriter(DB_URL=DB_URL)
-    databaseClient.update_database(crime_data, 'ward_crime')
+
+    to_process = list(workbooks) if full_rebuild else changed_sources(checksums, databaseClient.get_ingestion_log('ward_crime'))
+    if not to_process:
+        print("✅ward_crime is up to date, no new or changed crime workbooks")
+        return
+
+    crime_data = read_crime_workbooks(
+        {title:workbooks[title] for title in to_process},
+        downloader.cache_dir,
+        columns=list(crime_data_config['transformations']['column_rename'].keys()),
+        categorical_columns=['COUNCIL NAME', 'PSOS_MMW_Name']
+    )
+    crime_data = process_crime_years(crime_data, crime_data_config, ward_code_2022_lookup, max_workers)
+
+    if full_rebuild:
+        databaseClient.update_database(crime_data, 'ward_crime')
+    else:
+        databaseClient.replace_partitions(crime_data, 'ward_crime', 'date')
+    databaseClient.record_ingestion('ward_crime', {title:checksums[title] for title in to_process}, replace=full_rebuild)
+    print(f"✅Loaded {len(to_process)} crime workbooks into ward_crime: {to_process}")
 
 
 
 if __name__ == '__main__':
-    df = main()
+    parser = argparse.ArgumentParser(description='Loads new or changed crime workbooks into ward_crime')
+    parser.add_argument('--full-rebuild', action='store_true', help='Process every workbook and replace the whole table')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes for a full rebuild, defaults to the number of CPUs')
+    args = parser.parse_args()
+
+    main(full_rebuild=args.full_rebuild, max_workers=args.workers)
@@ -1,36 +1,41 @@
 import os
-import json
 from dotenv import load_dotenv 
-from typing import Dict, List   
-from pathlib import Path
+from typing import Callable, Dict, List   
 
 import pandas as pd
+import polars as pl
 from pandera.pandas import DataFrameSchema, Column, DateTime
-from pandas.api.types import is_numeric_dtype
 
-from src.data_pipelines.preprocessing.spacial_processing import calculate_overlap, load_and_prepare_shapefile, apply_disambiguation
+from src.data_pipelines.inputs import PACKAGE_DIR, load_config, load_ward_crosswalk
+from src.data_pipelines.preprocessing.spacial_processing import ArealWeights
+from src.data_pipelines.preprocessing.stage_cache import cached_stage, stage_key
 from src.data_pipelines.preprocessing.base_pipeline import BasePipeline
-from src.data_pipelines.preprocessing.utils import expand_date_range, interpolate_df, normalise_text, subset_columns
+from src.data_pipelines.preprocessing.utils import expand_to_monthly, normalise_text, read_census_csv
 from src.DB.DatabaseClient import DatabaseWriter
 import tests.test_crime_pipeline as tests
 
+
+#Bump when the education chain changes, so cached outputs built by older code are rebuilt
+STAGE_VERSION = 1
+
+
 class EducationPipeline(BasePipeline):
-    def __init__(self, path: str, skiprows:int=0, skipfooter:int=0):
+    def __init__(self, path: str, usecols:List[str]|Callable|None=None, dtype:Dict[str, str|type]|None=None, lazy:bool=False,
+                 backend:str|None=None):
         self.path = path
-        self.skiprows = skiprows
-        self.skipfooter = skipfooter
-        self.data = self.load_data(skiprows=self.skiprows, skipfooter=self.skipfooter)
-        super().__init__(self.data)
+        self.usecols = usecols
+        self.dtype = dtype
+        super().__init__(self.load_data(), lazy, backend)
 
-    def load_data(self, skiprows:int=0, skipfooter:int=0):
+    def load_data(self):
         '''
-        Loads a csv file from memory
+        Loads the table out of a census csv file, finding its header and footer
         '''
-        data  = pd.read_csv(self.path, skiprows=skiprows, skipfooter=skipfooter, engine='python')
+        data  = read_census_csv(self.path, usecols=self.usecols, dtype=self.dtype)
         return data
 
     def pivot_data(self, columns:str, values:str,  index:str):
-        self._check_list_subset([columns, values, index], list(self.data.columns))
+        self._check_list_subset([columns, values, index], self.columns)
 
         self.data = self.data.reset_index()
         self.data = self.data.pivot(
@@ -45,8 +50,8 @@ class EducationPipeline(BasePipeline):
         '''
         Calculates column percentages by giving a dictionary with column numerator and denominator pairs
         '''
-        self._check_list_subset(list(division_map.keys()), list(self.data.columns))
-        self._check_list_subset(list(division_map.values()), list(self.data.columns))
+        self._check_list_subset(list(division_map.keys()), self.columns)
+        self._check_list_subset(list(division_map.values()), self.columns)
 
 
         for key, value in division_map.items():
@@ -61,46 +66,44 @@ class EducationPipeline(BasePipeline):
         return self
     
     def groupby(self, grouping_columns:List[str]|str, summing_column:List[str]|str):
-        self._check_list_subset(grouping_columns, list(self.data.columns))
-        self._check_list_subset(summing_column, list(self.data.columns))
+        self._check_list_subset(grouping_columns, self.columns)
+        self._check_list_subset(summing_column, self.columns)
+
+        if self.use_polars:
+            self._polars_group_sum(grouping_columns, summing_column)
+            return self
 
         self.data = self.data.groupby(grouping_columns)[summing_column].sum().reset_index()
         return self 
     
     def set_date_column(self, date_col_name:str, date:str):
+        if self.use_polars:
+            self.frame = self.frame.with_columns(pl.lit(pd.to_datetime(date).to_pydatetime(), dtype=pl.Datetime('ns')).alias(date_col_name))
+            return self
+
         self.data[date_col_name] = pd.to_datetime(date)
         return self
 
 
 
 
-def main():
-    CURRENT_DIR = Path(__file__).resolve().parent
-    PACKAGE_DIR = CURRENT_DIR.parent.parent.parent
-
-    with open(PACKAGE_DIR / 'src/data_pipelines/pipelines/config/transformations.json') as f:
-        config = json.load(f)
+def build_education_data(config:dict, crosswalk:tuple) -> pd.DataFrame:
+    '''
+    Builds the monthly education data on 2022 wards from the 2011 and 2022 census tables
+    '''
     education_data_2011_config = config['education_data_2011']
     education_data_2022_config = config['education_data_2022']
 
-    ward_boundary_2007_config = config['ward_boundaries_2007']
-    ward_boundary_2022_config = config['ward_boundaries_2022']
-    
-    ward_boundaries_2007_path = PACKAGE_DIR / ward_boundary_2007_config['path']
-    ward_2007_geometry, ward_code_2007_lookup = load_and_prepare_shapefile(ward_boundaries_2007_path, 'ONS_2010', 'Name', '2007', 27700, normalise_text)
-
-    ward_boundaries_2022_path = PACKAGE_DIR / ward_boundary_2022_config['path']
-    ward_2022_geometry, ward_code_2022_lookup = load_and_prepare_shapefile(ward_boundaries_2022_path, 'WD25CD', 'WD25NM', '2022', 27700, normalise_text)
-
-    ward_2007_2022_map = calculate_overlap(ward_2007_geometry, ward_2022_geometry)
-    ward_2007_2022_map = subset_columns(ward_2007_2022_map, ['ward_code_2007', 'ward_code_2022', 'overlap_pct'])
-
-    ward_code_2007_lookup = apply_disambiguation(ward_code_2007_lookup, 'ward_code_2007', 'ward_name_2007', ward_boundary_2007_config['transformations']['name_disambiguation'])
-    ward_code_2022_lookup = apply_disambiguation(ward_code_2022_lookup, 'ward_code_2022', 'ward_name_2022', ward_boundary_2022_config['transformations']['name_disambiguation'])
+    ward_2007_2022_map, ward_code_2007_lookup, ward_code_2022_lookup = crosswalk
+    ward_2007_2022_weights = ArealWeights.from_frame(ward_2007_2022_map, 'ward_code_2007', 'ward_code_2022')
 
 
     education_data_2011_path = str(PACKAGE_DIR / education_data_2011_config['path'])
-    education_data_2011 = EducationPipeline(education_data_2011_path, skiprows=12, skipfooter=5)
+    education_data_2011 = EducationPipeline(
+        education_data_2011_path,
+        usecols=['Electoral Ward 2007', 'Highest level of qualification', 'Count'],
+        dtype={'Electoral Ward 2007':str, 'Highest level of qualification':str}
+    )
     education_data_2011 = (
         education_data_2011.pivot_data(columns='Highest level of qualification', values='Count', index='Electoral Ward 2007')
         .rename_cols(education_data_2011_config['transformations']['column_rename'])
@@ -111,15 +114,17 @@ def main():
         .sum_cols('pop_without_qual', ['qual_level_1', 'qual_level_2', 'no_qual'])
         .calculate_percentages({col:'total_population' for col in ['pop_with_qual', 'pop_without_qual']})
         .drop_columns([col for col in education_data_2011.data.columns if col not in ['ward_code_2007', 'pop_with_qual', 'pop_without_qual']])
-        .left_join(pd.DataFrame(ward_2007_2022_map), 'ward_code_2007')
-        .multiply_columns(mul_map={col:'overlap_pct' for col in education_data_2011.data.columns if is_numeric_dtype(education_data_2011.data[col])})
-        .groupby('ward_code_2022', ['pop_with_qual', 'pop_without_qual'])
+        .apply_areal_weights(ward_2007_2022_weights, 'ward_code_2007', 'ward_code_2022', ['pop_with_qual', 'pop_without_qual'])
         .set_date_column('date', '2011-01-01')
         .extract_df()
     )
 
     education_data_2022_path = str(PACKAGE_DIR / 'data' / 'education_data' / 'education_ward_data_2022.csv')
-    education_data_2022 = EducationPipeline(education_data_2022_path, skiprows=10, skipfooter=8)
+    education_data_2022 = EducationPipeline(
+        education_data_2022_path,
+        usecols=['Electoral Ward 2022', 'Highest level of qualification', 'Count'],
+        dtype={'Electoral Ward 2022':str, 'Highest level of qualification':str}
+    )
     education_data_2022 = (
         education_data_2022.pivot_data(columns='Highest level of qualification', values='Count', index='Electoral Ward 2022')
         .rename_cols(education_data_2022_config['transformations']['column_rename'])
@@ -137,13 +142,27 @@ def main():
 
     education_data = pd.concat([education_data_2011, education_data_2022], ignore_index=True)
     
-    education_data_list = []
-    for _, group_df in education_data.groupby(['ward_code_2022']):
-        df = expand_date_range(group_df, 'date', 'ward_code_2022')
-        df = interpolate_df(df, ['pop_with_qual', 'pop_without_qual'])
-        education_data_list.append(df)
-    education_data = pd.concat(education_data_list, ignore_index=True)
+    education_data = expand_to_monthly(education_data, 'ward_code_2022', 'date', ['pop_with_qual', 'pop_without_qual'])
     education_data = education_data.rename(columns={'ward_code_2022':'ward_code'})
+    return education_data
+
+
+def main(config:dict|None=None, crosswalk:tuple|None=None):
+    '''
+    Runs the education refresh, taking the config and ward crosswalk if they have already been loaded, e.g. by the
+    refresh orchestrator. The education data is a cached stage, only rebuilt when the census files, their config or
+    the crosswalk change.
+    '''
+    config = config if config is not None else load_config()
+    crosswalk = crosswalk if crosswalk is not None else load_ward_crosswalk(config)
+
+    key = stage_key(
+        'education', STAGE_VERSION,
+        files=[PACKAGE_DIR / config['education_data_2011']['path'], PACKAGE_DIR / config['education_data_2022']['path']],
+        config={'education_data_2011':config['education_data_2011'], 'education_data_2022':config['education_data_2022']},
+        frames=crosswalk
+    )
+    education_data = cached_stage('education', key, lambda: build_education_data(config, crosswalk))
 
 
     schema = DataFrameSchema({
@@ -1,23 +1,25 @@
 import re
 from typing import Dict, List
-from io import BytesIO
 import os
 
 import requests
 import pandas as pd
+import polars as pl
 import numpy as np
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from dotenv import load_dotenv
 
 from src.data_pipelines.preprocessing.base_pipeline import BasePipeline
-from src.data_pipelines.preprocessing.utils import expand_date_range, interpolate_df, interpolate_forward
+from src.data_pipelines.preprocessing.utils import expand_to_monthly
+from src.data_pipelines.scraping.downloader import CachedDownloader
+from src.data_pipelines.scraping.staging import read_excel_staged
 from src.DB.DatabaseClient import DatabaseWriter
 
 
 class PopulationDensityPipeline(BasePipeline):
-    def __init__(self, data:pd.DataFrame):
-        super().__init__(data)
+    def __init__(self, data:pd.DataFrame, lazy:bool=False, backend:str|None=None):
+        super().__init__(data, lazy, backend)
 
     @classmethod
     def from_path(cls, path:str):
@@ -26,31 +28,31 @@ class PopulationDensityPipeline(BasePipeline):
         return cls(data)
 
     @classmethod
-    def from_scrape(cls, base_url:str, page_url:str, year:str):
+    def from_scrape(cls, base_url:str, page_url:str, year:str, columns:List[str]|None=None, categorical_columns:List[str]|None=None,
+                    header_pattern:str|None=None, downloader:CachedDownloader|None=None):
         '''
-        A function that allows the class to initiliased from scraping instead of by dataframe
+        A function that allows the class to initiliased from scraping instead of by dataframe. Only the sheet for the
+        year is parsed, and it is staged to Parquet so later runs read it back without parsing the workbook again.
         '''
+        downloader = downloader or CachedDownloader()
 
         #Generate the soup object for the url page
         url = urljoin(base=base_url, url=page_url)
         response = cls._url_response(url)
         soup = cls._generate_soup(response.content)
 
-        #Retrieve bytes for xlsx file
+        #Download the xlsx file, revalidating any cached copy
         page_data_url = cls._extract_data_url(soup, '.xlsx$')
         if isinstance(page_data_url, str):
             data_url = urljoin(base=base_url, url=page_data_url)
         else:
             raise TypeError(f'Expected type str, instead got type ({type(page_data_url)})')
-        data_bytes = cls._url_response(data_url)
+        workbook = downloader.fetch(data_url)
 
-        #Load the data into a dataframe
-        data = pd.read_excel(BytesIO(data_bytes.content), sheet_name=None)
-
-        if year in data.keys():
-            return cls(data[year])
-        else:
-            raise KeyError(f'Year {year} not present in data keys, only {list(data.keys())}')
+        #Load the year's sheet into a dataframe
+        data = read_excel_staged(workbook, downloader.cache_dir, sheet_name=year, columns=columns,
+                                 categorical_columns=categorical_columns, header_pattern=header_pattern)
+        return cls(data)
 
 
     @staticmethod
@@ -125,11 +127,20 @@ class PopulationDensityPipeline(BasePipeline):
         if isinstance(filter_values, str):
             filter_values = [filter_values]
 
+        if self.use_polars:
+            for filter_value in filter_values:
+                self.frame = self.frame.filter(pl.col(filter_col).cast(pl.String).str.contains(f'(?i){filter_value}'))
+            return self
+
         for filter_value in filter_values:    
             self.data = self.data[self.data[filter_col].str.contains(filter_value, case=False)].reset_index(drop=True)
         return self
     
     def set_date_column(self, date_col_name:str, date:str):
+        if self.use_polars:
+            self.frame = self.frame.with_columns(pl.lit(pd.to_datetime(date).to_pydatetime(), dtype=pl.Datetime('ns')).alias(date_col_name))
+            return self
+
         self.data[date_col_name] = pd.to_datetime(date)
         return self
 
@@ -137,23 +148,25 @@ class PopulationDensityPipeline(BasePipeline):
 def main():
     base_url = "https://www.nrscotland.gov.uk"
     page_url = f"{base_url}/publications/electoral-ward-population-estimates/"
-
-    population_data_2000 = PopulationDensityPipeline.from_scrape(base_url, page_url, '2001')
+    #Only the ward, sex and total columns are staged, the age breakdown is never used
+    population_sheet = {
+        'columns':['Electoral Ward 2022 Code', 'Electoral Ward 2022 Name', 'Sex', 'Total'],
+        'categorical_columns':['Electoral Ward 2022 Name', 'Sex'],
+        'header_pattern':'Electoral Ward 2022 Name'
+    }
+
+    population_data_2000 = PopulationDensityPipeline.from_scrape(base_url, page_url, '2001', **population_sheet)
     population_data_2000 = (
-        population_data_2000.find_new_colnames('Electoral Ward 2022 Name')
-        .drop_columns([col for col in population_data_2000.data.columns if 'Age' in col])
-        .filter_df('Sex', 'Persons')
+        population_data_2000.filter_df('Sex', 'Persons')
         .drop_columns(['Sex', 'Electoral Ward 2022 Name'])
         .rename_cols({'Electoral Ward 2022 Code':'ward_code', 'Total':'total_population'})
         .set_date_column('date', '2001-01-01')
         .extract_df()
     )
 
-    population_data_2025 = PopulationDensityPipeline.from_scrape(base_url, page_url, '2021')
+    population_data_2025 = PopulationDensityPipeline.from_scrape(base_url, page_url, '2021', **population_sheet)
     population_data_2025 = (
-        population_data_2025.find_new_colnames('Electoral Ward 2022 Name')
-        .drop_columns([col for col in population_data_2025.data.columns if 'Age' in col])
-        .filter_df('Sex', 'Persons')
+        population_data_2025.filter_df('Sex', 'Persons')
         .drop_columns(['Sex', 'Electoral Ward 2022 Name'])
         .rename_cols({'Electoral Ward 2022 Code':'ward_code', 'Total':'total_population'})
         .set_date_column('date', '2021-01-01')
@@ -176,14 +189,7 @@ def main():
     population_density_data['population_density'] = population_density_data['total_population'] / population_density_data['area']
     population_density_data = population_density_data.drop(['total_population', 'area'], axis=1)
 
-    population_density_data_list = []
-    for _, group_df in population_density_data.groupby(['ward_code']):
-        df = expand_date_range(group_df, 'date', 'ward_code')
-        df = interpolate_df(df, ['population_density'])
-        df = interpolate_forward(df, 'date', ['population_density'], pd.to_datetime('2025-01-01'))
-        population_density_data_list.append(df)
-
-    population_density_data = pd.concat(population_density_data_list, ignore_index=True)
+    population_density_data = expand_to_monthly(population_density_data, 'ward_code', 'date', 'population_density', end_date='2025-01-01')
     
     load_dotenv()
     DB_URL = os.getenv("SUPABASE_DB_URL")
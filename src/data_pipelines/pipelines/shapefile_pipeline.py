@@ -1,18 +1,26 @@
 from pathlib import Path
-import json
-from typing import List
+from typing import Dict, List, cast
 from dotenv import load_dotenv
 import os
 
 import pandas as pd
 import geopandas as gpd
+import shapely
 
+from src.data_pipelines.inputs import PACKAGE_DIR, load_config
 from src.data_pipelines.preprocessing.base_pipeline import BasePipeline
+from src.data_pipelines.preprocessing.stage_cache import cached_stage, stage_key
 from src.DB.DatabaseClient import DatabaseWriter
 
+
+#Bump when the boundary chain changes, so cached outputs built by older code are rebuilt
+STAGE_VERSION = 1
+
+
 class BoundaryPipeline(BasePipeline):
     def __init__(self, data: pd.DataFrame):
-        super().__init__(data)
+        #GeoDataFrames have no Polars equivalent, so boundaries always run on pandas
+        super().__init__(data, backend='pandas')
 
     @classmethod
     def from_path(cls, path:str):
@@ -38,33 +46,68 @@ class BoundaryPipeline(BasePipeline):
     def extract_gdf(self):
         return gpd.GeoDataFrame(self.data)
 
+    def extract_simplification_tiers(self, tiers:Dict[str, float], id_col:str='ward_code') -> gpd.GeoDataFrame:
+        '''
+        Simplifies the boundaries once per tier and stacks the tiers into one long geodataframe with their vertex counts.
+
+        The wards are simplified as a coverage, so neighbouring wards keep a shared edge and no gaps or slivers open up
+        between them at any tier.
+        '''
+        gdf = self.extract_gdf()
+
+        tier_gdfs = []
+        for tier, tolerance in tiers.items():
+            geometry = shapely.coverage_simplify(gdf.geometry.values, tolerance=tolerance)
+            tier_gdfs.append(gpd.GeoDataFrame({
+                id_col:gdf[id_col].to_numpy(),
+                'tier':tier,
+                'tolerance':tolerance,
+                'n_vertices':shapely.get_num_coordinates(geometry)
+            }, geometry=geometry, crs=gdf.crs))
+
+        return gpd.GeoDataFrame(pd.concat(tier_gdfs, ignore_index=True), crs=gdf.crs)
 
-if __name__ == '__main__':
-    CURRENT_DIR = Path(__file__).resolve()
-    for parent in CURRENT_DIR.parents:
-        if (parent / "data").exists():
-            PACKAGE_DIR = parent
-            break
-    else:
-        raise FileNotFoundError("Could not find project root containing 'data' folder")
-    
-    with open(PACKAGE_DIR/'src/data_pipelines/pipelines/config/transformations.json', 'r') as f:
-        config = json.load(f)
 
-    boundary_data = BoundaryPipeline.from_path(PACKAGE_DIR/config['ward_boundaries_2022']['path'])
+def build_boundaries(path:str|Path, boundary_config:dict) -> Dict[str, gpd.GeoDataFrame]:
+    '''
+    Builds the 2022 ward boundaries in WGS84 along with their simplification tiers
+    '''
+    boundary_data = BoundaryPipeline.from_path(path)
     boundary_data = (
         boundary_data.subset_columns(['WD25CD', 'geometry'])
         .filter_df('WD25CD', 'S')
         .rename_cols({'WD25CD':'ward_code'})
         .change_crs(4326)
-        .extract_gdf()
     )
+    boundary_tiers = boundary_data.extract_simplification_tiers(boundary_config['transformations']['simplification_tiers'])
+    boundary_data = boundary_data.extract_gdf()
 
     boundary_data["geometry"] = boundary_data["geometry"].simplify(tolerance=0.002, preserve_topology=True)
 
-    
+    return {'boundary_data':boundary_data, 'boundary_tiers':boundary_tiers}
+
+
+def main(config:dict|None=None):
+    '''
+    Runs the boundary refresh, taking the config if it has already been loaded, e.g. by the refresh orchestrator. The
+    boundaries are a cached stage, only rebuilt when the shapefile or its config change.
+    '''
+    config = config if config is not None else load_config()
+    boundary_config = config['ward_boundaries_2022']
+    path = PACKAGE_DIR / boundary_config['path']
+
+    key = stage_key('boundaries', STAGE_VERSION, files=[path], config=boundary_config)
+    boundaries = cast(Dict[str, gpd.GeoDataFrame], cached_stage('boundaries', key, lambda: build_boundaries(path, boundary_config)))
+    boundary_data, boundary_tiers = boundaries['boundary_data'], boundaries['boundary_tiers']
+
     load_dotenv()
     DB_URL = os.getenv("SUPABASE_DB_URL")
     databaseClient = DatabaseWriter(DB_URL=DB_URL)
     databaseClient.update_from_gpd(boundary_data, 'ward_boundary_data')
+    databaseClient.update_from_gpd(boundary_tiers, 'ward_boundary_tiers')
+    print(boundary_tiers.groupby('tier', sort=False)['n_vertices'].sum())
+
+
+if __name__ == '__main__':
+    main()
 
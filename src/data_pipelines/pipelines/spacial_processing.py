@@ -11,7 +11,8 @@ from src.data_pipelines.preprocessing.utils import normalise_text
 
 class BoundaryPipeline(BasePipeline):
     def __init__(self, data: DataFrame):
-        super().__init__(data)
+        #GeoDataFrames have no Polars equivalent, so boundaries always run on pandas
+        super().__init__(data, backend='pandas')
 
     @classmethod
     def from_file(cls, path:str):
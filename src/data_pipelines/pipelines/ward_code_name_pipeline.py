@@ -1,21 +1,20 @@
 import os
-import json
 from dotenv import load_dotenv  
-from pathlib import Path    
 
 import pandas as pd
 
+from src.data_pipelines.inputs import PACKAGE_DIR, load_config
 from src.data_pipelines.preprocessing.spacial_processing import load_and_prepare_shapefile
 from src.data_pipelines.preprocessing.utils import rename_column_names
 from src.DB.DatabaseClient import DatabaseWriter
 
 
-if __name__ == '__main__':
-    CURRENT_DIR = Path(__file__).resolve().parent
-    PACKAGE_DIR = CURRENT_DIR.parent.parent.parent
-
-    with open(PACKAGE_DIR / 'src/data_pipelines/pipelines/config/transformations.json') as f:
-        config = json.load(f)
+def main(config:dict|None=None):
+    '''
+    Runs the ward code to name refresh, taking the config if it has already been loaded, e.g. by the refresh
+    orchestrator
+    '''
+    config = config if config is not None else load_config()
     ward_boundaries_2022_config = config['ward_boundaries_2022']
 
 
@@ -30,3 +29,6 @@ if __name__ == '__main__':
     databaseClient = DatabaseWriter(DB_URL=DB_URL)
     databaseClient.update_database(ward_code_lookup, 'ward_code_name')
 
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,94 @@
-from typing import Dict, List, Callable
+import os
+from typing import Dict, List, Callable, Tuple
 
 import pandas as pd
+import polars as pl
+
+from src.data_pipelines.preprocessing.spacial_processing import ArealWeights
+
+
+BACKENDS = ('pandas', 'polars')
+#Backend used when a pipeline is not given one, so a whole refresh can be switched to Polars with one variable
+DEFAULT_BACKEND = os.getenv('PIPELINE_BACKEND', 'pandas')
 
 class BasePipeline:
-    def __init__(self, data:pd.DataFrame):
+    '''
+    A chain of dataframe transformations. In lazy mode the column selections, renames, joins and column edits are
+    recorded as a plan instead of run straight away; adjacent selections and renames are fused into one projection,
+    and the plan is run in one pass the next time the data is read, e.g. by extract_df. Any other method reads
+    self.data, which runs the plan first, so results are the same as in eager mode.
+
+    With the polars backend the chain is built on a multi-threaded Polars LazyFrame instead, which plans the whole
+    chain itself. Methods without a Polars implementation read and write self.data, which converts to pandas and back
+    at that step, and self.data and extract_df always return pandas.
+    '''
+    def __init__(self, data:pd.DataFrame, lazy:bool=False, backend:str|None=None):
+        backend = backend or DEFAULT_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError(f'Expected a backend in {BACKENDS}, instead got {backend}')
+
+        self.lazy = lazy
+        self.backend = backend
         self.data = data
-    
-    
+
+    @property
+    def data(self) -> pd.DataFrame:
+        if self._frame is not None:
+            self._data = self._frame.collect().to_pandas()
+            self._frame = None
+        if self._plan:
+            self._data = self._run_plan(self._data, self._plan)
+            self._plan = []
+        return self._data
+
+    @data.setter
+    def data(self, data:pd.DataFrame) -> None:
+        self._data = data
+        self._frame:pl.LazyFrame|None = None
+        self._plan:List[tuple] = []
+        self._plan_columns:List[str] = []
+
+    @property
+    def columns(self) -> List[str]:
+        '''
+        The column names, including the effect of any planned steps, without running the plan
+        '''
+        if self._frame is not None:
+            return self._frame.collect_schema().names()
+        return list(self._plan_columns) if self._plan else list(self._data.columns)
+
+    @property
+    def use_polars(self) -> bool:
+        return self.backend == 'polars'
+
+    @property
+    def frame(self) -> pl.LazyFrame:
+        '''
+        The data as a Polars LazyFrame, converting it from pandas if the last step ran in pandas
+        '''
+        if self._frame is None:
+            self._frame = pl.from_pandas(self.data).lazy()
+            self._data = None
+        return self._frame
+
+    @frame.setter
+    def frame(self, frame:pl.LazyFrame) -> None:
+        self._frame = frame
+        self._data = None
+
     def rename_cols(self, rename_map:Dict[str,str]):
         '''
         Renames the columns in a dataframe using a dictionary
         '''
-        self._check_list_subset(list(rename_map.keys()), list(self.data.columns))
-        
+        self._check_list_subset(list(rename_map.keys()), self.columns)
+
+        if self.use_polars:
+            self.frame = self.frame.rename(rename_map)
+            return self
+        if self.lazy:
+            self._plan_projection(lambda pairs: [(source, rename_map.get(col, col)) for source, col in pairs])
+            return self
+
         self.data = self.data.rename(
             columns=rename_map
         )
@@ -22,7 +98,11 @@ class BasePipeline:
         '''
         Divides two columns in a dataframe rowise
         '''
-        self._check_list_subset([col_numerator_name, col_denominator_name], list(self.data.columns))
+        self._check_list_subset([col_numerator_name, col_denominator_name], self.columns)
+
+        if self.use_polars:
+            self.frame = self.frame.with_columns((pl.col(col_numerator_name) / pl.col(col_denominator_name)).alias(new_col_name))
+            return self
 
         self.data[new_col_name] = self.data[col_numerator_name].div(self.data[col_denominator_name])
         return self
@@ -31,7 +111,7 @@ class BasePipeline:
         '''
         
         '''
-        self._check_list_subset([col_numerator_name, col_denominator_name], list(self.data.columns))
+        self._check_list_subset([col_numerator_name, col_denominator_name], self.columns)
 
         new_col = self.data[col_numerator_name].div(self.data[col_denominator_name])
         return new_col
@@ -40,13 +120,17 @@ class BasePipeline:
         '''
         Adds a series of columns in a dataframe rowise
         '''
-        self._check_list_subset(cols_to_add, list(self.data.columns))
+        self._check_list_subset(cols_to_add, self.columns)
+
+        if self.use_polars:
+            self.frame = self.frame.with_columns(pl.sum_horizontal(cols_to_add).alias(new_col_name))
+            return self
 
         self.data[new_col_name] = self.data[cols_to_add].sum(axis=1)
         return self
     
     def mul_cols(self, col1_name:str, col2_name:str):
-        self._check_list_subset([col1_name, col2_name], list(self.data.columns))
+        self._check_list_subset([col1_name, col2_name], self.columns)
 
         new_col = self.data[col1_name].mul(self.data[col2_name])
         return new_col
@@ -55,40 +139,105 @@ class BasePipeline:
         '''
         Subsets a dataframe by selecting columns
         '''
-        self._check_list_subset(column_subset_list, list(self.data.columns))
+        self._check_list_subset(column_subset_list, self.columns)
+
+        if self.use_polars:
+            self.frame = self.frame.select(column_subset_list)
+            return self
+        if self.lazy:
+            self._plan_projection(lambda pairs: [next(pair for pair in pairs if pair[1] == col) for col in column_subset_list])
+            return self
 
         self.data = self.data[column_subset_list]
         return self
     
     def normalise_column(self, normalise_func:Callable, col_to_normalise:str):
-        self._check_list_subset(col_to_normalise, list(self.data.columns))
+        self._check_list_subset(col_to_normalise, self.columns)
 
         # if not self.data[col_to_normalise].dtype == str:
         #     self.data[col_to_normalise] = self.data[col_to_normalise].astype(str)
 
-        self.data[col_to_normalise] = self.data[col_to_normalise].apply(normalise_func)
+        if self.use_polars:
+            #Functions with a Polars expression, e.g. normalise_text, run natively, anything else one call per row
+            expression = getattr(normalise_func, 'polars', None)
+            if expression is not None:
+                self.frame = self.frame.with_columns(expression(col_to_normalise).alias(col_to_normalise))
+            else:
+                self.frame = self.frame.with_columns(pl.col(col_to_normalise).map_elements(normalise_func, return_dtype=pl.String))
+            return self
+        if self.lazy:
+            self._plan_step(('normalise', col_to_normalise, normalise_func), self.columns)
+            return self
+
+        self._normalise(self.data, col_to_normalise, normalise_func)
         return self
+
+    @staticmethod
+    def _normalise(data:pd.DataFrame, col:str, normalise_func:Callable) -> None:
+        #Functions with a whole column implementation, e.g. normalise_text, run that instead of one call per row
+        vectorised = getattr(normalise_func, 'vectorised', None)
+        if vectorised is not None:
+            data[col] = vectorised(data[col])
+        else:
+            data[col] = data[col].apply(normalise_func)
     
     def left_join(self, data_to_merge:pd.DataFrame, merging_column:str):
-        self._check_list_subset(merging_column, list(self.data.columns))
-        self._check_list_subset(merging_column, list(data_to_merge.columns))
-
         if not isinstance(data_to_merge, pd.DataFrame):
             raise ValueError(f'Expectetd pd.DataFrame, instead got {type(data_to_merge).__name__}')
-        
+
+        self._check_list_subset(merging_column, self.columns)
+        self._check_list_subset(merging_column, list(data_to_merge.columns))
+
+        if self.use_polars:
+            self.frame = self._polars_left_join(self.frame, data_to_merge, merging_column)
+            return self
+        if self.lazy:
+            self._plan_step(('join', data_to_merge, merging_column), self._joined_columns(self.columns, list(data_to_merge.columns), merging_column))
+            return self
+
         self.data = self.data.merge(data_to_merge, on=merging_column, how='left')
         return self
     
+    def apply_areal_weights(self, weights:ArealWeights, source_col:str, target_col:str, value_cols:List[str]):
+        '''
+        Moves values from one set of wards to another with a sparse areal weight matrix, replacing the data with one
+        row per target ward
+        '''
+        self._check_list_subset([source_col, *value_cols], self.columns)
+
+        reweighted = weights.apply(self.data.set_index(source_col)[value_cols])
+        self.data = reweighted.rename_axis(target_col).reset_index()
+        return self
+
     def apply_manual_edits(self, col:str, mannual_edits:Dict[str,str]):
-        self._check_list_subset(col, list(self.data.columns))
+        self._check_list_subset(col, self.columns)
 
-        self.data[col] = self.data[col].map(
+        if self.use_polars:
+            self.frame = self.frame.with_columns(pl.col(col).replace(mannual_edits))
+            return self
+        if self.lazy:
+            self._plan_step(('edit', col, mannual_edits), self.columns)
+            return self
+
+        self._manual_edits(self.data, col, mannual_edits)
+        return self
+
+    @staticmethod
+    def _manual_edits(data:pd.DataFrame, col:str, mannual_edits:Dict[str,str]) -> None:
+        data[col] = data[col].map(
             lambda x:mannual_edits.get(x,x)  #type: ignore
         )
-        return self
     
     def drop_columns(self, columns_to_drop:List[str]|str):
-        self._check_list_subset(columns_to_drop, list(self.data.columns))
+        self._check_list_subset(columns_to_drop, self.columns)
+
+        if self.use_polars:
+            self.frame = self.frame.drop(columns_to_drop)
+            return self
+        if self.lazy:
+            dropped = {columns_to_drop} if isinstance(columns_to_drop, str) else set(columns_to_drop)
+            self._plan_projection(lambda pairs: [pair for pair in pairs if pair[1] not in dropped])
+            return self
 
         self.data = self.data.drop(columns_to_drop, axis=1)
         return self
@@ -101,9 +250,74 @@ class BasePipeline:
         if isinstance(columns_to_check, str):
             columns_to_check = [columns_to_check]
 
-        missing_cols = [col for col in columns_to_check if col not in columns_list]
+        missing_cols = set(columns_to_check).difference(columns_list)
         if missing_cols:
-            raise ValueError(f'{missing_cols} were expected in column names but were missing')
+            raise ValueError(f'{[col for col in columns_to_check if col in missing_cols]} were expected in column names but were missing')
+
+    def _plan_step(self, step:tuple, columns:List[str]) -> None:
+        self._plan.append(step)
+        self._plan_columns = columns
+
+    def _plan_projection(self, project:Callable[[List[Tuple[str, str]]], List[Tuple[str, str]]]) -> None:
+        '''
+        Plans a column selection or rename as (source column, output column) pairs, folding it into the previous step
+        if that was a projection too
+        '''
+        if self._plan and self._plan[-1][0] == 'project':
+            pairs = project(self._plan.pop()[1])
+        else:
+            pairs = project([(col, col) for col in self.columns])
+        self._plan_step(('project', pairs), [col for _, col in pairs])
+
+    @staticmethod
+    def _joined_columns(left:List[str], right:List[str], on:str) -> List[str]:
+        '''
+        The columns of a left join on one column, with pandas' default suffixes for overlapping names
+        '''
+        overlap = set(left).intersection(right) - {on}
+        return [f'{col}_x' if col in overlap else col for col in left] + [f'{col}_y' if col in overlap else col for col in right if col != on]
+
+    def _polars_left_join(self, frame:pl.LazyFrame, data_to_merge:pd.DataFrame, on:str) -> pl.LazyFrame:
+        '''
+        A left join that keeps the left row order, matches missing keys and names overlapping columns like pandas
+        '''
+        left, right = frame.collect_schema().names(), list(data_to_merge.columns)
+        overlap = set(left).intersection(right) - {on}
+        frame = frame.rename({col:f'{col}_x' for col in overlap})
+        other = pl.from_pandas(data_to_merge.rename(columns={col:f'{col}_y' for col in overlap})).lazy()
+        return frame.join(other, on=on, how='left', nulls_equal=True, maintain_order='left')
+
+    def _polars_group_sum(self, grouping_columns:List[str]|str, summing_column:List[str]|str) -> None:
+        '''
+        Sums columns by group like pandas, sorted by the group keys and dropping rows with missing keys
+        '''
+        grouping_columns = [grouping_columns] if isinstance(grouping_columns, str) else list(grouping_columns)
+        self.frame = (
+            self.frame.drop_nulls(grouping_columns)
+            .group_by(grouping_columns)
+            .agg(pl.col(summing_column).sum())
+            .sort(grouping_columns)
+        )
+
+    def _run_plan(self, data:pd.DataFrame, plan:List[tuple]) -> pd.DataFrame:
+        '''
+        Runs the planned steps in order, each fused projection being a single take and relabel of the columns
+        '''
+        for step in plan:
+            if step[0] == 'project':
+                sources, columns = [source for source, _ in step[1]], [col for _, col in step[1]]
+                if sources != list(data.columns):
+                    data = data.take(data.columns.get_indexer(sources), axis=1)
+                if columns != list(data.columns):
+                    data = data.copy(deep=False)
+                    data.columns = columns
+            elif step[0] == 'normalise':
+                self._normalise(data, step[1], step[2])
+            elif step[0] == 'edit':
+                self._manual_edits(data, step[1], step[2])
+            elif step[0] == 'join':
+                data = data.merge(step[1], on=step[2], how='left')
+        return data
         
 
     def extract_df(self):
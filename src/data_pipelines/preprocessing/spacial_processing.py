@@ -1,7 +1,17 @@
-from typing import List, Callable, cast
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Callable, Tuple, cast
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
+import shapely
+from scipy import sparse
+
+from src.data_pipelines.preprocessing.utils import normalise_text
+from src.data_pipelines.preprocessing.stage_cache import cached_stage, stage_key
+
 
 def extract_lookup(gdf:gpd.GeoDataFrame, ward_name_col:str, ward_code_col:str):
     '''
@@ -65,15 +75,74 @@ def prepare_wards(gdf, ID:str, crs_epsg:int) -> gpd.GeoDataFrame:
 
     return gdf
 
-def calculate_overlap(df_1:gpd.GeoDataFrame, df_2:gpd.GeoDataFrame):
+class ArealWeights():
     '''
-    
+    A sparse (source ward x target ward) matrix of areal weights, where each entry is the share of the source ward's
+    area that lies inside the target ward. Applying it to per source ward values is a single sparse matrix multiply.
+    '''
+    def __init__(self, matrix:sparse.csr_matrix, source_codes:np.ndarray, target_codes:np.ndarray) -> None:
+        self.matrix = matrix
+        self.source_codes = source_codes
+        self.target_codes = target_codes
+
+    @classmethod
+    def from_frame(cls, df:pd.DataFrame, source_col:str, target_col:str, weight_col:str='overlap_pct') -> 'ArealWeights':
+        '''
+        Builds the weights from a long crosswalk with one row per overlapping (source, target) pair
+        '''
+        source_codes, source_idx = np.unique(df[source_col].to_numpy(), return_inverse=True)
+        target_codes, target_idx = np.unique(df[target_col].to_numpy(), return_inverse=True)
+        matrix = sparse.csr_matrix((df[weight_col].to_numpy(dtype=float), (source_idx, target_idx)), shape=(len(source_codes), len(target_codes)))
+        return cls(matrix, source_codes, target_codes)
+
+    def to_frame(self, source_col:str, target_col:str, weight_col:str='overlap_pct') -> pd.DataFrame:
+        coo = self.matrix.tocoo()
+        return pd.DataFrame({
+            source_col:self.source_codes[coo.row],
+            target_col:self.target_codes[coo.col],
+            weight_col:coo.data
+        })
+
+    def apply(self, values:pd.DataFrame) -> pd.DataFrame:
+        '''
+        Reweights values indexed by source ward code onto the target wards. Missing values count as zero, sources not
+        in the weights are dropped, and only target wards that receive at least one source are returned.
+        '''
+        values = values.groupby(level=0).sum().reindex(self.source_codes)
+        present = values.notna().any(axis=1).to_numpy(dtype=float)
+
+        reweighted = self.matrix.T @ values.fillna(0).to_numpy(dtype=float)
+        covered = (self.matrix.T @ present) > 0
+
+        return pd.DataFrame(reweighted[covered], index=pd.Index(self.target_codes[covered], name=values.index.name), columns=values.columns)
+
+
+def calculate_areal_weights(source:gpd.GeoDataFrame, target:gpd.GeoDataFrame, source_code_col:str, target_code_col:str) -> ArealWeights:
     '''
-    df = gpd.overlay(df_1, df_2, how='intersection', keep_geom_type=True)
-    df['overlap_area'] = df.geometry.area
-    df['overlap_pct'] = df['overlap_area'] / df[[c for c in df.columns if "area" in c.lower()][0]]
+    Calculates the areal weights between two sets of polygons in the same projected CRS.
 
-    return df
+    An STRtree over the target polygons finds the candidate pairs whose bounding boxes overlap, and only those pairs are
+    intersected, in bulk. Pairs that only touch along an edge have no area and are dropped.
+    '''
+    if source.crs != target.crs:
+        raise ValueError(f'Source and target CRS differ: {source.crs} and {target.crs}')
+
+    source_geometry = source.geometry.to_numpy()
+    target_geometry = target.geometry.to_numpy()
+
+    tree = shapely.STRtree(target_geometry)
+    source_idx, target_idx = tree.query(source_geometry, predicate='intersects')
+
+    overlap_area = shapely.area(shapely.intersection(source_geometry[source_idx], target_geometry[target_idx]))
+    keep = overlap_area > 0
+    source_idx, target_idx = source_idx[keep], target_idx[keep]
+    weights = overlap_area[keep] / shapely.area(source_geometry)[source_idx]
+
+    source_codes = source[source_code_col].to_numpy()
+    target_codes = target[target_code_col].to_numpy()
+    matrix = sparse.csr_matrix((weights, (source_idx, target_idx)), shape=(len(source_codes), len(target_codes)))
+
+    return ArealWeights(matrix, source_codes, target_codes)
 
 def load_and_prepare_shapefile(path:str|None, code_col:str, name_col:str, year_id:str, crs_epsg:int, normalise_func:Callable|None = None, data:gpd.GeoDataFrame|None = None):
     '''
@@ -111,3 +180,67 @@ def apply_disambiguation(df, code_col: str, name_col: str, disambiguation: dict)
         
 
     return df
+
+def to_compact_geojson(gdf:gpd.GeoDataFrame, id_col:str='ward_code', precision:int=5) -> str:
+    '''
+    Serialises a GeoDataFrame to a minimal GeoJSON FeatureCollection for the map. Every feature carries only its
+    geometry and its id, coordinates are rounded to precision decimal places (5 is roughly 1m in WGS84) and the JSON
+    is written without whitespace.
+    '''
+    if id_col not in gdf.columns:
+        raise ValueError(f'Column ({id_col}) not present in gdf columns')
+
+    gdf = gdf.to_crs(epsg=4326) if gdf.crs is not None else gdf
+    geometries = shapely.transform(gdf.geometry.values, lambda coords: np.round(coords, precision))
+
+    features = [
+        {'type':'Feature', 'id':ward_code, 'properties':{}, 'geometry':shapely.geometry.mapping(geometry)}
+        for ward_code, geometry in zip(gdf[id_col], geometries)
+    ]
+    return json.dumps({'type':'FeatureCollection', 'features':features}, separators=(',', ':'))
+
+
+#Bump when the crosswalk logic changes, so artifacts built by older code are not reused
+CROSSWALK_VERSION = 3
+DEFAULT_ARTIFACT_DIR = Path(__file__).resolve().parents[3] / 'data' / 'artifacts' / 'crosswalk'
+
+
+def build_crosswalk(path_2007:str|Path, path_2022:str|Path, disambiguation_2007:Dict[str, str], disambiguation_2022:Dict[str, str]) -> Dict[str, pd.DataFrame]:
+    '''
+    Builds the 2007 to 2022 ward crosswalk from the overlap of the two sets of boundaries, along with the normalised
+    ward name to ward code lookups for both years
+    '''
+    ward_2007_geometry, ward_code_2007_lookup = load_and_prepare_shapefile(str(path_2007), 'ONS_2010', 'Name', '2007', 27700, normalise_text)
+    ward_2022_geometry, ward_code_2022_lookup = load_and_prepare_shapefile(str(path_2022), 'WD25CD', 'WD25NM', '2022', 27700, normalise_text)
+
+    ward_2007_2022_map = (
+        calculate_areal_weights(ward_2007_geometry, ward_2022_geometry, 'ward_code_2007', 'ward_code_2022')
+        .to_frame('ward_code_2007', 'ward_code_2022', 'overlap_pct')
+    )
+
+    return {
+        'ward_2007_2022_map':ward_2007_2022_map,
+        'ward_code_2007_lookup':apply_disambiguation(pd.DataFrame(ward_code_2007_lookup), 'ward_code_2007', 'ward_name_2007', disambiguation_2007),
+        'ward_code_2022_lookup':apply_disambiguation(pd.DataFrame(ward_code_2022_lookup), 'ward_code_2022', 'ward_name_2022', disambiguation_2022)
+    }
+
+def load_crosswalk(path_2007:str|Path, path_2022:str|Path, disambiguation_2007:Dict[str, str], disambiguation_2022:Dict[str, str], artifact_dir:str|Path|None=None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    '''
+    Returns the 2007 to 2022 crosswalk and the 2007 and 2022 name lookups, from a Parquet artifact when one exists.
+
+    The artifact is a cached stage keyed on both shapefiles' contents, the disambiguation maps and CROSSWALK_VERSION,
+    so it is only rebuilt, with the expensive overlay, when one of those changes.
+    '''
+    artifact_dir = Path(artifact_dir or os.getenv('CROSSWALK_ARTIFACT_DIR', DEFAULT_ARTIFACT_DIR))
+    key = stage_key(
+        'crosswalk', CROSSWALK_VERSION,
+        files=[path_2007, path_2022],
+        config={'disambiguation_2007':disambiguation_2007, 'disambiguation_2022':disambiguation_2022}
+    )
+    tables = cast(Dict[str, pd.DataFrame], cached_stage(
+        'crosswalk', key,
+        lambda: build_crosswalk(path_2007, path_2022, disambiguation_2007, disambiguation_2022),
+        cache_dir=artifact_dir
+    ))
+
+    return tables['ward_2007_2022_map'], tables['ward_code_2007_lookup'], tables['ward_code_2022_lookup']
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, Iterable
+
+import geopandas as gpd
+import pandas as pd
+
+
+#Files that make up a shapefile, any of them changing changes the stages built from it
+SHAPEFILE_COMPONENTS = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+DEFAULT_STAGE_CACHE_DIR = Path(__file__).resolve().parents[3] / 'data' / 'artifacts' / 'stages'
+
+
+def file_checksum(path:str|Path, chunk_size:int=1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def shapefile_checksum(path:str|Path) -> str:
+    '''
+    Hashes every component file of a shapefile (.shp, .dbf, .prj, ...) that exists alongside it
+    '''
+    path = Path(path)
+    digest = hashlib.sha256()
+    for suffix in SHAPEFILE_COMPONENTS:
+        component = path.with_suffix(suffix)
+        if component.exists():
+            digest.update(f'{suffix}:{file_checksum(component)}'.encode('utf-8'))
+    return digest.hexdigest()
+
+def frame_checksum(data:pd.DataFrame) -> str:
+    '''
+    Hashes a dataframe's contents and column names, for stages whose inputs are the outputs of other stages
+    '''
+    digest = hashlib.sha256(json.dumps([str(col) for col in data.columns]).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def stage_key(name:str, version:int, files:Iterable[str|Path]=(), config:dict|None=None, frames:Iterable[pd.DataFrame]=()) -> str:
+    '''
+    Keys a stage on its code version, the contents of its input files, its section of the config and the contents of
+    any dataframes it takes from upstream stages, so the key changes whenever anything the output depends on does
+    '''
+    return hashlib.sha256(json.dumps({
+        'name':name,
+        'version':version,
+        'files':[shapefile_checksum(path) if Path(path).suffix == '.shp' else file_checksum(path) for path in files],
+        'config':config,
+        'frames':[frame_checksum(frame) for frame in frames]
+    }, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def cached_stage(name:str, key:str, build:Callable[[], pd.DataFrame|Dict[str, pd.DataFrame]], cache_dir:str|Path|None=None) -> pd.DataFrame|Dict[str, pd.DataFrame]:
+    '''
+    Returns a stage's output from its Parquet artifact when one exists for the key, otherwise builds and stores it.
+    The output is a dataframe or a dictionary of them, GeoDataFrames are stored as GeoParquet.
+    '''
+    cache_dir = Path(cache_dir or os.getenv('STAGE_CACHE_DIR', DEFAULT_STAGE_CACHE_DIR))
+    artifact_path = cache_dir / name / key
+
+    if artifact_path.exists():
+        print(f"✅Loaded stage {name} {key} from {artifact_path}")
+        return _read_artifact(artifact_path)
+
+    output = build()
+    tables = output if isinstance(output, dict) else {'data':output}
+
+    #Write to a temporary directory first and rename it into place, so a crash never leaves a partial artifact
+    artifact_path.parent.mkdir(parents=True, exist_ok=True)
+    #and the staging directory is removed whatever fails, e.g. a table that cannot be written to Parquet
+    staging_path = Path(tempfile.mkdtemp(dir=artifact_path.parent, prefix=f'.{key}-'))
+    renamed = False
+    try:
+        manifest = {'single':not isinstance(output, dict), 'tables':{}}
+        for table_name, table in tables.items():
+            is_geo = isinstance(table, gpd.GeoDataFrame)
+            table.to_parquet(staging_path / f'{table_name}.parquet')
+            manifest['tables'][table_name] = {'geo':is_geo}
+        (staging_path / 'manifest.json').write_text(json.dumps(manifest))
+        os.replace(staging_path, artifact_path)
+        renamed = True
+    except OSError:
+        #Another process may have stored the same artifact first, which is as good as this one
+        if not artifact_path.exists():
+            raise
+    finally:
+        if not renamed:
+            shutil.rmtree(staging_path, ignore_errors=True)
+    print(f"✅Built stage {name} {key} at {artifact_path}")
+
+    return output
+
+def _read_artifact(artifact_path:Path) -> pd.DataFrame|Dict[str, pd.DataFrame]:
+    manifest = json.loads((artifact_path / 'manifest.json').read_text())
+    tables = {
+        table_name:(gpd.read_parquet if info['geo'] else pd.read_parquet)(artifact_path / f'{table_name}.parquet')
+        for table_name, info in manifest['tables'].items()
+    }
+    return tables['data'] if manifest['single'] else tables
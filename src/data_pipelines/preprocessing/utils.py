@@ -1,43 +1,82 @@
+import csv
 import re
 import unicodedata
+from functools import lru_cache
 from typing import List, Tuple, Dict, Callable
-from dateutil.relativedelta import relativedelta
 
 import pandas as pd
 import numpy as np
+import polars as pl
 
 
 
 
+#Every character where str.isspace() is true, which is the set the regex \s matches
+UNICODE_WHITESPACE = '\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680' + ''.join(chr(c) for c in range(0x2000, 0x200b)) + '\u2028\u2029\u202f\u205f\u3000'
+#Characters removed from ward names in a single translate pass
+_NAME_DELETE_TABLE = str.maketrans('', '', "&/,.-'()’" + UNICODE_WHITESPACE)
+
+
+@lru_cache(maxsize=16384)
+def _normalise_name(string:str) -> str:
+    string = string.lower().replace(' and ', '').translate(_NAME_DELETE_TABLE).replace('agus', '')
+    if string.endswith('ward'):
+        string = string[:-4]
+
+    # Normalize Unicode characters (decompose accents)
+    return unicodedata.normalize('NFKD', string).encode('ASCII', 'ignore').decode('utf-8')
+
 def normalise_text(string: str) -> str:
+    '''
+    Canonicalises a ward name so names from different sources can be joined: lower cased, with ' and ', punctuation,
+    whitespace, 'agus' and a trailing 'ward' removed and accents stripped. Results are cached per raw name, as the same
+    names repeat across every row of the crime sheets.
+    '''
     if pd.isna(string):
         return ''
-    
-    # conditions = [' and ', '&', '/', '-']
-
-    # for condition in conditions:
-    #     string = re.sub(condition, '', string)
-
-
-    string = string.lower()
-    string = re.sub(' and ', '', string)
-    string = re.sub('&', '', string)
-    string = re.sub('/', '', string)
-    string = re.sub(',', '', string)
-    string = re.sub(r'[.]', '', string)
-    string = re.sub('-', '', string)
-    string = re.sub("'", '', string)
-    string = re.sub(r'[()]', '', string)
-    string = re.sub(r'[’]', '', string)
-    string = re.sub(r"\s+", '', string)
-    string = re.sub('agus', '', string)
-    string = re.sub('ward$', '', string)
+    return _normalise_name(string)
 
-    # Normalize Unicode characters (decompose accents)
-    normalized = unicodedata.normalize('NFKD', string)
-    string = normalized.encode('ASCII', 'ignore').decode('utf-8')
+def normalise_series(series:pd.Series) -> pd.Series:
+    '''
+    normalise_text over a whole series, normalising each distinct name once with the Series.str methods and mapping
+    the results back onto the rows
+    '''
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    names = pd.Series(uniques, dtype=object).str
+
+    normalised = (
+        names.lower()
+        .str.replace(' and ', '', regex=False)
+        .str.translate(_NAME_DELETE_TABLE)
+        .str.replace('agus', '', regex=False)
+        .str.removesuffix('ward')
+        .str.normalize('NFKD')
+        .str.encode('ascii', 'ignore')
+        .str.decode('utf-8')
+    )
+    normalised = np.append(normalised.to_numpy(dtype=object), '')
+
+    return pd.Series(normalised[codes], index=series.index, name=series.name)
+
+def normalise_expr(column:str) -> pl.Expr:
+    '''
+    normalise_text as a Polars expression, for pipelines running on the Polars backend. Stripping the characters left
+    outside ASCII after NFKD matches encoding to ASCII with errors ignored.
+    '''
+    deleted = '[' + ''.join(f'\\x{{{ord(char):x}}}' for char in "&/,.-'()’" + UNICODE_WHITESPACE) + ']'
+    return (
+        pl.col(column).cast(pl.String).str.to_lowercase()
+        .str.replace_all(' and ', '', literal=True)
+        .str.replace_all(deleted, '')
+        .str.replace_all('agus', '', literal=True)
+        .str.strip_suffix('ward')
+        .str.normalize('NFKD')
+        .str.replace_all(r'[^\x00-\x7F]', '')
+        .fill_null('')
+    )
 
-    return string
+normalise_text.vectorised = normalise_series  #type: ignore
+normalise_text.polars = normalise_expr  #type: ignore
 
 def normalise_column_name(col_name:str) -> str:
     col_name = col_name.lower()
@@ -95,59 +134,107 @@ def extact_row(row:pd.Series, suffix:str):
 
     return row
 
-def expand_date_range(df:pd.DataFrame, date_col:str, ward_col:str):
-    start_date, end_date = df[date_col].min(), df[date_col].max()
-    month_delta = relativedelta(end_date, start_date)
-    n_months = (month_delta.years * 12 + month_delta.months) 
-
-    blank_rows = pd.DataFrame({col:[np.nan]*(n_months-1) for col in df.columns})
-
-    month_col = [start_date+pd.offsets.MonthBegin(n=i) for i in range(1,len(blank_rows)+1)]
-    blank_rows['date'] = month_col
-    df = pd.concat([df.iloc[[0]], blank_rows, df.iloc[[1]]]).reset_index(drop=True)
-
-    df[ward_col] = df.loc[0, ward_col]
+def expand_to_monthly(df:pd.DataFrame, ward_col:str, date_col:str, value_cols:List[str]|str, end_date:str|pd.Timestamp|None=None) -> pd.DataFrame:
+    '''
+    Expands sparse (e.g. census year) observations into a monthly series for every ward in one vectorised pass.
 
-    # df['year'] = df['date'].dt.year
-    # df['month'] = df['date'].dt.month
-    # df = df.drop('date', axis=1)
-    
-    return df
+    The full ward x month grid is built at once, running from each ward's first observation to its last, or to end_date
+    if that is later. Every value column is linearly interpolated between observations, and carried forward flat from
+    the last observation to the end of the grid. Observations in the same ward and month are averaged.
 
-def interpolate_df(row:pd.DataFrame, columns_to_interpolate:List[str]|str):
+    Returns only the ward, date and value columns, sorted by ward and date.
     '''
-    A function that given a dataframe with two rows, where each row has a date, it will generate new rows, interpolating any data between these two dates
+    value_cols = [value_cols] if isinstance(value_cols, str) else list(value_cols)
+
+    df = df.dropna(subset=[ward_col, date_col])
+    dates = pd.to_datetime(df[date_col])
+    observations = (
+        df[value_cols].apply(pd.to_numeric)
+        .assign(_ward=df[ward_col].to_numpy(), _month=(dates.dt.year * 12 + dates.dt.month - 1).to_numpy())
+        .groupby(['_ward', '_month'], sort=True)[value_cols].mean()
+    )
+    if observations.empty:
+        return pd.DataFrame(columns=[ward_col, date_col, *value_cols])
+
+    ward_codes, obs_ward = np.unique(observations.index.get_level_values('_ward').to_numpy(), return_inverse=True)
+    obs_month = observations.index.get_level_values('_month').to_numpy()
+
+    #Observations are sorted by ward then month, so each ward's first and last observations bound its block
+    is_first = np.r_[True, obs_ward[1:] != obs_ward[:-1]]
+    is_last = np.r_[obs_ward[1:] != obs_ward[:-1], True]
+    first_month, stop_month = obs_month[is_first], obs_month[is_last]
+    if end_date is not None:
+        end_date = pd.Timestamp(end_date)
+        stop_month = np.maximum(stop_month, end_date.year * 12 + end_date.month - 1)
+
+    #Grid of every (ward, month) from the ward's first observation to its last or the end date
+    lengths = stop_month - first_month + 1
+    grid_ward = np.repeat(np.arange(len(ward_codes)), lengths)
+    grid_month = first_month[grid_ward] + np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    #Wards are laid end to end on one axis so a single np.interp covers them all without mixing neighbouring wards
+    origin, span = first_month.min(), int(stop_month.max() - first_month.min()) + 1
+    obs_x = obs_ward * span + (obs_month - origin)
+    grid_x = grid_ward * span + (grid_month - origin)
+
+    monthly = {
+        ward_col:ward_codes[grid_ward],
+        date_col:(grid_month - 1970 * 12).astype('datetime64[M]').astype('datetime64[ns]')
+    }
+    for col, values in zip(value_cols, observations.to_numpy(dtype=float).T):
+        valid = ~np.isnan(values)
+        valid_ward, valid_month, valid_values = obs_ward[valid], obs_month[valid], values[valid]
+        interpolated = np.interp(grid_x, obs_x[valid], valid_values) if valid.any() else np.full(len(grid_x), np.nan)
+
+        #Leave NaN before a ward's first valid value and carry its last valid value forward, as pandas interpolate does
+        first_valid = np.full(len(ward_codes), np.iinfo(np.int64).max)
+        last_valid = np.full(len(ward_codes), np.iinfo(np.int64).min)
+        last_value = np.full(len(ward_codes), np.nan)
+        valid_first = np.r_[True, valid_ward[1:] != valid_ward[:-1]][:len(valid_ward)]
+        valid_last = np.r_[valid_ward[1:] != valid_ward[:-1], True][:len(valid_ward)]
+        first_valid[valid_ward[valid_first]] = valid_month[valid_first]
+        last_valid[valid_ward[valid_last]] = valid_month[valid_last]
+        last_value[valid_ward[valid_last]] = valid_values[valid_last]
+
+        after_last = grid_month > last_valid[grid_ward]
+        interpolated[after_last] = last_value[grid_ward[after_last]]
+        interpolated[grid_month < first_valid[grid_ward]] = np.nan
+        monthly[col] = interpolated
+
+    return pd.DataFrame(monthly)
+
+
+def find_csv_table(path:str, encoding:str='utf-8') -> Tuple[int, int]:
     '''
-
-    row[columns_to_interpolate] = row[columns_to_interpolate].apply(pd.to_numeric)
-
-    if isinstance(columns_to_interpolate, str):
-        columns_to_interpolate = str(columns_to_interpolate)
-
-    for col in columns_to_interpolate:
-        row[col] = row[col].interpolate()
-
-    return row
-
-
-def interpolate_forward(df:pd.DataFrame, date_col_name:str, cols_to_interpolate:List[str]|str, end_date:pd.Timestamp):
+    Finds the table in a census CSV that has title lines above it and notes below it, with one scan of the field count
+    of every line. The table is the longest run of consecutive lines with the most common field count and at least two
+    filled fields, its first line being the header. Returns the number of records before the header and the number of
+    data rows, i.e. the skiprows and nrows to read it with. Both are counted in csv records rather than physical lines,
+    as a quoted cell can span several lines and pd.read_csv counts skiprows and nrows in records too.
     '''
-    
+    with open(path, newline='', encoding=encoding, errors='replace') as f:
+        widths = [len(row) if sum(bool(field.strip()) for field in row) >= 2 else 0 for row in csv.reader(f)]
+
+    counts = pd.Series(widths)[lambda x: x > 0].value_counts()
+    if counts.empty:
+        raise ValueError(f'No table found in {path}')
+    table_width = counts.idxmax()
+
+    best_start, best_length, start = 0, 0, None
+    for idx, width in enumerate(widths + [0]):
+        if width == table_width and start is None:
+            start = idx
+        elif width != table_width and start is not None:
+            if idx - start > best_length:
+                best_start, best_length = start, idx - start
+            start = None
+
+    return best_start, best_length - 1
+
+def read_census_csv(path:str, usecols:List[str]|Callable|None=None, dtype:Dict[str, str|type]|None=None, encoding:str='utf-8') -> pd.DataFrame:
     '''
-    largest_date_row = df.loc[df[date_col_name].idxmax()].to_dict()
-
-    columns_to_copy = [col for col in df.columns if col not in [cols_to_interpolate, date_col_name]]
-    new_row = {col:(largest_date_row[col] if col in columns_to_copy else np.nan) for col in df.columns}
-    new_row[date_col_name] = end_date
-
-    new_df = pd.DataFrame([largest_date_row, new_row])
-
-    new_df = expand_date_range(new_df, 'date', 'ward_code')
-    new_df = new_df.iloc[1:,:]
-
-    df = pd.concat([df, new_df], ignore_index=True)
-    df = interpolate_df(df, cols_to_interpolate)
-    
-
-    return df
-
+    Reads the table out of a census CSV with the C parser, finding the title and footer lines around it rather than
+    relying on hard-coded skiprows and skipfooter, which need the slow python parser
+    '''
+    skiprows, nrows = find_csv_table(path, encoding)
+    return pd.read_csv(path, skiprows=skiprows, nrows=nrows, usecols=usecols, dtype=dtype, encoding=encoding, engine='c')
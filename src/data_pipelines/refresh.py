@@ -0,0 +1,146 @@
+import argparse
+import importlib
+import resource
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Tuple
+
+
+class Stage():
+    '''
+    A node of the refresh DAG. The stage's function is called with the results of the stages it depends on as keyword
+    arguments, named after those stages. Functions are given as 'module:function' so worker processes can import them.
+    '''
+    def __init__(self, name:str, target:str, depends_on:List[str]|None=None) -> None:
+        self.name = name
+        self.target = target
+        self.depends_on = depends_on or []
+
+    def resolve(self) -> Callable:
+        module_name, func_name = self.target.split(':')
+        return getattr(importlib.import_module(module_name), func_name)
+
+
+#The config and the crosswalk are computed once and handed to every pipeline that needs them
+STAGES = [
+    Stage('config', 'src.data_pipelines.inputs:load_config'),
+    Stage('crosswalk', 'src.data_pipelines.inputs:load_ward_crosswalk', ['config']),
+    Stage('boundaries', 'src.data_pipelines.pipelines.shapefile_pipeline:main', ['config']),
+    Stage('ward_names', 'src.data_pipelines.pipelines.ward_code_name_pipeline:main', ['config']),
+    Stage('crime', 'src.data_pipelines.pipelines.crime_pipeline:main', ['config', 'crosswalk']),
+    Stage('education', 'src.data_pipelines.pipelines.education_pipeline:main', ['config', 'crosswalk']),
+    Stage('employment', 'src.data_pipelines.pipelines.employment_pipeline:main', ['config', 'crosswalk']),
+    Stage('population', 'src.data_pipelines.pipelines.population_density_pipeline:main'),
+]
+
+
+def run_stage(stage:Stage, inputs:dict) -> Tuple[object, float, float]:
+    '''
+    Runs one stage in a worker process, returning its result, wall time in seconds and the process's peak memory in MB.
+    Each worker runs a single stage, so the peak memory is that stage's own.
+    '''
+    start = time.perf_counter()
+    result = stage.resolve()(**inputs)
+    wall_time = time.perf_counter() - start
+
+    #ru_maxrss is in kilobytes on Linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_mb = max_rss / (1 << 20) if sys.platform == 'darwin' else max_rss / (1 << 10)
+    return result, wall_time, peak_mb
+
+
+def select_stages(stages:List[Stage], names:List[str]|None) -> List[Stage]:
+    '''
+    Returns the named stages along with every stage they depend on, in their original order
+    '''
+    by_name = {stage.name:stage for stage in stages}
+    if names is None:
+        return list(stages)
+
+    unknown = [name for name in names if name not in by_name]
+    if unknown:
+        raise ValueError(f'Unknown stages {unknown}, expected some of {list(by_name)}')
+
+    selected = set()
+    pending = list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(by_name[name].depends_on)
+    return [stage for stage in stages if stage.name in selected]
+
+
+def refresh(stages:List[Stage]=STAGES, max_workers:int|None=None) -> Dict[str, dict]:
+    '''
+    Runs the stages on a process pool, starting each as soon as everything it depends on has finished, so a full
+    refresh takes as long as its slowest branch. A failed stage skips the stages downstream of it but not the others.
+    Returns the status, wall time and peak memory of every stage.
+    '''
+    by_name = {stage.name:stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.depends_on if dep not in by_name]
+        if missing:
+            raise ValueError(f'Stage {stage.name} depends on {missing}, which are not being run')
+
+    results:Dict[str, object] = {}
+    report:Dict[str, dict] = {}
+    waiting = list(stages)
+    running:Dict[Future, Stage] = {}
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, max_tasks_per_child=1) as executor:
+        while waiting or running:
+            for stage in list(waiting):
+                failed = [dep for dep in stage.depends_on if report.get(dep, {}).get('status') in ('failed', 'skipped')]
+                if failed:
+                    waiting.remove(stage)
+                    report[stage.name] = {'status':'skipped', 'wall_time':0.0, 'peak_mb':0.0, 'error':f'{failed} did not finish'}
+                elif all(dep in results for dep in stage.depends_on):
+                    waiting.remove(stage)
+                    inputs = {dep:results[dep] for dep in stage.depends_on}
+                    running[executor.submit(run_stage, stage, inputs)] = stage
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    result, wall_time, peak_mb = future.result()
+                except Exception as e:
+                    report[stage.name] = {'status':'failed', 'wall_time':0.0, 'peak_mb':0.0, 'error':repr(e)}
+                    print(f'Error: Stage {stage.name} failed due to: {e!r}')
+                else:
+                    results[stage.name] = result
+                    report[stage.name] = {'status':'done', 'wall_time':wall_time, 'peak_mb':peak_mb, 'error':None}
+                    print(f"✅Finished {stage.name} in {wall_time:.1f}s (peak {peak_mb:.0f} MB)")
+
+    print_report(report, time.perf_counter() - start)
+    return report
+
+
+def print_report(report:Dict[str, dict], wall_time:float) -> None:
+    print(f"\n{'stage':<12}{'status':<9}{'wall s':>9}{'peak MB':>10}")
+    for name, stage_report in report.items():
+        print(f"{name:<12}{stage_report['status']:<9}{stage_report['wall_time']:>9.1f}{stage_report['peak_mb']:>10.0f}")
+
+    stage_time = sum(stage_report['wall_time'] for stage_report in report.values())
+    print(f"Refresh took {wall_time:.1f}s against {stage_time:.1f}s of stage time run one after another")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refreshes every pipeline, running independent pipelines in parallel')
+    parser.add_argument('stages', nargs='*', help='Stages to run, along with their dependencies. Runs every stage if none are given.')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes, defaults to the number of CPUs')
+    args = parser.parse_args()
+
+    report = refresh(select_stages(STAGES, args.stages or None), max_workers=args.workers)
+    if any(stage_report['status'] != 'done' for stage_report in report.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,19 @@
-import requests
-from typing import List, Tuple
+from pathlib import Path
+from typing import Dict, List, Tuple
 
-import pandas as pd
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 
-from . import utils
+from .downloader import CachedDownloader, DownloadResult
+from .staging import read_excel_staged
 
 
-def get_crime_data_url(base_url:str, page_url:str) -> list:
+def get_crime_data_url(base_url:str, page_url:str, downloader:CachedDownloader|None=None) -> list:
     '''
     A function that scrapes a URL for crime data URLs
     '''
-
-    response = requests.get(urljoin(base_url, page_url))
+    downloader = downloader or CachedDownloader()
+    response = downloader.get(urljoin(base_url, page_url))
 
     soup = BeautifulSoup(response.content, 'html.parser')
     crime_urls = [(url.get('title'), base_url + url.get('href')) for url in soup.find_all('a') if url.get('title') and 'Detected' in url.get('title')]
@@ -21,13 +21,33 @@ def get_crime_data_url(base_url:str, page_url:str) -> list:
     return crime_urls
 
 
-def crime_data_scrapper(crime_urls:List[Tuple[str, str]]) -> dict:
-    crime_data = dict()
+def fetch_crime_workbooks(crime_urls:List[Tuple[str, str]], downloader:CachedDownloader|None=None) -> Dict[str, DownloadResult]:
+    '''
+    Downloads every crime workbook concurrently, keyed by its title. Workbooks that have not changed since the last run
+    are revalidated rather than downloaded again, and each result carries the checksum of its contents.
+    '''
+    downloader = downloader or CachedDownloader()
+    results = downloader.fetch_all(url for _, url in crime_urls)
+    return {title:results[url] for title, url in crime_urls}
 
-    for title, url in crime_urls:
-        df = utils.download_excel(url, sheet_name='Sheet1')
-        crime_data[title] = df
 
-    return crime_data
+def read_crime_workbooks(workbooks:Dict[str, DownloadResult], cache_dir:str|Path, columns:List[str]|None=None,
+                         categorical_columns:List[str]|None=None) -> dict:
+    '''
+    Stages the first sheet of each downloaded workbook to Parquet, keeping only the columns given, and reads it back
+    '''
+    return {
+        title:read_excel_staged(result, cache_dir, columns=columns, categorical_columns=categorical_columns)
+        for title, result in workbooks.items()
+    }
 
 
+def crime_data_scrapper(crime_urls:List[Tuple[str, str]], downloader:CachedDownloader|None=None, columns:List[str]|None=None,
+                        categorical_columns:List[str]|None=None) -> dict:
+    '''
+    Downloads every crime workbook concurrently and stages its first sheet to Parquet, keeping only the columns given.
+    Workbooks that have not changed since the last run are neither downloaded nor parsed again.
+    '''
+    downloader = downloader or CachedDownloader()
+    workbooks = fetch_crime_workbooks(crime_urls, downloader)
+    return read_crime_workbooks(workbooks, downloader.cache_dir, columns, categorical_columns)
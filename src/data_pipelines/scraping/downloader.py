@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[3] / 'data' / 'cache' / 'downloads'
+
+
+class DownloadResult():
+    '''
+    A downloaded file, either fresh from the server or revalidated from the on-disk cache
+    '''
+    def __init__(self, url:str, path:Path, checksum:str, from_cache:bool) -> None:
+        self.url = url
+        self.path = path
+        self.checksum = checksum
+        self.from_cache = from_cache
+
+    @property
+    def content(self) -> bytes:
+        return self.path.read_bytes()
+
+
+class CachedDownloader():
+    '''
+    Downloads files concurrently over one pooled, retrying session, caching every response on disk.
+
+    Each cached file is stored under a hash of its URL, along with the ETag and Last-Modified headers it was served
+    with. Later fetches send those back as a conditional GET, so a file that has not changed costs a 304 and is read
+    from disk instead of being downloaded again.
+    '''
+    def __init__(self, cache_dir:str|Path|None=None, max_workers:int=8, timeout:float=30, retries:int=3, backoff_factor:float=0.5) -> None:
+        self.cache_dir = Path(cache_dir or os.getenv('SCRAPER_CACHE_DIR', DEFAULT_CACHE_DIR))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=['GET', 'HEAD'])
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url:str, **kwargs) -> requests.Response:
+        '''
+        A plain GET over the shared session, with the downloader's timeout, e.g. for the pages that list the files
+        '''
+        response = self.session.get(url, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def fetch(self, url:str) -> DownloadResult:
+        '''
+        Fetches a single URL, revalidating any cached copy with the server
+        '''
+        body_path, meta_path = self._cache_paths(url)
+        meta = json.loads(meta_path.read_text()) if meta_path.exists() and body_path.exists() else {}
+
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and meta:
+            return DownloadResult(url, body_path, meta['checksum'], from_cache=True)
+        response.raise_for_status()
+
+        checksum = hashlib.sha256(response.content).hexdigest()
+        self._write_atomic(body_path, response.content)
+        self._write_atomic(meta_path, json.dumps({
+            'url':url,
+            'etag':response.headers.get('ETag'),
+            'last_modified':response.headers.get('Last-Modified'),
+            'checksum':checksum
+        }).encode('utf-8'))
+
+        return DownloadResult(url, body_path, checksum, from_cache=False)
+
+    def fetch_all(self, urls:Iterable[str]) -> Dict[str, DownloadResult]:
+        '''
+        Fetches every URL concurrently, returning the results keyed by URL in the order given
+        '''
+        urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = dict(zip(urls, executor.map(self.fetch, urls)))
+
+        n_cached = sum(result.from_cache for result in results.values())
+        print(f"✅Fetched {len(results)} files ({len(results) - n_cached} downloaded, {n_cached} unchanged)")
+        return results
+
+    def _cache_paths(self, url:str):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.cache_dir / f'{key}.body', self.cache_dir / f'{key}.json'
+
+    @staticmethod
+    def _write_atomic(path:Path, content:bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+from .downloader import DownloadResult
+
+
+#Bump when the staged layout changes, so Parquet files staged by older code are converted again
+STAGING_VERSION = 1
+#Rows scanned for the header when a sheet has title rows above its column names
+HEADER_SCAN_ROWS = 50
+
+
+def stage_excel_sheet(result:DownloadResult, cache_dir:str|Path, sheet_name:str|int=0, columns:List[str]|None=None,
+                      categorical_columns:List[str]|None=None, header_pattern:str|None=None) -> Path:
+    '''
+    Converts one sheet of a downloaded workbook to Parquet, once per workbook checksum and staging options.
+
+    Only the columns needed are kept and text columns with few distinct values, e.g. council and ward names, are stored
+    as categoricals. When a header pattern is given the column names are taken from the first row matching it, for
+    sheets with title rows above the table.
+    '''
+    options = {'version':STAGING_VERSION, 'sheet_name':sheet_name, 'columns':columns, 'categorical_columns':categorical_columns, 'header_pattern':header_pattern}
+    options_key = hashlib.sha256(json.dumps(options).encode('utf-8')).hexdigest()[:16]
+    staged_path = Path(cache_dir) / 'staged' / f'{result.checksum[:16]}-{options_key}.parquet'
+    if staged_path.exists():
+        return staged_path
+
+    with pd.ExcelFile(result.path) as workbook:
+        if isinstance(sheet_name, str) and sheet_name not in workbook.sheet_names:
+            raise KeyError(f'Sheet {sheet_name} not present in {result.url}, only {workbook.sheet_names}')
+
+        header = 0 if header_pattern is None else find_header_row(workbook, sheet_name, header_pattern)
+        usecols = None if columns is None else (lambda col: col in columns)
+        data = workbook.parse(sheet_name=sheet_name, header=header, usecols=usecols)
+
+    for col in categorical_columns or []:
+        if col in data.columns:
+            data[col] = data[col].astype('category')
+
+    #Columns of mixed types, e.g. numbers with footnote markers, are kept as text so they can be written to Parquet
+    for col in data.select_dtypes(include='object').columns:
+        if data[col].map(type).nunique() > 1:
+            data[col] = data[col].where(data[col].isna(), data[col].astype(str))
+
+    staged_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=staged_path.parent, prefix=f'.{staged_path.name}-')
+    os.close(fd)
+    try:
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, staged_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    print(f"✅Staged {result.url} sheet {sheet_name} ({len(data)} rows, {len(data.columns)} columns)")
+    return staged_path
+
+def find_header_row(workbook:pd.ExcelFile, sheet_name:str|int, header_pattern:str) -> int:
+    '''
+    Returns the index of the first row of a sheet with a cell matching the header pattern
+    '''
+    top_rows = workbook.parse(sheet_name=sheet_name, header=None, nrows=HEADER_SCAN_ROWS, dtype=str)
+    matches = top_rows.apply(lambda col: col.str.contains(header_pattern, regex=True, na=False)).any(axis=1)
+    if not matches.any():
+        raise ValueError(f'No row matching {header_pattern!r} in the first {HEADER_SCAN_ROWS} rows of sheet {sheet_name}')
+    return int(matches.to_numpy().argmax())
+
+def read_staged(path:str|Path, columns:List[str]|None=None) -> pd.DataFrame:
+    '''
+    Reads a staged sheet memory-mapped, only reading the columns asked for
+    '''
+    return pd.read_parquet(path, columns=columns, memory_map=True)
+
+def read_excel_staged(result:DownloadResult, cache_dir:str|Path, sheet_name:str|int=0, columns:List[str]|None=None,
+                      categorical_columns:List[str]|None=None, header_pattern:str|None=None) -> pd.DataFrame:
+    '''
+    Stages a sheet of a downloaded workbook if it has not been already and reads it back
+    '''
+    staged_path = stage_excel_sheet(result, cache_dir, sheet_name, columns, categorical_columns, header_pattern)
+    return read_staged(staged_path)
@@ -34,4 +34,3 @@ def download_excel(href:str, sheet_name:str|None = None, skip_rows:int = 0):
         return data
     else:
         return None
-    
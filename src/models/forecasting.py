@@ -0,0 +1,224 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+
+#Features the model was trained on, in training order
+FEATURE_COLUMNS = ['pop_with_qual', 'pop_without_qual', 'unemployed_adults', 'long_term_sick_or_disabled', 'caring_for_family', 'crime_last_month', 'crime_last_two_months', 'crime_last_three_months', 'crime_3month_avg', 'pop_density_log']
+#Covariates that are extrapolated forward with a linear trend
+COVARIATE_COLUMNS = ['pop_with_qual', 'pop_without_qual', 'unemployed_adults', 'long_term_sick_or_disabled', 'caring_for_family', 'population_density']
+#Number of months of crime history needed to build the lag features
+MIN_HISTORY = 3
+#Longest forecast horizon in months
+MAX_HORIZON = 12
+
+
+def fit_linear_trends(x:np.ndarray, y:np.ndarray, group_idx:np.ndarray, n_groups:int):
+    '''
+    Fits an ordinary least squares line y = intercept + slope * x for every group and every column of y at once.
+
+    Input:
+        -x (n_rows,): The regressor, i.e. the position of each row within its group
+        -y (n_rows, n_cols): The values to fit
+        -group_idx (n_rows,): The group each row belongs to
+
+    Output:
+        -slopes and intercepts, each of shape (n_groups, n_cols). Groups with a single row get a flat line.
+    '''
+    n = np.bincount(group_idx, minlength=n_groups).astype(float)
+    sum_x = np.bincount(group_idx, weights=x, minlength=n_groups)
+    sum_xx = np.bincount(group_idx, weights=x * x, minlength=n_groups)
+
+    sum_y = np.column_stack([np.bincount(group_idx, weights=y[:, i], minlength=n_groups) for i in range(y.shape[1])])
+    sum_xy = np.column_stack([np.bincount(group_idx, weights=x * y[:, i], minlength=n_groups) for i in range(y.shape[1])])
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s_xx = sum_xx - sum_x**2 / n
+        s_xy = sum_xy - sum_x[:, None] * sum_y / n[:, None]
+        slopes = np.where(s_xx[:, None] > 0, s_xy / s_xx[:, None], 0.0)
+        intercepts = (sum_y - slopes * sum_x[:, None]) / n[:, None]
+
+    return slopes, intercepts
+
+
+class ForecastState():
+    '''
+    The intermediate state of a recursive forecast for a single ward. It holds the fitted covariate trends, the last
+    three observed or predicted crime counts, and every prediction made so far, so a longer horizon can carry on from
+    where a shorter one stopped.
+    '''
+    def __init__(self, ward_code:str, last_date:pd.Timestamp, n_history:int, slopes:np.ndarray, intercepts:np.ndarray, recent_counts:np.ndarray) -> None:
+        self.ward_code = ward_code
+        self.last_date = last_date
+        self.n_history = n_history
+        self.slopes = slopes
+        self.intercepts = intercepts
+        self.recent_counts = recent_counts
+        self.predictions:List[float] = []
+
+    @property
+    def steps(self) -> int:
+        return len(self.predictions)
+
+    def trajectory(self, months:int) -> List[dict]:
+        '''
+        Returns the first months steps of the forecast as a list of dates and predictions
+        '''
+        return [
+            {'date':(self.last_date + pd.DateOffset(months=step)).date(), 'crime_prediction':prediction}
+            for step, prediction in enumerate(self.predictions[:months], start=1)
+        ]
+
+
+def build_forecast_states(history:pd.DataFrame) -> List[ForecastState]:
+    '''
+    Builds the starting forecast state for every ward in a history dataframe at once.
+
+    The covariate trends are fitted with a closed form least squares per ward. Wards with fewer than three months of
+    history are skipped as the lag features cannot be built for them.
+    '''
+    history = history.sort_values(['ward_code', 'date'], kind='stable').reset_index(drop=True)
+
+    ward_codes, ward_idx = np.unique(history['ward_code'].to_numpy(), return_inverse=True)
+    n_rows = np.bincount(ward_idx)
+    ends = np.cumsum(n_rows)
+    x = np.arange(len(history)) - (ends - n_rows)[ward_idx]
+
+    covariates = history[COVARIATE_COLUMNS].to_numpy(dtype=float)
+    slopes, intercepts = fit_linear_trends(x.astype(float), covariates, ward_idx, len(ward_codes))
+
+    counts = history['count'].to_numpy(dtype=float)
+    dates = pd.to_datetime(history['date']).to_numpy()
+
+    states = []
+    for i in np.flatnonzero(n_rows >= MIN_HISTORY):
+        states.append(ForecastState(
+            ward_code=ward_codes[i],
+            last_date=pd.Timestamp(dates[ends[i] - 1]),
+            n_history=int(n_rows[i]),
+            slopes=slopes[i],
+            intercepts=intercepts[i],
+            recent_counts=counts[ends[i] - MIN_HISTORY:ends[i]].copy()
+        ))
+
+    return states
+
+
+class CrimeForecaster():
+    '''
+    Recursive multi-step crime forecaster. Each step feeds its own predictions back in as the lag features for the next
+    step, while the covariates for every step are extrapolated up front from the per ward trends.
+
+    Forecast states are cached per ward, so asking for a longer horizon after a shorter one only runs the extra steps.
+    If data_version is given it is called on every forecast, and the cached states are dropped whenever the version it
+    returns changes, so forecasts are never served from data that has since been reloaded.
+    '''
+    def __init__(self, score:Callable[[pd.DataFrame], np.ndarray], load_history:Callable[[List[str]|None], pd.DataFrame], max_cached_wards:int=1024,
+                 data_version:Callable[[], object]|None=None) -> None:
+        self.score = score
+        self.load_history = load_history
+        self.max_cached_wards = max_cached_wards
+        self.data_version = data_version
+
+        self._states:OrderedDict[str, ForecastState] = OrderedDict()
+        self._all_wards_cached = False
+        self._version:object = None
+        self._lock = threading.Lock()
+
+    def forecast(self, ward_codes:List[str]|None, months:int) -> List[ForecastState]:
+        '''
+        Runs the forecast out to months steps for the given wards, or every ward if no ward codes are given
+        '''
+        if not 1 <= months <= MAX_HORIZON:
+            raise ValueError(f'months must be between 1 and {MAX_HORIZON}, got {months}')
+
+        with self._lock:
+            if self.data_version is not None:
+                version = self.data_version()
+                if version != self._version:
+                    self._states.clear()
+                    self._all_wards_cached = False
+                    self._version = version
+            states = self._get_states(ward_codes)
+            self._advance(states, months)
+            return states
+
+    def clear_cache(self) -> None:
+        '''
+        Drops every cached forecast state, e.g. after the underlying data has been updated
+        '''
+        with self._lock:
+            self._states.clear()
+            self._all_wards_cached = False
+
+    def _get_states(self, ward_codes:List[str]|None) -> List[ForecastState]:
+        '''
+        Returns the cached states for the requested wards, building the missing ones from a single history query
+        '''
+        if ward_codes is None:
+            if not self._all_wards_cached:
+                self._store_states(build_forecast_states(self.load_history(None)))
+                self._all_wards_cached = len(self._states) <= self.max_cached_wards
+            return list(self._states.values())
+
+        missing = [ward_code for ward_code in dict.fromkeys(ward_codes) if ward_code not in self._states]
+        if missing:
+            self._store_states(build_forecast_states(self.load_history(missing)))
+
+        states = []
+        for ward_code in dict.fromkeys(ward_codes):
+            if ward_code in self._states:
+                self._states.move_to_end(ward_code)
+                states.append(self._states[ward_code])
+        return states
+
+    def _store_states(self, states:List[ForecastState]) -> None:
+        for state in states:
+            self._states[state.ward_code] = state
+            self._states.move_to_end(state.ward_code)
+
+        while len(self._states) > self.max_cached_wards:
+            self._states.popitem(last=False)
+            self._all_wards_cached = False
+
+    def _advance(self, states:List[ForecastState], months:int) -> None:
+        '''
+        Advances every state that has fewer than months predictions, scoring all active wards in one model call per step
+        '''
+        states = [state for state in states if state.steps < months]
+        if not states:
+            return
+
+        n_history = np.array([state.n_history for state in states])
+        slopes = np.stack([state.slopes for state in states])
+        intercepts = np.stack([state.intercepts for state in states])
+        recent_counts = np.stack([state.recent_counts for state in states])
+        steps = np.array([state.steps for state in states])
+
+        #Covariates for every ward and every horizon step, shape (n_wards, months, n_covariates)
+        x = (n_history - 1)[:, None] + np.arange(1, months + 1)[None, :]
+        covariate_path = intercepts[:, None, :] + slopes[:, None, :] * x[..., None]
+
+        for step in range(steps.min(), months):
+            active = np.flatnonzero(steps == step)
+            lags = recent_counts[active]
+
+            features = pd.DataFrame(covariate_path[active, step, :], columns=COVARIATE_COLUMNS)
+            features['crime_last_month'] = lags[:, -1]
+            features['crime_last_two_months'] = lags[:, -2]
+            features['crime_last_three_months'] = lags[:, -3]
+            features['crime_3month_avg'] = lags.mean(axis=1)
+            features['pop_density_log'] = np.log1p(features['population_density'])
+
+            predictions = np.asarray(self.score(features[FEATURE_COLUMNS]), dtype=float)
+
+            recent_counts[active] = np.column_stack([lags[:, 1:], predictions])
+            steps[active] += 1
+            for idx, prediction in zip(active, predictions):
+                states[idx].predictions.append(float(prediction))
+
+        for state, counts in zip(states, recent_counts):
+            state.recent_counts = counts
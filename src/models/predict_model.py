@@ -3,11 +3,8 @@ import pandas as pd
 import numpy as np
 from typing import List
 
-from sklearn.linear_model import LinearRegression
-from dateutil.relativedelta import relativedelta
-
 from src.DB.DatabaseClient import DatabaseReader
-
+from src.models.forecasting import CrimeForecaster, COVARIATE_COLUMNS, FEATURE_COLUMNS
 
 
 class CrimePredictor():
@@ -19,101 +16,67 @@ class CrimePredictor():
         model = joblib.load(self.path)
         return model
 
-    def generate_prediction_row(self, data:pd.DataFrame) -> pd.DataFrame:
-        '''
-        
+    def predict(self, features:pd.DataFrame) -> np.ndarray:
         '''
-        numeric_cols = data.select_dtypes(include='number').columns
-        new_row ={
-            col:None if col in numeric_cols else data.loc[len(data)-1, col] for col in data.columns
-        }
-        new_row['date'] = new_row["date"] + relativedelta(months=1) #type:ignore
-
-
-        for idx, col in enumerate(numeric_cols):
-            if col == 'count':
-                continue
-            X = np.arange(len(data.loc[:,col])).reshape(-1,1)
-            y = data.loc[:,col]
-            model = LinearRegression().fit(X,y)
-
-            next_val = model.predict(np.array([[len(data)]]))[0]
-            new_row[col] = next_val
-
-        output_df = pd.concat([data, pd.DataFrame([new_row])], ignore_index=True)
-        return output_df
-
-    def data_preprocessing(self, data:pd.DataFrame) -> pd.DataFrame:
-        '''
-        
-        '''
-        #Calculate lag values
-        data['crime_last_month'] = data['count'].shift(1)
-        data['crime_last_two_months'] = data['count'].shift(2)
-        data['crime_last_three_months'] = data['count'].shift(3)
-        #Apply a log function to population density
-        data['pop_density_log'] = np.log1p(data['population_density'])
-        data.drop(labels='population_density', axis=1, inplace=True)
-        #Calculate the 3 month rolling average of crime
-        data["crime_3month_avg"] = data["count"].shift(1).rolling(window=3).mean()
-
-        data = data[~pd.isna(data["crime_last_three_months"])]    
-        prediction_row = data.iloc[[-1], 1:]
-
-        return prediction_row
-    
-
-    def predict(self, df:pd.DataFrame) -> dict:
-        '''
-        Function that predicts upcoming crime rates.
+        Function that predicts crime rates.
 
         Input:
-            -prediction_row (dict): 
+            -features (pd.DataFrame): One row of model features per ward
 
         Output:
-            -A number representing the the predicted crime next month in based on the data
+            -An array with the predicted crime for every row, scored in a single model call
         '''
+        if features.empty:
+            return np.empty(0)
 
-        df.drop(columns=['ward_code', 'date'], axis=1, inplace=True)
-        df = df[['pop_with_qual', 'pop_without_qual', 'unemployed_adults', 'long_term_sick_or_disabled', 'caring_for_family', 'crime_last_month', 'crime_last_two_months', 'crime_last_three_months', 'crime_3month_avg', 'pop_density_log']]
-        output = self.model.predict(df)
+        return self.model.predict(features[FEATURE_COLUMNS])
 
-        return {'crime_prediction':float(output)}
-    
 
 class CrimeService():
     def __init__(self, predictor:CrimePredictor, DBClient:DatabaseReader):
         self.predictor = predictor
         self.DB = DBClient
+        #Cached forecasts are checked against the version of the ward store, if the client has one
+        self.forecaster = CrimeForecaster(
+            score=self.predictor.predict,
+            load_history=self.get_ward_history,
+            data_version=getattr(self.DB, 'data_version', None)
+        )
 
-    def get_ward_history(self, ward_code:str) -> pd.DataFrame:
+    def get_ward_history(self, ward_codes:List[str]|None=None) -> pd.DataFrame:
         '''
-        
+        Loads the joined history for the given wards, or every ward if no ward codes are given
         '''
-        ward_crime_data = pd.DataFrame(self.DB.get_crime_data(ward_code=ward_code))
-        ward_education_data = pd.DataFrame(self.DB.get_education_data(ward_code=ward_code))
-        ward_employment_data = pd.DataFrame(self.DB.get_employment_data(ward_code=ward_code))
-        ward_population_data = pd.DataFrame(self.DB.get_population_data(ward_code=ward_code))
-
-
-        ward_history = (
-            ward_crime_data
-            .merge(ward_education_data, on=['ward_code', 'date'], how="inner")
-            .merge(ward_employment_data, on=['ward_code', 'date'], how="inner")
-            .merge(ward_population_data, on=['ward_code', 'date'], how="inner")
-        )
+        ward_history = pd.DataFrame(self.DB.get_ward_history(ward_codes))
+        if ward_history.empty:
+            return pd.DataFrame(columns=['ward_code', 'date', 'count', *COVARIATE_COLUMNS])
 
+        ward_history['date'] = pd.to_datetime(ward_history['date'])
         return ward_history
-    
-    def predict(self, ward_code:str, months:int) -> dict:
+
+    def predict_batch(self, ward_codes:List[str]|None=None, months:int=1) -> List[dict]:
         '''
-        
+        Forecasts crime months ahead for a list of wards, or every ward if no ward codes are given
         '''
-        historic_data = self.get_ward_history(ward_code)
-        prediction_row = self.predictor.generate_prediction_row(historic_data)
-        prediction_row_processed = self.predictor.data_preprocessing(prediction_row)
-        predicted_crime = self.predictor.predict(prediction_row_processed)
-
-        return predicted_crime
+        states = self.forecaster.forecast(ward_codes, months)
+
+        predictions = []
+        for state in states:
+            trajectory = state.trajectory(months)
+            predictions.append({
+                'ward_code':state.ward_code,
+                'date':trajectory[-1]['date'],
+                'crime_prediction':trajectory[-1]['crime_prediction'],
+                'predictions':trajectory
+            })
+        return predictions
+
+    def predict(self, ward_code:str, months:int=1) -> dict:
+        '''
+        Forecasts crime months ahead for a single ward, returning the prediction for the final month and the whole trajectory
+        '''
+        predictions = self.predict_batch([ward_code], months=months)
+        if not predictions:
+            raise KeyError(f'Not enough history to predict crime for ward {ward_code}')
 
-        
\ No newline at end of file
+        return predictions[0]
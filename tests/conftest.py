@@ -0,0 +1,110 @@
+import json
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import box
+from sqlalchemy import create_engine
+
+from src.data_pipelines.pipelines.crime_pipeline import CrimePipeline
+from src.data_pipelines.preprocessing.utils import normalise_text
+from src.DB.DatabaseClient import DatabaseReader
+
+
+WARD_CODES = ['S13000001', 'S13000002', 'S13000003']
+MONTHS = pd.date_range('2023-01-01', periods=6, freq='MS')
+COLUMN_RENAME = {'PSOS_MMW_Name':'ward_name_2022', 'COUNCIL NAME':'council_name', 'CALENDAR YEAR':'year', 'CALENDAR MONTH':'month', 'DETECTED CRIME':'count'}
+
+
+class SqliteDatabaseReader(DatabaseReader):
+    '''
+    A DatabaseReader on a SQLite file, for testing the getters' SQL without a Postgres server. Postgres' array
+    predicate col = ANY(:param) is rewritten to the SQLite equivalent, with the list sent as JSON.
+    '''
+    def fetch(self, sql:str, params:dict|None=None):
+        params = dict(params or {})
+        for name, value in params.items():
+            if isinstance(value, list):
+                sql = sql.replace(f'= ANY(:{name})', f'IN (SELECT value FROM json_each(:{name}))')
+                params[name] = json.dumps(value)
+        return super().fetch(sql, params)
+
+
+def wards(ward_codes:list) -> gpd.GeoDataFrame:
+    '''
+    Square ward boundaries in a row, in the order given
+    '''
+    return gpd.GeoDataFrame({'ward_code':ward_codes}, geometry=[box(i, 0, i + 1, 1) for i in range(len(ward_codes))], crs=4326)
+
+
+class LastMonthPredictor():
+    '''
+    Stands in for the trained model, predicting one more crime than last month
+    '''
+    def predict(self, features:pd.DataFrame):
+        return features['crime_last_month'].to_numpy() + 1
+
+
+@pytest.fixture
+def ward_tables() -> dict:
+    '''
+    Small ward tables in the database schema. The third ward has no education data for the last month, so it drops
+    out of the joined history there.
+    '''
+    rng = np.random.default_rng(0)
+    index = pd.MultiIndex.from_product([WARD_CODES, MONTHS], names=['ward_code', 'date']).to_frame(index=False)
+    n = len(index)
+    education = index.assign(pop_with_qual=rng.random(n), pop_without_qual=rng.random(n))
+    return {
+        'ward_crime':index.assign(count=rng.integers(0, 100, n)),
+        'ward_education_data':education[~((education['ward_code'] == WARD_CODES[2]) & (education['date'] == MONTHS[-1]))],
+        'ward_employemnt_data':index.assign(unemployed_adults=rng.random(n), long_term_sick_or_disabled=rng.random(n), caring_for_family=rng.random(n)),
+        'ward_population_density':index.assign(population_density=rng.random(n) * 1000),
+        'ward_code_name':pd.DataFrame({'ward_code':WARD_CODES, 'ward_name':['Leith', 'Dyce', 'Lerwick North']})
+    }
+
+
+@pytest.fixture
+def sqlite_reader(ward_tables, tmp_path) -> SqliteDatabaseReader:
+    db_url = f'sqlite:///{tmp_path / "wards.db"}'
+    engine = create_engine(db_url)
+    #Dates are stored as ISO dates so the date = :date predicate compares them like Postgres would
+    for table_name, df in ward_tables.items():
+        if 'date' in df:
+            df = df.assign(date=df['date'].dt.strftime('%Y-%m-%d'))
+        df.to_sql(table_name, engine, index=False)
+    engine.dispose()
+    return SqliteDatabaseReader(db_url)
+
+
+@pytest.fixture
+def crime_sheet() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    n = 2000
+    names = np.array(['Dyce Ward', 'Leith', 'Other / Unknown', 'Lerwick North', 'Ft William and Ardnamurchan'])
+    return pd.DataFrame({
+        'PSOS_MMW_Name':names[rng.integers(0, len(names), n)],
+        'COUNCIL NAME':np.array(['Aberdeen City', 'North Ayrshire', 'Highland'])[rng.integers(0, 3, n)],
+        'CALENDAR YEAR':2020,
+        'CALENDAR MONTH':rng.integers(1, 13, n),
+        'DETECTED CRIME':rng.integers(0, 50, n),
+        'UNUSED':rng.random(n)
+    })
+
+
+def run_crime_chain(data:pd.DataFrame, lazy:bool, backend:str='pandas') -> pd.DataFrame:
+    ward_lookup = pd.DataFrame({'ward_name_2022':['dyce', 'leith', 'lerwicknorthbressay'], 'ward_code_2022':['S1', 'S2', 'S3']})
+    return (
+        CrimePipeline(data.copy(), lazy=lazy, backend=backend).rename_cols(COLUMN_RENAME)
+        .subset_columns(list(COLUMN_RENAME.values()))
+        .filter_df('council_name', ['North Ayrshire'])
+        .apply_manual_edits(col='ward_name_2022', mannual_edits={'Lerwick North':'lerwicknorthbressay'})
+        .normalise_column(normalise_func=normalise_text, col_to_normalise='ward_name_2022')
+        .groupby(grouping_columns=['ward_name_2022', 'council_name', 'year', 'month'], summing_column='count')
+        .left_join(data_to_merge=ward_lookup, merging_column='ward_name_2022')
+        .rename_cols({'ward_code_2022':'ward_code'})
+        .drop_columns(['ward_name_2022', 'council_name'])
+        .combine_date_cols('year', 'month')
+        .extract_df()
+    )
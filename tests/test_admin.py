@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.main import app
+from src.DB.WardStore import STORE_TABLES, WardStore
+
+
+class SlowAsyncReader():
+    '''
+    Serves the sync reader's rows through coroutines that yield to the event loop, recording how many are in flight
+    '''
+    def __init__(self, reader) -> None:
+        self.reader = reader
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __getattr__(self, getter:str):
+        async def get():
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            await asyncio.sleep(0.01)
+            self.in_flight -= 1
+            return getattr(self.reader, getter)()
+        return get
+
+
+@pytest.fixture
+def client(sqlite_reader, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    app.state.database_client = sqlite_reader
+    app.state.async_database_client = SlowAsyncReader(sqlite_reader)
+    app.state.ward_store = WardStore().load(sqlite_reader)
+    return TestClient(app)
+
+
+def test_reload_without_a_token_is_rejected(client):
+    assert client.post('/admin/store/reload').status_code == 401
+    assert client.post('/admin/store/reload', headers={'X-Admin-Token':'wrong'}).status_code == 403
+    assert app.state.ward_store.data_version() == 1
+
+def test_reload_is_rejected_when_no_token_is_configured(client, monkeypatch):
+    monkeypatch.delenv('ADMIN_TOKEN')
+
+    assert client.post('/admin/store/reload', headers={'X-Admin-Token':''}).status_code == 401
+    assert client.post('/admin/store/reload', headers={'X-Admin-Token':'secret'}).status_code == 403
+
+def test_reload_with_the_token_swaps_in_a_new_snapshot(client):
+    response = client.post('/admin/store/reload', headers={'X-Admin-Token':'secret'})
+
+    assert response.status_code == 200
+    assert response.json()['version'] == 2
+    assert client.get('/admin/store').json()['table_versions'] == {}
+
+def test_overlapping_reloads_run_one_at_a_time(sqlite_reader):
+    store = WardStore()
+    reader = SlowAsyncReader(sqlite_reader)
+
+    async def reload_twice():
+        await asyncio.gather(store.load_async(reader), store.load_async(reader))
+
+    asyncio.run(reload_twice())
+
+    #One load runs every table's getter and the ward names at once, two overlapping loads would double that
+    assert reader.max_in_flight == len(STORE_TABLES) + 1
+    assert store.data_version() == 2
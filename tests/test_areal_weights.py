@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from shapely.geometry import box
+
+from src.data_pipelines.preprocessing.base_pipeline import BasePipeline
+from src.data_pipelines.preprocessing.spacial_processing import ArealWeights, calculate_areal_weights, prepare_wards
+
+
+def grid(n:int, size:float, offset:float, code_col:str) -> gpd.GeoDataFrame:
+    polygons = [box(offset + i * size, offset + j * size, offset + (i + 1) * size, offset + (j + 1) * size) for i in range(n) for j in range(n)]
+    return gpd.GeoDataFrame({code_col:[f'{code_col}_{k}' for k in range(n * n)]}, geometry=polygons, crs=27700)
+
+
+def test_weights_match_overlay():
+    source, target = grid(8, 100, 0, 'ward_code_2007'), grid(6, 130, 15, 'ward_code_2022')
+
+    #The weights checked against a plain polygon overlay of the two ward sets
+    overlay = gpd.overlay(prepare_wards(source.copy(), '2007', 27700), prepare_wards(target.copy(), '2022', 27700), how='intersection', keep_geom_type=True)
+    overlay['overlap_pct'] = overlay.geometry.area / overlay['area_2007']
+    weights = calculate_areal_weights(source, target, 'ward_code_2007', 'ward_code_2022').to_frame('ward_code_2007', 'ward_code_2022')
+
+    merged = overlay.merge(weights, on=['ward_code_2007', 'ward_code_2022'], how='outer', validate='one_to_one')
+    assert len(merged) == len(overlay) == len(weights)
+    assert np.allclose(merged['overlap_pct_x'], merged['overlap_pct_y'])
+
+def test_apply_matches_merge_multiply_groupby():
+    crosswalk = pd.DataFrame({
+        'ward_code_2007':['a', 'a', 'b', 'c'],
+        'ward_code_2022':['x', 'y', 'y', 'z'],
+        'overlap_pct':[0.25, 0.75, 1.0, 1.0]
+    })
+    values = pd.DataFrame({'ward_code_2007':['a', 'b', 'c', 'unmapped'], 'value':[4.0, 2.0, np.nan, 9.0]})
+
+    expected = values.merge(crosswalk, on='ward_code_2007', how='left')
+    expected['value'] = expected['value'] * expected['overlap_pct']
+    expected = expected.groupby('ward_code_2022')[['value']].sum().reset_index()
+
+    weights = ArealWeights.from_frame(crosswalk, 'ward_code_2007', 'ward_code_2022')
+    result = BasePipeline(values).apply_areal_weights(weights, 'ward_code_2007', 'ward_code_2022', ['value']).extract_df()
+
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from src.data_pipelines.preprocessing.utils import find_csv_table, read_census_csv
+
+
+CENSUS_CSV = '''"Table QS501SC - Highest level of qualification",,
+"All people aged 16 and over",,
+"Counting: People",,
+
+"Electoral Ward 2007","Highest level of qualification","Count"
+"Aberdeen City - Dyce/Bucksburn/Danestone","All people aged 16 and over: Total",18000
+"Aberdeen City - Dyce/Bucksburn/Danestone","All people aged 16 and over: No qualifications",4000
+"Na h-Eileanan Siar - Steòrnabhagh a Deas","All people aged 16 and over: Total",5000
+"Na h-Eileanan Siar - Steòrnabhagh a Deas","All people aged 16 and over: No qualifications",1200
+
+"Dataset: Census 2011",,
+"Source: National Records of Scotland, notes, and caveats",,
+"Copyright",,
+'''
+
+#The title and one of the rows have quoted cells running over two lines
+MULTILINE_CENSUS_CSV = '''"Table QS501SC - Highest level
+of qualification",,
+"All people aged 16 and over",,
+
+"Electoral Ward 2007","Highest level of qualification","Count"
+"Aberdeen City - Dyce/Bucksburn/Danestone","All people aged 16 and over: Total",18000
+"Aberdeen City - Dyce/Bucksburn/Danestone","All people aged 16 and over:
+No qualifications",4000
+"Na h-Eileanan Siar - Steòrnabhagh a Deas","All people aged 16 and over: Total",5000
+
+"Dataset: Census 2011",,
+"Source: National Records of Scotland,
+notes, and caveats",,
+'''
+
+
+@pytest.fixture
+def census_csv(tmp_path):
+    path = tmp_path / 'census.csv'
+    path.write_text(CENSUS_CSV, encoding='utf-8')
+    return path
+
+
+def test_finds_header_and_footer(census_csv):
+    assert find_csv_table(census_csv) == (4, 4)
+
+def test_matches_python_engine_with_hard_coded_rows(census_csv):
+    expected = pd.read_csv(census_csv, skiprows=4, skipfooter=4, engine='python')
+
+    pd.testing.assert_frame_equal(read_census_csv(census_csv), expected)
+
+def test_projects_columns_and_sets_dtypes(census_csv):
+    data = read_census_csv(census_csv, usecols=['Electoral Ward 2007', 'Count'], dtype={'Electoral Ward 2007':'category'})
+
+    assert list(data.columns) == ['Electoral Ward 2007', 'Count']
+    assert isinstance(data['Electoral Ward 2007'].dtype, pd.CategoricalDtype)
+    assert data['Count'].sum() == 28200
+
+def test_multiline_cells_count_as_one_row(tmp_path):
+    path = tmp_path / 'census.csv'
+    path.write_text(MULTILINE_CENSUS_CSV, encoding='utf-8')
+    data = read_census_csv(path)
+
+    assert find_csv_table(path) == (3, 3)
+    assert list(data.columns) == ['Electoral Ward 2007', 'Highest level of qualification', 'Count']
+    assert data['Highest level of qualification'].iloc[1] == 'All people aged 16 and over:\nNo qualifications'
+    assert data['Count'].tolist() == [18000, 4000, 5000]
+    pd.testing.assert_frame_equal(data, pd.read_csv(path, skiprows=3, skipfooter=3, engine='python'))
+
+def test_file_without_table_raises(tmp_path):
+    path = tmp_path / 'empty.csv'
+    path.write_text('"Only a title"\n\n')
+
+    with pytest.raises(ValueError):
+        find_csv_table(path)
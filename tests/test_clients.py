@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app.clients as clients
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients(monkeypatch):
+    monkeypatch.setattr(clients, '_database_client', None)
+    monkeypatch.setattr(clients, '_http_session', None)
+
+
+def test_callbacks_share_one_database_client(monkeypatch):
+    created = []
+    class CountingReader():
+        def __init__(self) -> None:
+            created.append(self)
+    monkeypatch.setattr(clients, 'DatabaseReader', CountingReader)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        readers = list(executor.map(lambda _: clients.get_database_client(), range(32)))
+
+    assert len(created) == 1 and all(reader is created[0] for reader in readers)
+
+def test_api_get_reuses_the_session_and_drops_unset_params(monkeypatch):
+    calls = []
+    session = clients.get_http_session()
+    monkeypatch.setattr(session, 'get', lambda url, **kwargs: calls.append((url, kwargs)))
+
+    clients.api_get('/history/crime', ward_code='S13000001', date=None)
+    clients.api_get('/history/wards')
+
+    assert clients.get_http_session() is session
+    assert calls == [
+        (f'{clients.API_BASE_URL}/history/crime', {'params':{'ward_code':'S13000001'}, 'timeout':clients.API_TIMEOUT}),
+        (f'{clients.API_BASE_URL}/history/wards', {'params':{}, 'timeout':clients.API_TIMEOUT})
+    ]
+    assert session.get_adapter('http://127.0.0.1').poolmanager.connection_pool_kw['maxsize'] == clients.API_POOL_SIZE
@@ -0,0 +1,28 @@
+import pandas as pd
+
+from src.data_pipelines.pipelines.crime_pipeline import changed_sources, process_crime_years
+from tests.conftest import COLUMN_RENAME
+
+
+CRIME_DATA_CONFIG = {'transformations':{'column_rename':COLUMN_RENAME, 'mannual_ward_edits':{'Lerwick North':'lerwicknorthbressay'}}}
+WARD_LOOKUP = pd.DataFrame({'ward_name_2022':['dyce', 'leith', 'lerwicknorthbressay'], 'ward_code_2022':['S1', 'S2', 'S3']})
+
+
+def test_only_new_or_changed_sources_are_processed():
+    ingested = {'2021':'a', '2022':'b', '2020':'c'}
+    checksums = {'2021':'a', '2022':'changed', '2023':'d'}
+
+    assert changed_sources(checksums, ingested) == ['2022', '2023']
+    assert changed_sources(checksums, {}) == ['2021', '2022', '2023']
+
+def test_parallel_years_match_serial(crime_sheet, tmp_path, monkeypatch):
+    crime_data = {year:crime_sheet.assign(**{'CALENDAR YEAR':year}) for year in range(2018, 2022)}
+
+    #Separate caches, so both runs build every year rather than the second reading the first's artifacts
+    monkeypatch.setenv('STAGE_CACHE_DIR', str(tmp_path / 'parallel'))
+    parallel = process_crime_years(crime_data, CRIME_DATA_CONFIG, WARD_LOOKUP, max_workers=2)
+    monkeypatch.setenv('STAGE_CACHE_DIR', str(tmp_path / 'serial'))
+    serial = process_crime_years(crime_data, CRIME_DATA_CONFIG, WARD_LOOKUP, max_workers=1)
+
+    assert parallel['date'].dt.year.unique().tolist() == [2018, 2019, 2020, 2021]
+    pd.testing.assert_frame_equal(parallel, serial)
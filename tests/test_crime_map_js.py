@@ -0,0 +1,55 @@
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.callbacks import colour_range, map_values
+
+
+CRIME_MAP_JS = Path(__file__).resolve().parents[1] / 'app' / 'assets' / 'crime_map.js'
+
+#Runs update_crime_map against a stub plot div and Plotly, printing the restyle calls and the callback's return value
+HARNESS = '''
+const calls = [];
+global.window = {};
+global.Plotly = {restyle: function(plot, update, traces) { calls.push({update: update, traces: traces}); }};
+const plot = {data: [{z: []}]};
+global.document = {getElementById: function(id) {
+    return id === 'crime-map' ? {getElementsByClassName: function() { return [plot]; }} : null;
+}};
+require(process.argv[1]);
+window.dash_clientside.no_update = 'no_update';
+const result = window.dash_clientside.crime_map.update_crime_map(JSON.parse(process.argv[2]));
+console.log(JSON.stringify({calls: calls, result: result}));
+'''
+
+
+def run_update(values) -> dict:
+    output = subprocess.run(['node', '-e', HARNESS, str(CRIME_MAP_JS), json.dumps(values)], capture_output=True, text=True, check=True)
+    return json.loads(output.stdout)
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+def test_month_change_only_restyles_the_values():
+    values = map_values({'key':'wards', 'values':np.log(np.arange(1, 101, dtype=float))})
+
+    output = run_update(values)
+
+    assert output['calls'] == [{
+        'update':{'z':[values['z']], 'zauto':[False], 'zmin':[values['zmin']], 'zmax':[values['zmax']]},
+        'traces':[0]
+    }]
+    assert output['result']['key'] == 'wards' and output['result']['restyle_ms'] >= 0
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+def test_missing_values_are_not_restyled():
+    assert run_update(None) == {'calls':[], 'result':'no_update'}
+
+def test_colour_range_clips_outliers():
+    values = np.r_[np.arange(100, dtype=float), 1e6, np.nan]
+
+    assert colour_range(values) == {'zmin':2.0, 'zmax':98.0}
+    assert colour_range(np.full(3, np.nan)) == {'zmin':None, 'zmax':None}
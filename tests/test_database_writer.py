@@ -0,0 +1,212 @@
+from datetime import date
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import geopandas as gpd
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect
+from shapely.geometry import box
+from sqlalchemy.exc import IntegrityError
+
+import src.DB.DatabaseClient as DatabaseClient
+from src.DB.DatabaseClient import DatabaseWriter
+
+
+class FakeInspector():
+    '''
+    Answers the schema questions the writer asks, for a table with the given keys
+    '''
+    def __init__(self, primary_key:list|None=None, unique:list|None=None, indexes:list|None=None) -> None:
+        self.primary_key = primary_key or []
+        self.unique = unique or []
+        self.indexes = indexes or []
+
+    def has_table(self, table_name:str) -> bool:
+        return True
+
+    def get_pk_constraint(self, table_name:str) -> dict:
+        return {'constrained_columns':self.primary_key}
+
+    def get_unique_constraints(self, table_name:str) -> list:
+        return [{'column_names':columns} for columns in self.unique]
+
+    def get_indexes(self, table_name:str) -> list:
+        return self.indexes
+
+
+@pytest.fixture
+def writer():
+    '''
+    A DatabaseWriter whose engine hands out one mocked connection, recording the SQL it runs
+    '''
+    writer = DatabaseWriter.__new__(DatabaseWriter)
+    writer.engine = MagicMock()
+    writer.conn = writer.engine.begin.return_value.__enter__.return_value
+    writer.conn.execute.return_value.rowcount = 0
+    return writer
+
+def executed_sql(conn) -> list:
+    return [' '.join(str(call.args[0]).split()) for call in conn.execute.call_args_list]
+
+CRIME = pd.DataFrame({'ward_code':['S1', 'S2'], 'date':pd.to_datetime(['2024-01-01', '2024-01-01']), 'count':[1, 2]})
+
+
+def test_upsert_adds_a_missing_primary_key(writer, monkeypatch):
+    monkeypatch.setattr(DatabaseClient, 'inspect', lambda bind: FakeInspector(indexes=[{'column_names':['ward_code', 'date'], 'unique':False}]))
+
+    writer.upsert(CRIME, 'ward_crime')
+
+    sql = executed_sql(writer.conn)
+    alter = sql.index('ALTER TABLE ward_crime ADD PRIMARY KEY ("ward_code", "date")')
+    merge = next(idx for idx, statement in enumerate(sql) if statement.startswith('INSERT INTO ward_crime'))
+    assert alter < merge
+
+def test_upsert_uses_an_existing_key(writer, monkeypatch):
+    monkeypatch.setattr(DatabaseClient, 'inspect', lambda bind: FakeInspector(primary_key=['date', 'ward_code']))
+
+    writer.upsert(CRIME, 'ward_crime')
+
+    assert not any(statement.startswith('ALTER TABLE') for statement in executed_sql(writer.conn))
+
+def test_upsert_raises_if_the_key_cannot_be_added(writer, monkeypatch):
+    monkeypatch.setattr(DatabaseClient, 'inspect', lambda bind: FakeInspector())
+    def execute(statement, *args):
+        if str(statement).startswith('ALTER TABLE'):
+            raise IntegrityError(str(statement), {}, Exception('could not create unique index'))
+        return MagicMock()
+    writer.conn.execute.side_effect = execute
+
+    with pytest.raises(ValueError, match='no primary key or unique constraint'):
+        writer.upsert(CRIME, 'ward_crime')
+    assert not writer.conn.connection.cursor.return_value.copy_expert.called
+
+def test_bulk_load_keys_the_table_before_committing(writer, monkeypatch):
+    monkeypatch.setattr(DatabaseClient, 'inspect', lambda bind: FakeInspector())
+    monkeypatch.setattr(pd.DataFrame, 'to_sql', lambda self, *args, **kwargs: None)
+    events = []
+    writer.conn.execute.side_effect = lambda statement, *args: events.append(' '.join(str(statement).split()))
+    writer.conn.connection.cursor.return_value.copy_expert.side_effect = lambda *args: events.append('COPY')
+    writer.engine.begin.return_value.__exit__.side_effect = lambda *args: events.append('COMMIT')
+
+    writer.bulk_load(CRIME, 'ward_crime')
+
+    assert events.index('COPY') < events.index('ALTER TABLE ward_crime ADD PRIMARY KEY (ward_code, date)') < events.index('COMMIT')
+
+def test_object_columns_are_typed_from_their_values(tmp_path):
+    data = pd.DataFrame({
+        'ward_code':['S1', 'S2'],
+        'date':[date(2024, 1, 1), date(2024, 2, 1)],
+        'rate':[Decimal('0.25'), Decimal('0.5')],
+        'count':[1, 2]
+    })
+    engine = create_engine(f'sqlite:///{tmp_path / "types.db"}')
+
+    data.head(0).to_sql('typed', engine, index=False, dtype=DatabaseWriter.sql_dtypes(data))
+
+    column_types = {column['name']:str(column['type']) for column in inspect(engine).get_columns('typed')}
+    assert column_types == {'ward_code':'TEXT', 'date':'DATE', 'rate':'NUMERIC', 'count':'BIGINT'}
+
+def test_broken_key_falls_back_to_an_index(writer):
+    def execute(statement, *args):
+        if str(statement).startswith('ALTER TABLE'):
+            raise IntegrityError(str(statement), {}, Exception('could not create unique index'))
+        return MagicMock()
+    writer.conn.execute.side_effect = execute
+
+    writer.create_table_keys('ward_crime')
+
+    assert executed_sql(writer.conn)[-1] == 'CREATE INDEX IF NOT EXISTS ward_crime_ward_code_date_idx ON ward_crime (ward_code, date)'
+
+def test_tables_without_keys_are_left_alone(writer):
+    writer.create_table_keys('ward_unknown')
+
+    assert not writer.conn.execute.called
+
+def test_replace_partitions_deletes_only_the_changed_dates(writer, monkeypatch):
+    monkeypatch.setattr(DatabaseClient, 'inspect', lambda bind: FakeInspector())
+    data = pd.concat([CRIME, CRIME.assign(date=pd.Timestamp('2024-02-01'))], ignore_index=True)
+    events = []
+    def execute(statement, *args):
+        events.append((' '.join(str(statement).split()), *args))
+        return MagicMock(rowcount=2)
+    writer.conn.execute.side_effect = execute
+    writer.conn.connection.cursor.return_value.copy_expert.side_effect = lambda sql, buffer: events.append((sql, buffer.getvalue()))
+    writer.engine.begin.return_value.__exit__.side_effect = lambda *args: events.append(('COMMIT',))
+
+    writer.replace_partitions(data, 'ward_crime', 'date')
+
+    delete, copy, commit = events[:3]
+    assert delete == ('DELETE FROM ward_crime WHERE "date" = ANY(:partitions)', {'partitions':[pd.Timestamp('2024-01-01'), pd.Timestamp('2024-02-01')]})
+    assert copy[0].startswith('COPY ward_crime ("ward_code", "date", "count") FROM STDIN')
+    assert len(copy[1].splitlines()) == len(data)
+    assert commit == ('COMMIT',)
+    assert not any(statement.startswith('DELETE') for statement, *_ in events[3:])
+
+def test_replace_partitions_creates_a_missing_table(writer, monkeypatch):
+    inspector = FakeInspector()
+    inspector.has_table = lambda table_name: False
+    monkeypatch.setattr(DatabaseClient, 'inspect', lambda bind: inspector)
+    writer.update_database = MagicMock()
+
+    writer.replace_partitions(CRIME, 'ward_crime', 'date')
+
+    writer.update_database.assert_called_once_with(CRIME, 'ward_crime')
+    assert not writer.engine.begin.called
+
+def test_record_ingestion_forgets_other_sources_on_replace(writer):
+    writer.record_ingestion('ward_crime', {'2023':'a', '2024':'b'}, replace=True)
+
+    sql = executed_sql(writer.conn)
+    delete = sql.index('DELETE FROM ingestion_log WHERE table_name = :table_name')
+    insert = next(idx for idx, statement in enumerate(sql) if statement.startswith('INSERT INTO ingestion_log'))
+    assert sql[0].startswith('CREATE TABLE IF NOT EXISTS ingestion_log')
+    assert delete < insert
+    assert writer.conn.execute.call_args_list[insert].args[1] == [
+        {'table_name':'ward_crime', 'source':'2023', 'checksum':'a'},
+        {'table_name':'ward_crime', 'source':'2024', 'checksum':'b'}
+    ]
+
+def test_record_ingestion_keeps_other_sources_by_default(writer):
+    writer.record_ingestion('ward_crime', {'2024':'b'})
+
+    assert not any(statement.startswith('DELETE') for statement in executed_sql(writer.conn))
+
+def record_replace(writer, monkeypatch) -> list:
+    '''
+    Records the statements a geometry replace runs, with to_postgis standing in as a REPLACE event on its connection
+    '''
+    events = []
+    def to_postgis(self, name, con, **kwargs):
+        events.append(('REPLACE', name, kwargs['if_exists'], con))
+    monkeypatch.setattr(gpd.GeoDataFrame, 'to_postgis', to_postgis)
+    writer.conn.execute.side_effect = lambda statement, *args: events.append((' '.join(str(statement).split()), *args))
+    writer.engine.begin.return_value.__exit__.side_effect = lambda *args: events.append(('COMMIT',))
+    return events
+
+def test_geometry_replace_keys_and_versions_the_table_before_committing(writer, monkeypatch):
+    events = record_replace(writer, monkeypatch)
+    boundaries = gpd.GeoDataFrame({'ward_code':['S1', 'S2']}, geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1)], crs=4326)
+
+    writer.update_from_gpd(boundaries, 'ward_boundary_data')
+
+    assert writer.engine.begin.call_count == 1
+    assert events[0] == ('REPLACE', 'ward_boundary_data', 'replace', writer.conn)
+    assert events[1] == ('ALTER TABLE ward_boundary_data ADD PRIMARY KEY (ward_code)',)
+    assert events[-2] == ('INSERT INTO table_versions (table_name, version) VALUES (:table_name, 1) ON CONFLICT (table_name) DO UPDATE SET version = table_versions.version + 1, updated_at = now()', {'table_name':'ward_boundary_data'})
+    assert events[-1] == ('COMMIT',)
+
+def test_boundary_tiers_are_replaced_keyed_and_versioned_together(writer, monkeypatch):
+    events = record_replace(writer, monkeypatch)
+    tiers = gpd.GeoDataFrame(
+        {'ward_code':['S1', 'S1'], 'tier':['low', 'high'], 'tolerance':[0.01, 0.0005], 'n_vertices':[5, 40]},
+        geometry=[box(0, 0, 1, 1)] * 2, crs=4326
+    )
+
+    writer.update_from_gpd(tiers, 'ward_boundary_tiers')
+
+    statements = [event[0] for event in events]
+    assert writer.engine.begin.call_count == 1
+    assert statements[:2] == ['REPLACE', 'ALTER TABLE ward_boundary_tiers ADD PRIMARY KEY (ward_code, tier)']
+    assert events[-2][1] == {'table_name':'ward_boundary_tiers'}
+    assert statements[-1] == 'COMMIT'
@@ -0,0 +1,106 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.data_pipelines.scraping.downloader import CachedDownloader
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    '''
+    Serves the server's files over HTTP/1.1 keep-alive with an ETag and Last-Modified, answering conditional GETs with 304
+    '''
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.connections.add(self.client_address)
+            failures = server.failures.get(self.path, 0)
+            if failures:
+                server.failures[self.path] = failures - 1
+
+        if failures:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path not in server.files:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = server.files[self.path]
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', 'Mon, 01 Jan 2024 00:00:00 GMT')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.lock = threading.Lock()
+    server.files, server.failures, server.requests, server.connections = {}, {}, [], set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_unchanged_file_is_revalidated_not_downloaded(server, tmp_path):
+    server.files['/crime.xlsx'] = b'first'
+    downloader = CachedDownloader(tmp_path)
+
+    first = downloader.fetch(f'{server.url}/crime.xlsx')
+    second = downloader.fetch(f'{server.url}/crime.xlsx')
+
+    assert not first.from_cache and first.content == b'first'
+    assert second.from_cache and second.content == b'first' and second.checksum == first.checksum
+
+    server.files['/crime.xlsx'] = b'second'
+    third = downloader.fetch(f'{server.url}/crime.xlsx')
+    assert not third.from_cache and third.content == b'second'
+
+def test_cache_is_shared_between_runs(server, tmp_path):
+    server.files['/crime.xlsx'] = b'data'
+    CachedDownloader(tmp_path).fetch(f'{server.url}/crime.xlsx')
+
+    assert CachedDownloader(tmp_path).fetch(f'{server.url}/crime.xlsx').from_cache
+
+def test_transient_errors_are_retried(server, tmp_path):
+    server.files['/crime.xlsx'] = b'data'
+    server.failures['/crime.xlsx'] = 2
+
+    result = CachedDownloader(tmp_path, backoff_factor=0).fetch(f'{server.url}/crime.xlsx')
+
+    assert result.content == b'data'
+    assert server.requests.count('/crime.xlsx') == 3
+
+def test_fetch_all_reuses_connections(server, tmp_path):
+    urls = [f'{server.url}/{year}.xlsx' for year in range(2000, 2040)]
+    for year in range(2000, 2040):
+        server.files[f'/{year}.xlsx'] = str(year).encode()
+
+    results = CachedDownloader(tmp_path, max_workers=4).fetch_all(urls)
+
+    assert list(results) == urls
+    assert all(results[url].content == url[-9:-5].encode() for url in urls)
+    assert len(server.connections) <= 4
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from src.data_pipelines.preprocessing.utils import expand_to_monthly
+
+
+def census_rows() -> pd.DataFrame:
+    return pd.DataFrame({
+        'ward_code':['S2', 'S1', 'S1', 'S2'],
+        'date':pd.to_datetime(['2011-01-01', '2011-01-01', '2012-01-01', '2012-01-01']),
+        'value':[0.0, 12.0, 24.0, np.nan],
+        'other':['a', 'b', 'c', 'd']
+    })
+
+
+def test_interpolates_monthly_between_observations():
+    monthly = expand_to_monthly(census_rows(), 'ward_code', 'date', 'value')
+    s1 = monthly[monthly['ward_code'] == 'S1']
+
+    assert list(monthly.columns) == ['ward_code', 'date', 'value']
+    assert len(s1) == 13
+    assert s1['date'].tolist() == list(pd.date_range('2011-01-01', '2012-01-01', freq='MS'))
+    assert np.allclose(s1['value'], np.arange(12.0, 25.0))
+
+def test_carries_last_value_forward_to_end_date():
+    monthly = expand_to_monthly(census_rows(), 'ward_code', 'date', ['value'], end_date='2012-06-01')
+    s1 = monthly[monthly['ward_code'] == 'S1'].set_index('date')['value']
+    s2 = monthly[monthly['ward_code'] == 'S2'].set_index('date')['value']
+
+    assert s1.index.max() == pd.Timestamp('2012-06-01')
+    assert (s1.loc['2012-01-01':] == 24.0).all()
+    #A missing observation is skipped, so S2 holds its only valid value through to the end date
+    assert (s2 == 0.0).all() and len(s2) == 18
+
+def test_wards_are_sorted_and_kept_apart():
+    monthly = expand_to_monthly(census_rows(), 'ward_code', 'date', 'value')
+
+    assert monthly['ward_code'].is_monotonic_increasing
+    assert monthly.groupby('ward_code')['date'].is_monotonic_increasing.all()
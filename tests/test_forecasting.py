@@ -0,0 +1,106 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sqlalchemy import text
+
+from src.DB.WardStore import WardStore
+
+from src.models.forecasting import COVARIATE_COLUMNS, FEATURE_COLUMNS, MAX_HORIZON, CrimeForecaster
+from src.models.predict_model import CrimePredictor, CrimeService
+from tests.conftest import WARD_CODES, LastMonthPredictor
+
+
+@pytest.fixture
+def predictor(tmp_path) -> CrimePredictor:
+    rng = np.random.default_rng(0)
+    features = pd.DataFrame(rng.random((200, len(FEATURE_COLUMNS))), columns=FEATURE_COLUMNS)
+    model = LinearRegression().fit(features, rng.random(200) * 50)
+    joblib.dump(model, tmp_path / 'model.pkl')
+    return CrimePredictor(str(tmp_path / 'model.pkl'))
+
+@pytest.fixture
+def history() -> pd.DataFrame:
+    rng = np.random.default_rng(1)
+    frames = []
+    for ward_code, n_months in [('S1', 8), ('S2', 3), ('S3', 12)]:
+        frames.append(pd.DataFrame({
+            'ward_code':ward_code,
+            'date':pd.date_range('2022-01-01', periods=n_months, freq='MS'),
+            'count':rng.integers(0, 100, n_months),
+            **{col:1000 + rng.random(n_months) * 100 for col in COVARIATE_COLUMNS}
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def forecast_step_by_step(predictor:CrimePredictor, ward_history:pd.DataFrame, months:int) -> list:
+    '''
+    The forecast one month at a time with one predict call each, extrapolating the covariates with np.polyfit
+    '''
+    x = np.arange(len(ward_history))
+    trends = [np.polyfit(x, ward_history[col].to_numpy(dtype=float), 1) for col in COVARIATE_COLUMNS]
+    counts = list(ward_history['count'].astype(float))
+
+    predictions = []
+    for step in range(1, months + 1):
+        row = {col:slope * (len(ward_history) - 1 + step) + intercept for col, (slope, intercept) in zip(COVARIATE_COLUMNS, trends)}
+        row.update({
+            'crime_last_month':counts[-1],
+            'crime_last_two_months':counts[-2],
+            'crime_last_three_months':counts[-3],
+            'crime_3month_avg':np.mean(counts[-3:]),
+            'pop_density_log':np.log1p(row['population_density'])
+        })
+        prediction = float(predictor.predict(pd.DataFrame([row]))[0])
+        predictions.append(prediction)
+        counts.append(prediction)
+    return predictions
+
+
+@pytest.mark.parametrize('months', range(1, MAX_HORIZON + 1))
+def test_recursive_forecast_matches_step_by_step(predictor, history, months):
+    forecaster = CrimeForecaster(predictor.predict, lambda ward_codes: history)
+
+    states = forecaster.forecast(None, months)
+
+    assert [state.ward_code for state in states] == ['S1', 'S2', 'S3']
+    for state in states:
+        expected = forecast_step_by_step(predictor, history[history['ward_code'] == state.ward_code], months)
+        np.testing.assert_allclose([step['crime_prediction'] for step in state.trajectory(months)], expected)
+
+def test_longer_horizon_carries_on_from_cached_states(predictor, history):
+    forecaster = CrimeForecaster(predictor.predict, lambda ward_codes: history)
+
+    for months in range(1, MAX_HORIZON + 1):
+        states = forecaster.forecast(['S1', 'S3'], months)
+
+    for state in states:
+        expected = forecast_step_by_step(predictor, history[history['ward_code'] == state.ward_code], MAX_HORIZON)
+        np.testing.assert_allclose(state.predictions, expected)
+
+def test_version_change_drops_cached_states(predictor, history):
+    versions = iter([1, 1, 2])
+    loads = []
+    def load_history(ward_codes):
+        loads.append(ward_codes)
+        return history if len(loads) == 1 else history.assign(count=history['count'] + 10)
+    forecaster = CrimeForecaster(predictor.predict, load_history, data_version=lambda: next(versions))
+
+    first = forecaster.forecast(['S1'], 1)[0].predictions
+    assert forecaster.forecast(['S1'], 1)[0].predictions == first
+    assert len(loads) == 1
+
+    assert forecaster.forecast(['S1'], 1)[0].predictions != first
+    assert len(loads) == 2
+
+def test_store_reload_refreshes_predictions(sqlite_reader):
+    store = WardStore().load(sqlite_reader)
+    service = CrimeService(LastMonthPredictor(), store)
+    before = service.predict(WARD_CODES[0])
+
+    with sqlite_reader.engine.begin() as conn:
+        conn.execute(text('UPDATE ward_crime SET count = count + 1000'))
+    store.load(sqlite_reader)
+
+    assert service.predict(WARD_CODES[0])['crime_prediction'] == before['crime_prediction'] + 1000
@@ -0,0 +1,48 @@
+import gzip
+
+from flask import Flask
+from sqlalchemy.exc import ProgrammingError
+
+import app.geometry as geometry
+from app.geometry import GeometryArtifact, GeometryTiers, register_geometry_route
+from tests.conftest import wards
+
+
+def test_geometry_route_serves_etags_and_gzip():
+    server = Flask(__name__)
+    register_geometry_route(server, GeometryTiers(lambda: ['low'], lambda tier: wards(['S1', 'S2'])))
+    client = server.test_client()
+
+    response = client.get('/geometry/wards/low.geojson', headers={'Accept-Encoding':'gzip'})
+    assert response.status_code == 200 and response.headers['Content-Encoding'] == 'gzip'
+    assert b'S1' in gzip.decompress(response.data)
+
+    etag = response.headers['ETag']
+    assert client.get('/geometry/wards/low.geojson', headers={'If-None-Match':etag}).status_code == 304
+    assert client.get('/geometry/wards/high.geojson').status_code == 404
+
+def test_reload_picks_up_new_boundaries():
+    loaded = [wards(['S1', 'S2']), wards(['S3', 'S1'])]
+    artifact = GeometryArtifact(lambda: loaded.pop(0)).get()
+    etag = artifact.etag
+
+    artifact.reload()
+
+    assert artifact.ward_codes == ['S3', 'S1'] and artifact.etag != etag
+
+def test_tiers_come_from_the_database_coarsest_first():
+    tiers = GeometryTiers(lambda: ['coarse', 'middle', 'fine'], lambda tier: wards([tier]))
+
+    assert [tiers.tier_for_zoom(zoom) for zoom in [5, 8, 12]] == ['coarse', 'middle', 'fine']
+    assert tiers.default().get().ward_codes == ['coarse']
+
+def test_missing_tiers_fall_back_to_the_default(monkeypatch):
+    class NoTiersClient():
+        def get_boundary_tiers(self):
+            raise ProgrammingError('SELECT', {}, Exception('relation "ward_boundary_tiers" does not exist'))
+    monkeypatch.setattr(geometry, 'get_database_client', NoTiersClient)
+
+    tiers = GeometryTiers(load_tier=lambda tier: wards(['S1']))
+
+    assert list(tiers.artifacts()) == [geometry.DEFAULT_TIER]
+    assert tiers.tier_for_zoom(12) == geometry.DEFAULT_TIER
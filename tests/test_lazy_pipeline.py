@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+
+from src.data_pipelines.preprocessing.base_pipeline import BasePipeline
+from tests.conftest import COLUMN_RENAME, run_crime_chain
+
+
+def test_lazy_chain_matches_eager(crime_sheet):
+    pd.testing.assert_frame_equal(run_crime_chain(crime_sheet, lazy=True), run_crime_chain(crime_sheet, lazy=False))
+
+def test_adjacent_projections_are_fused(crime_sheet):
+    pipeline = (
+        BasePipeline(crime_sheet, lazy=True).rename_cols(COLUMN_RENAME)
+        .drop_columns('UNUSED')
+        .rename_cols({'count':'crime_count'})
+        .subset_columns(['ward_name_2022', 'crime_count'])
+    )
+
+    assert len(pipeline._plan) == 1
+    assert pipeline.columns == ['ward_name_2022', 'crime_count']
+    expected = crime_sheet[['PSOS_MMW_Name', 'DETECTED CRIME']].set_axis(['ward_name_2022', 'crime_count'], axis=1)
+    pd.testing.assert_frame_equal(pipeline.extract_df(), expected)
+
+def test_join_columns_match_pandas_suffixes():
+    left = pd.DataFrame({'key':['a', 'b'], 'value':[1, 2], 'name':['x', 'y']})
+    right = pd.DataFrame({'key':['a'], 'name':['z'], 'code':['S1']})
+
+    pipeline = BasePipeline(left, lazy=True).left_join(right, 'key')
+
+    assert pipeline.columns == list(left.merge(right, on='key', how='left').columns)
+
+def test_missing_columns_raise_when_planned(crime_sheet):
+    pipeline = BasePipeline(crime_sheet, lazy=True).rename_cols(COLUMN_RENAME)
+
+    with pytest.raises(ValueError):
+        pipeline.subset_columns(['PSOS_MMW_Name'])
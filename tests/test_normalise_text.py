@@ -0,0 +1,67 @@
+import re
+import random
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from src.data_pipelines.preprocessing.base_pipeline import BasePipeline
+from src.data_pipelines.preprocessing.utils import normalise_text, normalise_series, UNICODE_WHITESPACE
+
+
+def reference_normalise_text(string:str) -> str:
+    '''
+    The original regex implementation of normalise_text, which the fast path must match byte for byte
+    '''
+    if pd.isna(string):
+        return ''
+
+    string = string.lower()
+    string = re.sub(' and ', '', string)
+    string = re.sub('&', '', string)
+    string = re.sub('/', '', string)
+    string = re.sub(',', '', string)
+    string = re.sub(r'[.]', '', string)
+    string = re.sub('-', '', string)
+    string = re.sub("'", '', string)
+    string = re.sub(r'[()]', '', string)
+    string = re.sub(r'[’]', '', string)
+    string = re.sub(r"\s+", '', string)
+    string = re.sub('agus', '', string)
+    string = re.sub('ward$', '', string)
+
+    normalized = unicodedata.normalize('NFKD', string)
+    return normalized.encode('ASCII', 'ignore').decode('utf-8')
+
+
+WARD_NAMES = [
+    'Kintyre and the Islands', 'Na Hearadh agus Ceann a Deas nan Loch', 'Dundee - North East', "St. Andrew's Ward",
+    'Aird & Loch Ness', '  Eilean   Siar  ', 'Fort William (Lochaber)', 'Bùrn’s Road/ Ward', 'Eilean Ã¡ ChÃ¨o',
+    'wardward', 'Ward', 'and', 'x and  and y', 'Élgin\tCity\nward\n', 'ﬁfe ½', 'line\x1cseparator', '', np.nan, None
+]
+
+def random_names(n:int) -> list:
+    rng = random.Random(0)
+    alphabet = list("abcXYZ &/,.-'()’éÉüßİﬁ½") + list(UNICODE_WHITESPACE) + [' and ', ' AND ', 'agus', 'ward', 'Ward']
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 10))) for _ in range(n)]
+
+
+def test_unicode_whitespace_matches_isspace():
+    assert set(UNICODE_WHITESPACE) == {chr(c) for c in range(0x110000) if chr(c).isspace()}
+
+def test_normalise_text_matches_reference():
+    for name in WARD_NAMES + random_names(20000):
+        assert normalise_text(name) == reference_normalise_text(name), repr(name)
+
+def test_normalise_series_matches_reference():
+    names = pd.Series((WARD_NAMES + random_names(5000)) * 2, index=np.arange(10, 10 + 2 * (len(WARD_NAMES) + 5000)))
+    normalised = normalise_series(names)
+
+    assert normalised.index.equals(names.index)
+    assert normalised.tolist() == [reference_normalise_text(name) for name in names]
+
+def test_normalise_column_uses_vectorised_path():
+    df = pd.DataFrame({'ward_name':WARD_NAMES})
+    pipeline = BasePipeline(df.copy()).normalise_column(normalise_text, 'ward_name')
+
+    assert pipeline.data['ward_name'].tolist() == [reference_normalise_text(name) for name in WARD_NAMES]
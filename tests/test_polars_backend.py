@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import polars as pl
+import pytest
+
+from src.data_pipelines.pipelines.crime_pipeline import CrimePipeline
+from src.data_pipelines.pipelines.population_density_pipeline import PopulationDensityPipeline
+from src.data_pipelines.preprocessing.base_pipeline import BasePipeline
+from tests.conftest import COLUMN_RENAME, run_crime_chain
+
+
+def test_crime_chain_matches_pandas(crime_sheet):
+    pandas_result = run_crime_chain(crime_sheet, lazy=False)
+    polars_result = run_crime_chain(crime_sheet, lazy=False, backend='polars')
+
+    #Wards without a code are None from Polars rather than NaN
+    pd.testing.assert_frame_equal(polars_result.fillna(np.nan), pandas_result)
+
+def test_unported_methods_fall_back_to_pandas():
+    data = pd.DataFrame({'ward':['a', 'b', 'c'], 'unemployed':[1, 2, 3], 'active':[10, 0, 30], 'students':[5, 5, np.nan]})
+
+    def chain(backend:str) -> pd.DataFrame:
+        pipeline = BasePipeline(data.copy(), backend=backend).sum_cols('total', ['active', 'students'])
+        pipeline.data['share'] = pipeline.divide_col('unemployed', 'total')
+        return pipeline.divide_cols('rate', 'unemployed', 'active').rename_cols({'ward':'ward_name'}).extract_df()
+
+    pd.testing.assert_frame_equal(chain('polars'), chain('pandas'))
+
+def test_population_filter_matches_pandas():
+    data = pd.DataFrame({'ward':['a', 'a', 'b'], 'Sex':['Persons', 'Males', 'persons'], 'Total':[3, 1, 5]})
+
+    results = [
+        PopulationDensityPipeline(data.copy(), backend=backend).filter_df('Sex', 'Persons').set_date_column('date', '2021-01-01').extract_df()
+        for backend in ['pandas', 'polars']
+    ]
+
+    pd.testing.assert_frame_equal(results[1], results[0])
+
+def test_unknown_backend_raises():
+    with pytest.raises(ValueError):
+        BasePipeline(pd.DataFrame(), backend='spark')
+
+def test_subclass_uses_polars_from_the_start(crime_sheet):
+    pipeline = CrimePipeline(crime_sheet, backend='polars')
+
+    assert pipeline.use_polars
+    assert isinstance(pipeline.rename_cols(COLUMN_RENAME).frame, pl.LazyFrame)
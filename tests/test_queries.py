@@ -0,0 +1,35 @@
+import pytest
+
+from src.DB.DatabaseClient import DatabaseReader, WardQueries
+
+
+def test_where_clause_only_has_the_filters_that_are_set():
+    assert WardQueries._where_clause(ward_code=None, date=None) == ('', {})
+    assert WardQueries._where_clause(ward_code='S1', date=None) == ('WHERE ward_code = :ward_code', {'ward_code':'S1'})
+    assert WardQueries._where_clause(ward_code='S1', date='2024-01-01') == (
+        'WHERE ward_code = :ward_code AND date = :date', {'ward_code':'S1', 'date':'2024-01-01'}
+    )
+
+@pytest.mark.parametrize('query', ['crime_data_query', 'education_data_query', 'employment_data_query', 'population_data_query'])
+def test_queries_use_plain_predicates_in_key_order(query):
+    sql, params = getattr(WardQueries(), query)(ward_code='S1')
+
+    assert 'ward_code = :ward_code' in sql and 'COALESCE' not in sql and ' OR ' not in sql
+    assert 'SELECT *' not in sql and sql.rstrip().endswith('ORDER BY ward_code, date')
+    assert params == {'ward_code':'S1'}
+
+def test_filtered_getters_return_the_matching_rows(sqlite_reader):
+    rows = sqlite_reader.get_crime_data(ward_code='S13000002', date='2023-03-01')
+
+    assert [(row['ward_code'], row['date']) for row in rows] == [('S13000002', '2023-03-01')]
+    assert len(sqlite_reader.get_crime_data(ward_code='S13000002')) == 6
+    assert isinstance(sqlite_reader, DatabaseReader)
+
+def test_table_versions_are_read_by_the_plain_reader(sqlite_reader):
+    assert sqlite_reader.get_table_versions() == {}
+
+    with sqlite_reader.engine.begin() as conn:
+        conn.exec_driver_sql('CREATE TABLE table_versions (table_name TEXT PRIMARY KEY, version BIGINT NOT NULL)')
+        conn.exec_driver_sql("INSERT INTO table_versions VALUES ('ward_boundary_tiers', 3)")
+
+    assert sqlite_reader.get_table_versions() == {'ward_boundary_tiers':3}
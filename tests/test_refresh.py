@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from src.data_pipelines.refresh import STAGES, Stage, refresh, select_stages
+
+
+def slow_value(seconds:float=1.0) -> int:
+    time.sleep(seconds)
+    return 1
+
+def add_one(source:int) -> int:
+    return source + 1
+
+def fail():
+    raise RuntimeError('boom')
+
+def after_fail(failing:None) -> None:
+    pass
+
+
+def test_independent_stages_run_in_parallel():
+    stages = [
+        Stage('source', 'tests.test_refresh:slow_value'),
+        Stage('other', 'tests.test_refresh:slow_value'),
+        Stage('third', 'tests.test_refresh:slow_value'),
+        Stage('derived', 'tests.test_refresh:add_one', ['source']),
+    ]
+
+    start = time.perf_counter()
+    report = refresh(stages, max_workers=3)
+    wall_time = time.perf_counter() - start
+
+    assert wall_time < sum(stage_report['wall_time'] for stage_report in report.values()) - 1.0
+    assert all(stage_report['status'] == 'done' for stage_report in report.values())
+    assert all(stage_report['peak_mb'] > 0 for stage_report in report.values())
+
+def test_failure_skips_only_downstream_stages():
+    stages = [
+        Stage('failing', 'tests.test_refresh:fail'),
+        Stage('downstream', 'tests.test_refresh:after_fail', ['failing']),
+        Stage('source', 'tests.test_refresh:slow_value'),
+    ]
+
+    report = refresh(stages, max_workers=2)
+
+    assert report['failing']['status'] == 'failed'
+    assert report['downstream']['status'] == 'skipped'
+    assert report['source']['status'] == 'done'
+
+def test_select_stages_adds_dependencies():
+    assert [stage.name for stage in select_stages(STAGES, ['crime'])] == ['config', 'crosswalk', 'crime']
+
+    with pytest.raises(ValueError):
+        select_stages(STAGES, ['weather'])
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import app.snapshots as snapshots
+from app.geometry import GeometryTiers
+from app.snapshots import MonthlySnapshots
+from tests.conftest import wards
+
+
+class FakeResponse():
+    def __init__(self, payload, status_code:int=200) -> None:
+        self.payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self.payload
+
+
+class FakeApi():
+    '''
+    Serves the store info, crime history and ward names the snapshots are built from
+    '''
+    def __init__(self) -> None:
+        self.store = {'version':1, 'loaded_at':'2024-01-01T00:00:00', 'table_versions':{'ward_boundary_data':1, 'ward_boundary_tiers':1}}
+        self.calls = []
+        self.crime = [{'ward_code':'S1', 'date':'2024-01-01', 'count':10}, {'ward_code':'S2', 'date':'2024-01-01', 'count':20}, {'ward_code':'S1', 'date':'2024-02-01', 'count':5}]
+
+    def __call__(self, path:str, **params) -> FakeResponse:
+        self.calls.append(path)
+        if path == '/admin/store':
+            return FakeResponse(self.store)
+        if path == '/history/crime':
+            return FakeResponse(self.crime)
+        return FakeResponse([{'ward_code':code, 'ward_name':f'ward {code}'} for code in ['S1', 'S2', 'S3']])
+
+
+@pytest.fixture
+def api(monkeypatch) -> FakeApi:
+    api = FakeApi()
+    monkeypatch.setattr(snapshots, 'api_get', api)
+    return api
+
+
+def test_every_month_is_precomputed_in_geometry_order(api, monkeypatch):
+    monkeypatch.setattr(snapshots, 'ward_geometry', GeometryTiers(lambda: ['low'], lambda tier: wards(['S2', 'S3', 'S1'])))
+    monthly = MonthlySnapshots().warm()
+    n_calls = len(api.calls)
+
+    january, february, march = monthly.get(2024, 1), monthly.get(2024, 2), monthly.get(2024, 3)
+
+    assert january['ward_codes'] == ['S2', 'S3', 'S1'] and january['ward_names'] == ['ward S2', 'ward S3', 'ward S1']
+    np.testing.assert_allclose(january['values'], [np.log(20), np.nan, np.log(10)])
+    np.testing.assert_allclose(february['values'], [np.nan, np.nan, np.log(5)])
+    assert np.isnan(march['values']).all()
+    #Slider moves between version checks are served from memory
+    assert len(api.calls) == n_calls
+
+def test_store_reload_rebuilds_the_snapshots(api, monkeypatch):
+    monkeypatch.setattr(snapshots, 'ward_geometry', GeometryTiers(lambda: ['low'], lambda tier: wards(['S1', 'S2'])))
+    monthly = MonthlySnapshots(version_check_interval=0).warm()
+
+    api.crime = [{'ward_code':'S1', 'date':'2024-01-01', 'count':100}]
+    assert np.isclose(monthly.get(2024, 1)['values'][0], np.log(10))
+
+    api.store = {**api.store, 'version':2}
+    np.testing.assert_allclose(monthly.get(2024, 1)['values'], [np.log(100), np.nan])
+
+def test_boundary_change_realigns_snapshots(api, monkeypatch):
+    loaded = [wards(['S1', 'S2']), wards(['S2', 'S3', 'S1'])]
+    monkeypatch.setattr(snapshots, 'ward_geometry', GeometryTiers(lambda: ['low'], lambda tier: loaded.pop(0)))
+    monthly = MonthlySnapshots(version_check_interval=0).warm()
+
+    before = monthly.get(2024, 1)
+    assert before['ward_codes'] == ['S1', 'S2']
+    np.testing.assert_allclose(before['values'], np.log([10, 20]))
+
+    #A store reload alone keeps the geometry
+    api.store = {**api.store, 'version':2}
+    assert monthly.get(2024, 1)['key'] == before['key'] and loaded
+
+    api.store = {**api.store, 'version':3, 'table_versions':{'ward_boundary_data':2, 'ward_boundary_tiers':2}}
+    after = monthly.get(2024, 1)
+    assert after['ward_codes'] == ['S2', 'S3', 'S1'] and after['key'] != before['key']
+    np.testing.assert_allclose(after['values'], [np.log(20), np.nan, np.log(10)])
+
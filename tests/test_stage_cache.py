@@ -0,0 +1,56 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from src.data_pipelines.preprocessing.stage_cache import cached_stage, stage_key
+
+
+def test_second_build_is_read_from_cache(tmp_path):
+    builds = []
+    def build():
+        builds.append(1)
+        return pd.DataFrame({'ward_code':['S1', 'S2'], 'crime':[1.5, 2.0]})
+
+    first = cached_stage('crime_year', 'key', build, cache_dir=tmp_path)
+    second = cached_stage('crime_year', 'key', build, cache_dir=tmp_path)
+
+    assert len(builds) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+def test_key_follows_files_config_and_frames(tmp_path):
+    path = tmp_path / 'census.csv'
+    path.write_text('a,b\n1,2\n')
+    frame = pd.DataFrame({'ward_code':['S1'], 'value':[1]})
+    key = stage_key('education', 1, files=[path], config={'columns':['a']}, frames=[frame])
+
+    assert key == stage_key('education', 1, files=[path], config={'columns':['a']}, frames=[frame.copy()])
+    assert key != stage_key('education', 2, files=[path], config={'columns':['a']}, frames=[frame])
+    assert key != stage_key('education', 1, files=[path], config={'columns':['b']}, frames=[frame])
+    assert key != stage_key('education', 1, files=[path], config={'columns':['a']}, frames=[frame.assign(value=2)])
+
+    path.write_text('a,b\n1,3\n')
+    assert key != stage_key('education', 1, files=[path], config={'columns':['a']}, frames=[frame])
+
+def test_dictionaries_of_geodataframes_round_trip(tmp_path):
+    output = {
+        'boundary_data':gpd.GeoDataFrame({'ward_code':['S1']}, geometry=[Point(0, 1)], crs=4326),
+        'boundary_tiers':pd.DataFrame({'ward_code':['S1'], 'tier':[1]})
+    }
+    cached_stage('boundaries', 'key', lambda: output, cache_dir=tmp_path)
+    cached = cached_stage('boundaries', 'key', lambda: None, cache_dir=tmp_path)
+
+    assert isinstance(cached['boundary_data'], gpd.GeoDataFrame)
+    assert cached['boundary_data'].crs == output['boundary_data'].crs
+    assert cached['boundary_data'].geometry.equals(output['boundary_data'].geometry)
+    pd.testing.assert_frame_equal(cached['boundary_tiers'], output['boundary_tiers'])
+
+def test_failed_write_leaves_no_staging_directory(tmp_path):
+    #Mixed ints and strings in one column cannot be written to Parquet
+    def build():
+        return pd.DataFrame({'ward_code':['S1', 2]})
+
+    with pytest.raises(TypeError):
+        cached_stage('crime_year', 'key', build, cache_dir=tmp_path)
+
+    assert list((tmp_path / 'crime_year').iterdir()) == []
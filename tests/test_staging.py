@@ -0,0 +1,57 @@
+import hashlib
+
+import pandas as pd
+import pytest
+
+from src.data_pipelines.scraping.downloader import DownloadResult
+from src.data_pipelines.scraping.staging import read_excel_staged, stage_excel_sheet
+
+
+@pytest.fixture
+def workbook(tmp_path) -> DownloadResult:
+    '''
+    A workbook with a sheet per year, each with title rows above the table like the population estimates
+    '''
+    path = tmp_path / 'population.xlsx'
+    with pd.ExcelWriter(path) as writer:
+        for year in ['2001', '2021']:
+            rows = [
+                ['Population estimates', None, None, None, None],
+                [None, None, None, None, None],
+                ['Electoral Ward 2022 Code', 'Electoral Ward 2022 Name', 'Sex', 'Total', 'Age 0'],
+                ['S1', 'Ward A', 'Persons', int(year), 1],
+                ['S1', 'Ward A', 'Males', 5, 1],
+                ['S2', 'Ward B', 'Persons', 7, 'x'],
+            ]
+            pd.DataFrame(rows).to_excel(writer, sheet_name=year, header=False, index=False)
+
+    return DownloadResult('http://fixture/population.xlsx', path, hashlib.sha256(path.read_bytes()).hexdigest(), from_cache=False)
+
+
+def test_stages_one_sheet_with_projected_columns(workbook, tmp_path):
+    data = read_excel_staged(
+        workbook, tmp_path / 'cache', sheet_name='2021', columns=['Electoral Ward 2022 Code', 'Sex', 'Total'],
+        categorical_columns=['Sex'], header_pattern='Electoral Ward 2022 Name'
+    )
+
+    assert list(data.columns) == ['Electoral Ward 2022 Code', 'Sex', 'Total']
+    assert isinstance(data['Sex'].dtype, pd.CategoricalDtype)
+    assert data['Total'].tolist() == [2021, 5, 7]
+
+def test_staged_sheet_is_not_parsed_again(workbook, tmp_path, monkeypatch):
+    first = stage_excel_sheet(workbook, tmp_path / 'cache', sheet_name='2001', header_pattern='Electoral Ward 2022 Name')
+
+    def fail(*args, **kwargs):
+        raise AssertionError('workbook was parsed again')
+    monkeypatch.setattr(pd, 'ExcelFile', fail)
+
+    assert stage_excel_sheet(workbook, tmp_path / 'cache', sheet_name='2001', header_pattern='Electoral Ward 2022 Name') == first
+
+def test_mixed_type_columns_are_staged_as_text(workbook, tmp_path):
+    data = read_excel_staged(workbook, tmp_path / 'cache', sheet_name='2001', header_pattern='Electoral Ward 2022 Name')
+
+    assert data['Age 0'].tolist() == ['1', '1', 'x']
+
+def test_missing_sheet_raises(workbook, tmp_path):
+    with pytest.raises(KeyError):
+        stage_excel_sheet(workbook, tmp_path / 'cache', sheet_name='1999')
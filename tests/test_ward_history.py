@@ -0,0 +1,43 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from src.api.concurrency import create_limiter
+from src.api.main import app
+from src.models.predict_model import CrimeService
+from tests.conftest import WARD_CODES, LastMonthPredictor
+
+
+@pytest.fixture
+def client(sqlite_reader):
+    app.state.crime_service = CrimeService(LastMonthPredictor(), sqlite_reader)
+    app.state.limiter = create_limiter()
+    return TestClient(app)
+
+
+def test_batch_history_matches_single_ward_calls(sqlite_reader):
+    batch = sqlite_reader.get_ward_history(WARD_CODES)
+    single = [row for ward_code in WARD_CODES for row in sqlite_reader.get_ward_history([ward_code])]
+
+    assert batch == single
+    assert {row['ward_code'] for row in batch} == set(WARD_CODES)
+    assert sqlite_reader.get_ward_history(None) == batch
+
+def test_empty_and_unknown_wards_have_no_history(sqlite_reader):
+    assert sqlite_reader.get_ward_history([]) == []
+    assert sqlite_reader.get_ward_history(['S99999999']) == []
+    assert sqlite_reader.get_ward_history(['S99999999', WARD_CODES[0]]) == sqlite_reader.get_ward_history([WARD_CODES[0]])
+
+def test_batch_endpoint_matches_single_ward_endpoint(client):
+    batch = client.post('/predict/crime/batch', json={'ward_codes':WARD_CODES, 'months':3})
+    assert batch.status_code == 200
+
+    for prediction in batch.json():
+        single = client.get(f"/predict/crime/{prediction['ward_code']}", params={'months':3})
+        assert single.status_code == 200
+        assert single.json()['predictions'] == prediction['predictions']
+    assert [prediction['ward_code'] for prediction in batch.json()] == WARD_CODES
+
+def test_batch_endpoint_skips_unknown_wards(client):
+    assert client.post('/predict/crime/batch', json={'ward_codes':[]}).json() == []
+    assert client.post('/predict/crime/batch', json={'ward_codes':['S99999999']}).json() == []
+    assert client.get('/predict/crime/S99999999').status_code == 404
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from src.DB.WardStore import WardSnapshot, WardStore
+from tests.conftest import WARD_CODES
+
+
+def normalise(records:list) -> pd.DataFrame:
+    df = pd.DataFrame(records)
+    if not df.empty:
+        df['date'] = pd.to_datetime(df['date'])
+    return df.reset_index(drop=True)
+
+
+@pytest.mark.parametrize('ward_code', [None, WARD_CODES[1], 'S99999999'])
+@pytest.mark.parametrize('date', [None, '2023-02-01', '2023-01-15', '2023-03-31', '2022-12-01', '2024-01-01'])
+def test_store_matches_database_filters(sqlite_reader, ward_code, date):
+    store = WardStore().load(sqlite_reader)
+
+    for getter in ['get_crime_data', 'get_education_data', 'get_employment_data', 'get_population_data']:
+        expected = normalise(getattr(sqlite_reader, getter)(ward_code=ward_code, date=date))
+        result = normalise(getattr(store, getter)(ward_code=ward_code, date=date))
+        if expected.empty:
+            assert result.empty
+        else:
+            pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+
+def test_store_history_matches_database(sqlite_reader):
+    store = WardStore().load(sqlite_reader)
+
+    expected = normalise(sqlite_reader.get_ward_history(WARD_CODES))
+    pd.testing.assert_frame_equal(normalise(store.get_ward_history(WARD_CODES))[expected.columns], expected, check_dtype=False)
+
+def test_dates_within_a_month_are_rejected(ward_tables):
+    tables = {table_name:df for table_name, df in ward_tables.items() if table_name != 'ward_code_name'}
+    tables['ward_crime'] = tables['ward_crime'].assign(date=tables['ward_crime']['date'] + pd.Timedelta(days=14))
+
+    with pytest.raises(ValueError):
+        WardSnapshot(tables, ward_tables['ward_code_name'])